@@ -0,0 +1,192 @@
+''' Parser benchmarks over the search and detail fixtures.
+
+    python -m benchmarks.bench_parse                     compare against benchmarks/baseline.json
+    python -m benchmarks.bench_parse --update-baseline   store the current numbers as the baseline
+
+Every stage reports ms per page, items per second and peak memory. A stage that got slower
+than --threshold times its baseline makes the run exit with status 1.
+'''
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from benchmarks import fixtures
+from scraper.strategies.airbnb_com.detail_page import AirbnbComDetailStrategy
+from scraper.strategies.airbnb_com.page_state import PageState
+from scraper.strategies.airbnb_com.room_data import RoomDataView
+from scraper.strategies.airbnb_com.search_page import AirbnbComSearchStrategy
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+SEARCH_URL = 'https://www.airbnb.com/s/Kissimmee--Florida--United-States/homes?adults=2&checkin=2024-04-01&checkout=2024-04-05'
+ROOM_ID = fixtures.listing_id(0, 1)
+
+logger = logging.getLogger('benchmarks')
+logger.setLevel(logging.WARNING)
+
+
+def search_strategy():
+    strategy = AirbnbComSearchStrategy(logger)
+    strategy.origin_url = SEARCH_URL
+    # only the parsing is measured, the detail pages are stubbed out
+    strategy.fetch_room_data = lambda url, config=None: {}
+    return strategy
+
+
+def detail_strategy():
+    strategy = AirbnbComDetailStrategy(logger)
+    strategy.origin_url = f'https://www.airbnb.com/rooms/{ROOM_ID}?check_in=2024-04-01&check_out=2024-04-05'
+    return strategy
+
+
+def build_stages():
+    search_html = fixtures.load('search.html', fixtures.search_html)
+    search_api = fixtures.load('stays_search.json', lambda: fixtures.search_api_json(1))
+    pdp_sections = fixtures.load('stays_pdp_sections.json', lambda: fixtures.pdp_sections(ROOM_ID))
+    checkout = fixtures.load('stay_checkout.json', lambda: fixtures.checkout_json(ROOM_ID))
+
+    search = search_strategy()
+    detail = detail_strategy()
+    deferred_state = PageState(search_html).deferred_state
+    room_data = json.loads(pdp_sections)['data']['presentation']['stayProductDetailPage']
+    price_data = json.loads(checkout)['data']['presentation']['stayCheckout']
+    items = search.get_listing_items(deferred_state)
+    plan = search.build_pagination_plan(PageState(search_html), SEARCH_URL, operation_id='0' * 64)
+
+    stages = {
+        'search.parse_html': (lambda: search.parse(search_html, 1), len(items)),
+        'search.parse_api': (lambda: search.parse(search_api, 1), len(items)),
+        'search.get_deffered_state': (lambda: search.get_deffered_state(PageState(search_html)), 1),
+        'search.get_listing_items': (lambda: search.get_listing_items(deferred_state), len(items)),
+        'search.extract_fields': (lambda: search.search_fields.extract_many(items), len(items)),
+        'search.build_pagination_plan': (lambda: search.build_pagination_plan(PageState(search_html), SEARCH_URL, operation_id='0' * 64), 1),
+        'search.page_payload': (lambda: plan.payload(2), 1),
+        'detail.parse_sections_json': (lambda: json.loads(pdp_sections), 1),
+        'detail.extract_fields': (lambda: detail.room_fields.extract(room_data), 1),
+    }
+
+    for name in sorted(dir(detail)):
+        if not (name.startswith('get_pdp_') or name == 'get_property_type') or 'js_link' in name:
+            continue
+        getter = getattr(detail, name)
+        data = price_data if name in ('get_pdp_price_per_night', 'get_pdp_total_price') else room_data
+        if getter(data) is None:
+            # placeholders like get_pdp_labels that are not implemented yet
+            continue
+        stages[f'detail.{name}'] = (lambda getter=getter, data=data: getter(data), 1)
+
+    getters = [(getattr(detail, name[len('detail.'):]), name) for name in stages if name.startswith('detail.get_')]
+
+    def all_getters():
+        # one listing as fetch_basic sees it, the sections are indexed once and shared
+        room_view = RoomDataView(room_data)
+        for getter, name in getters:
+            getter(price_data if name in ('detail.get_pdp_price_per_night', 'detail.get_pdp_total_price') else room_view)
+    stages['detail.all_getters'] = (all_getters, 1)
+    return stages
+
+
+def measure(func, items, repeat):
+    # tiny stages are timed in batches so every sample is well above the timer resolution
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - started > 0.002 or number >= 100000:
+            break
+        number *= 10
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    seconds = statistics.median(timings)
+    return {
+        'ms_per_page': round(seconds * 1000, 4),
+        'items_per_sec': round(items / seconds, 1) if seconds else None,
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run(repeat=20, only=None):
+    results = {}
+    for name, (func, items) in build_stages().items():
+        if only and only not in name:
+            continue
+        results[name] = measure(func, items, repeat)
+    return results
+
+
+def compare(results, baseline, threshold, min_delta_ms=0.01):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or not base.get('ms_per_page'):
+            result['vs_baseline'] = None
+            continue
+        ratio = result['ms_per_page'] / base['ms_per_page']
+        result['vs_baseline'] = round(ratio, 2)
+        if ratio > threshold and result['ms_per_page'] - base['ms_per_page'] > min_delta_ms:
+            regressions.append(name)
+    return regressions
+
+
+def print_table(results):
+    print(f'{"stage":<40} {"ms/page":>10} {"items/s":>12} {"peak KB":>10} {"vs base":>8}')
+    for name, result in results.items():
+        ratio = result.get('vs_baseline')
+        print(f'{name:<40} {result["ms_per_page"]:>10.3f} {result["items_per_sec"] or 0:>12.1f} '
+              f'{result["peak_memory_kb"]:>10.1f} {"-" if ratio is None else f"{ratio:.2f}x":>8}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the search and detail parsers')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--only', default=None, help='run the stages whose name contains this text')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--threshold', type=float, default=1.5, help='allowed slowdown against the baseline')
+    parser.add_argument('--min-delta-ms', type=float, default=0.01, help='slowdowns smaller than this are noise')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--json', action='store_true', help='print the results as json')
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.only)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='UTF-8') as file:
+            file.write(json.dumps(results, indent=4))
+        print(f'Baseline written to {args.baseline}')
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='UTF-8') as file:
+            baseline = json.load(file)
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+
+    if args.json:
+        print(json.dumps(results, indent=4))
+    else:
+        print_table(results)
+
+    if regressions:
+        print(f'Slower than {args.threshold}x the baseline: {", ".join(regressions)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
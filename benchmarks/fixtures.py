@@ -0,0 +1,400 @@
+''' Fixtures shaped like the airbnb pages and api responses the strategies consume.
+
+Captured responses dropped in benchmarks/fixtures/ (for example from a crawl run with the
+http cache in record mode) are used as they are. Anything missing is generated here so the
+benchmarks and the mock server always have something realistic to work with.
+'''
+import calendar
+import json
+import os
+import random
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+SEARCH_OPERATION_ID = 'a1b2c3d4e5f60718293a4b5c6d7e8f90a1b2c3d4e5f60718293a4b5c6d7e8f90'
+PDP_OPERATION_ID = 'b2c3d4e5f60718293a4b5c6d7e8f90a1b2c3d4e5f60718293a4b5c6d7e8f90a1'
+CHECKOUT_OPERATION_ID = 'c3d4e5f60718293a4b5c6d7e8f90a1b2c3d4e5f60718293a4b5c6d7e8f90a1b2'
+CALENDAR_OPERATION_ID = 'd4e5f60718293a4b5c6d7e8f90a1b2c3d4e5f60718293a4b5c6d7e8f90a1b2c3'
+API_KEY = 'd306zoyjsyarp7ifhu67rjxn52tv0t20'
+
+STATIC_HOST = 'https://a0.muscache.com'
+SEARCH_JS_PATH = '/airbnb/static/packages/web/common/frontend/stays-search/routes/StaysSearchRoute/StaysSearchRoute.prepare.6c1e2b.js'
+PDP_JS_PATH = '/airbnb/static/packages/web/common/frontend/gp-stays-pdp-route/routes/PdpPlatformRoute.prepare.3f9a1d.js'
+ASYNC_REQUIRE_PATH = '/airbnb/static/packages/web/en/frontend/airmetro/src/browser/asyncRequire.8d2c4e.js'
+CHECKOUT_JS_PATH = '/airbnb/static/packages/web/common/frontend/gp-stays-checkout-route/routes/StaysCheckoutRoute/StaysCheckoutCreateRoute.5b7e9f.js'
+
+PAGE_SIZE = 18
+PAGE_COUNT = 15
+
+# ne_lat, ne_lng, sw_lat, sw_lng of the map search market
+MARKET_BBOX = (28.45, -81.35, 28.20, -81.70)
+
+
+def _padding(size, seed=0):
+    rng = random.Random(seed)
+    chunk = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789') for _ in range(64))
+    return ''.join(f'function m{index}(){{return "{chunk}"}};' for index in range(size // 90))
+
+
+def listing_id(page, index):
+    return str(50000000 + page * 1000 + index)
+
+
+def search_result(page, index, skinny=False, room_id=None):
+    room_id = room_id or listing_id(page, index)
+    if skinny:
+        return {
+            "__typename": "SkinnyListingItem",
+            "listingId": room_id,
+        }
+    nightly = 90 + (page * 7 + index * 13) % 400
+    return {
+        "__typename": "StaySearchResult",
+        "listing": {
+            "id": room_id,
+            "title": f"Home in Kissimmee {room_id}",
+            "name": f"Lakefront villa with pool {index}",
+            "avgRatingA11yLabel": f"4.{(index % 9) + 1} out of 5 average rating, {index * 11 + 3} reviews",
+            "contextualPictures": [
+                {"picture": f"https://a0.muscache.com/im/pictures/{room_id}/original.jpeg"},
+                {"picture": f"https://a0.muscache.com/im/pictures/{room_id}/second.jpeg"},
+            ],
+            "formattedBadges": [{"text": "Guest favorite"}] if index % 3 == 0 else [],
+        },
+        "pricingQuote": {
+            "structuredStayDisplayPrice": {
+                "primaryLine": {
+                    "price": f"${nightly}",
+                    "originalPrice": f"${nightly + 25}",
+                },
+                "secondaryLine": {
+                    "price": f"${nightly * 4:,} total",
+                },
+            },
+        },
+    }
+
+
+def search_results(page, skinny_every=6):
+    return [search_result(page, index, skinny=bool(skinny_every) and index % skinny_every == skinny_every - 1)
+            for index in range(PAGE_SIZE)]
+
+
+def page_cursors(page_count=PAGE_COUNT):
+    return [json.dumps({"section_offset": 0, "items_offset": page * PAGE_SIZE, "version": 1}) for page in range(page_count)]
+
+
+def market(size, bbox=MARKET_BBOX, seed=0):
+    ''' size listings as (id, lat, lng) over the box, packed around a few centres the way a
+    real market is, so some parts of the map need many more tiles than others
+    '''
+    rng = random.Random(seed)
+    ne_lat, ne_lng, sw_lat, sw_lng = bbox
+    centres = [(rng.uniform(sw_lat, ne_lat), rng.uniform(sw_lng, ne_lng), rng.uniform(0.02, 0.12)) for _ in range(4)]
+    listings = []
+    for index in range(size):
+        centre_lat, centre_lng, spread = centres[index % len(centres)]
+        lat, lng = ne_lat, ne_lng
+        while not (sw_lat <= lat < ne_lat and sw_lng <= lng < ne_lng):
+            lat = rng.gauss(centre_lat, (ne_lat - sw_lat) * spread)
+            lng = rng.gauss(centre_lng, (ne_lng - sw_lng) * spread)
+        listings.append((str(60000000 + index), lat, lng))
+    return listings
+
+
+def in_bbox(listings, bbox):
+    ne_lat, ne_lng, sw_lat, sw_lng = bbox
+    return [listing for listing in listings if sw_lat <= listing[1] < ne_lat and sw_lng <= listing[2] < ne_lng]
+
+
+def market_results(listings, skinny_every=6):
+    return [search_result(0, index, skinny=bool(skinny_every) and index % skinny_every == skinny_every - 1, room_id=room_id)
+            for index, (room_id, _, _) in enumerate(listings)]
+
+
+def bbox_params(bbox):
+    return [{"filterName": key, "filterValues": [str(value)]} for key, value in zip(('ne_lat', 'ne_lng', 'sw_lat', 'sw_lng'), bbox)]
+
+
+def search_state(page_count=PAGE_COUNT, results=None, raw_params=None):
+    cursors = page_cursors(page_count)
+    return {
+        "niobeMinimalClientData": [[
+            "StaysSearch:{}",
+            {
+                "data": {
+                    "presentation": {
+                        "staysSearch": {
+                            "results": {
+                                "searchResults": search_results(0) if results is None else results,
+                                "paginationInfo": {
+                                    "pageCursors": cursors,
+                                    "nextPageCursor": cursors[1] if page_count > 1 else None,
+                                },
+                                "loggingMetadata": {
+                                    "legacyLoggingContext": {"federatedSearchSessionId": "0c2b7e7a-7f31-4b7c-9d7e-1f2a3b4c5d6e"},
+                                },
+                            },
+                        },
+                    },
+                },
+                "variables": {
+                    "staysSearchRequest": {"requestedPageType": "STAYS_SEARCH", "metadataOnly": False, "rawParams": raw_params or []},
+                    "staysMapSearchRequestV2": {"requestedPageType": "STAYS_SEARCH", "metadataOnly": False, "rawParams": raw_params or []},
+                    "isLeanTreatment": False,
+                },
+            },
+        ]],
+    }
+
+
+def injector_instances(niobe_data=None):
+    spa_data = [
+        ["layout-init", {"layout-init": {"api_config": {"key": API_KEY, "baseUrl": "/api"}}}],
+    ]
+    if niobe_data is not None:
+        spa_data.append(["niobe", {"niobeMinimalClientData": [niobe_data]}])
+    return {"root > core-guest-spa": spa_data}
+
+
+def _html(scripts, deferred_state=None, injector=None, body_size=0):
+    script_tags = ''.join(f'<script src="{STATIC_HOST}{path}" defer="" crossorigin="anonymous"></script>' for path in scripts)
+    deferred_tag = ''
+    if deferred_state is not None:
+        deferred_tag = f'<script id="data-deferred-state-0" data-deferred-state-0="true" type="application/json">{json.dumps(deferred_state)}</script>'
+    injector_tag = ''
+    if injector is not None:
+        injector_tag = f'<script id="data-injector-instances" type="application/json">{json.dumps(injector)}</script>'
+    filler = ''.join(f'<div class="c{index % 7}"><span>{index}</span></div>' for index in range(body_size // 40))
+    return (f'<!doctype html><html lang="en"><head><meta charset="utf-8"><title>Airbnb</title>{script_tags}</head>'
+            f'<body><div id="react-application">{filler}</div>{deferred_tag}{injector_tag}</body></html>')
+
+
+def search_html(page_count=PAGE_COUNT, results=None, raw_params=None):
+    return _html([SEARCH_JS_PATH], deferred_state=search_state(page_count, results, raw_params), injector=injector_instances(), body_size=250000)
+
+
+def search_api_json(page, results=None, page_count=PAGE_COUNT):
+    return json.dumps({
+        "data": {
+            "presentation": {
+                "staysSearch": {
+                    "results": {
+                        "searchResults": search_results(page) if results is None else results,
+                        "paginationInfo": {"pageCursors": page_cursors(page_count)},
+                    },
+                },
+            },
+        },
+    })
+
+
+def pdp_variables(room_id):
+    return {
+        "id": f"StayListing:{room_id}",
+        "pdpSectionsRequest": {
+            "adults": "1",
+            "layouts": ["SIDEBAR", "SINGLE_COLUMN"],
+            "sectionIds": None,
+            "checkIn": "2024-04-01",
+            "checkOut": "2024-04-05",
+        },
+    }
+
+
+def pdp_html(room_id):
+    niobe_data = [f'StaysPdpSections:{json.dumps(pdp_variables(room_id))}', {}]
+    return _html([PDP_JS_PATH, ASYNC_REQUIRE_PATH], injector=injector_instances(niobe_data), body_size=200000)
+
+
+def pdp_sections(room_id, section_ids=None):
+    index = int(room_id) % 1000
+    sections = [
+        {
+            "sectionId": "AMENITIES_DEFAULT",
+            "sectionComponentType": "AMENITIES_DEFAULT",
+            "section": {
+                "seeAllAmenitiesGroups": [
+                    {"title": "Kitchen and dining", "amenities": [
+                        {"title": "Kitchen", "available": True},
+                        {"title": "Microwave", "available": True},
+                        {"title": "Dishwasher", "available": index % 2 == 0},
+                    ]},
+                    {"title": "Outdoor", "amenities": [
+                        {"title": "Private pool", "available": index % 3 != 0},
+                        {"title": "BBQ grill", "available": True},
+                        {"title": "Lake access", "available": True},
+                    ]},
+                    {"title": "Internet and office", "amenities": [
+                        {"title": "Wifi", "available": True},
+                        {"title": "Dedicated workspace", "available": False},
+                    ]},
+                ],
+            },
+        },
+        {
+            "sectionId": "BOOK_IT_CALENDAR_SHEET",
+            "sectionComponentType": "BOOK_IT_CALENDAR_SHEET",
+            "section": {
+                "structuredDisplayPrice": {
+                    "explanationData": {
+                        "priceDetails": [{
+                            "items": [
+                                {"description": "$120 x 4 nights", "priceString": "$480"},
+                                {"description": "Cleaning fee", "priceString": f"${80 + index}"},
+                                {"description": "Airbnb service fee", "priceString": f"${60 + index // 2}"},
+                            ],
+                        }],
+                    },
+                },
+            },
+        },
+        {"sectionId": "POLICIES_DEFAULT", "sectionComponentType": "POLICIES_DEFAULT", "section": {"houseRules": []}},
+        {"sectionId": "BOOK_IT_SIDEBAR", "sectionComponentType": "BOOK_IT_SIDEBAR", "section": {"maxGuestCapacity": 8}},
+    ]
+    if section_ids:
+        sections = [section for section in sections if section.get('sectionId') in section_ids]
+    return json.dumps({
+        "data": {
+            "presentation": {
+                "stayProductDetailPage": {
+                    "sections": {
+                        "metadata": {
+                            "sharingConfig": {
+                                "title": f"Villa in Kissimmee · ★4.9{index % 10} · 4 bedrooms · 6 beds · 3 baths",
+                                "starRating": 4.9,
+                                "reviewCount": 100 + index,
+                                "imageUrl": f"https://a0.muscache.com/im/pictures/{room_id}/original.jpeg",
+                                "personCapacity": 8,
+                                "propertyType": "Entire villa",
+                            },
+                            "seoFeatures": {"ogTags": {"ogDescription": "Lakefront villa with a private pool near the parks."}},
+                            "loggingContext": {
+                                "eventDataLogging": {
+                                    "cleanlinessRating": 4.9,
+                                    "communicationRating": 4.8,
+                                    "locationRating": 4.7,
+                                    "checkinRating": 5.0,
+                                    "accuracyRating": 4.9,
+                                    "listingLat": 28.3399 + index / 10000,
+                                    "listingLng": -81.4883 - index / 10000,
+                                },
+                            },
+                        },
+                        "sbuiData": {
+                            "sectionConfiguration": {
+                                "root": {
+                                    "sections": [
+                                        {"sectionId": "TITLE_DEFAULT", "sectionData": {"title": "Lakefront villa"}},
+                                        {
+                                            "sectionId": "OVERVIEW_DEFAULT_V2",
+                                            "sectionData": {"overviewItems": [
+                                                {"title": "8 guests"},
+                                                {"title": "4 bedrooms"},
+                                                {"title": "6 beds"},
+                                                {"title": "3 baths"},
+                                            ]},
+                                            "loggingData": {"eventData": {"productId": f"DemandStayListing:{room_id}"}},
+                                        },
+                                        {"sectionId": "HOST_OVERVIEW_DEFAULT", "sectionData": {"title": f"Hosted by Host {index}"}},
+                                    ],
+                                },
+                            },
+                        },
+                        "sections": sections,
+                    },
+                },
+            },
+        },
+    })
+
+
+def checkout_json(room_id):
+    index = int(room_id) % 1000
+    nightly = 100 + index % 300
+    return json.dumps({
+        "data": {
+            "presentation": {
+                "stayCheckout": {
+                    "sections": {
+                        "temporaryQuickPayData": {
+                            "bootstrapPayments": {
+                                "productPriceBreakdown": {
+                                    "priceBreakdown": {
+                                        "priceItems": [{
+                                            "localizedTitle": f"${nightly} x 4 nights",
+                                            "total": {"amountFormatted": f"${nightly * 4}.00"},
+                                        }],
+                                    },
+                                },
+                            },
+                        },
+                    },
+                },
+            },
+        },
+    })
+
+
+def calendar_json(room_id, month, year, count=12):
+    index = int(room_id) % 1000
+    months = []
+    for offset in range(count):
+        month_index = (month - 1 + offset) % 12
+        month_year = year + (month - 1 + offset) // 12
+        days_in_month = calendar.monthrange(month_year, month_index + 1)[1]
+        days = []
+        for day in range(1, days_in_month + 1):
+            # a listing is booked on a stretch of days that moves with its id
+            available = (day + index) % 7 not in (0, 1)
+            nightly = 100 + index % 300 + (20 if day % 7 in (5, 6) else 0)
+            days.append({
+                "__typename": "MerlinCalendarDay",
+                "calendarDate": f"{month_year}-{month_index + 1:02d}-{day:02d}",
+                "available": available,
+                "maxNights": 365,
+                "minNights": 2 + index % 3,
+                "availableForCheckin": available,
+                "availableForCheckout": True,
+                "bookable": available,
+                "price": {"__typename": "MerlinCalendarPrice", "localPriceFormatted": f"${nightly}" if available else None},
+            })
+        months.append({"__typename": "MerlinCalendarMonth", "month": month_index + 1, "year": month_year, "days": days})
+    return json.dumps({
+        "data": {
+            "merlin": {
+                "__typename": "MerlinQuery",
+                "pdpAvailabilityCalendar": {
+                    "__typename": "MerlinPdpAvailabilityCalendar",
+                    "calendarMonths": months,
+                },
+            },
+        },
+    })
+
+
+def search_js():
+    return _padding(400000, 1) + f"{{name:'StaysSearch',type:'query',operationId:'{SEARCH_OPERATION_ID}'}};" + _padding(100000, 2)
+
+
+def pdp_js():
+    return (_padding(300000, 3) + f"{{name:'StaysPdpSections',type:'query',operationId:'{PDP_OPERATION_ID}'}};"
+            + f"{{name:'PdpAvailabilityCalendar',type:'query',operationId:'{CALENDAR_OPERATION_ID}'}};" + _padding(100000, 4))
+
+
+def async_require_js():
+    return _padding(200000, 5) + f'"{CHECKOUT_JS_PATH.replace("/airbnb/static/packages/web/", "")}";' + _padding(50000, 6)
+
+
+def checkout_js():
+    return _padding(300000, 7) + f"{{name:'stayCheckout',type:'query',operationId:'{CHECKOUT_OPERATION_ID}'}};" + _padding(50000, 8)
+
+
+def load(name, generate):
+    ''' Returns the captured fixture when there is one, otherwise the generated one
+    '''
+    path = os.path.join(FIXTURES_DIR, name)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='UTF-8') as file:
+            return file.read()
+    return generate()
@@ -0,0 +1,257 @@
+''' End to end load test of the crawler against the local mock server.
+
+    python -m benchmarks.load_test --pages 5 --detail-concurrency 8 --max-in-flight 16
+    python -m benchmarks.load_test --target strategy --block-rate 0.02 --error-rate 0.05
+    python -m benchmarks.load_test --market-size 2000 --tiles --tile-concurrency 8 --search-only
+    python -m benchmarks.load_test --target sweep --sweep-days 7 --stay-length 4 --detail-concurrency 8
+    python -m benchmarks.load_test --detail-cache --warm --detail-concurrency 8
+    python -m benchmarks.load_test --target refresh --warm --price-concurrency 8
+    python -m benchmarks.load_test --target calendar --warm --price-concurrency 8
+
+All airbnb hosts are routed to the mock server, the operation id cache is started empty,
+and the run reports throughput, p50/p99 latency and retries per request type.
+'''
+import argparse
+import datetime
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+from benchmarks import fixtures
+from benchmarks.mock_server import MockAirbnb, request_type
+from scraper import main as scraper_main
+from scraper import availability, price_refresh, sweep
+from scraper.strategies.airbnb_com.calendar_page import AirbnbComCalendarStrategy
+from scraper.strategies.airbnb_com.detail_page import AirbnbComDetailStrategy
+from scraper.strategies.airbnb_com.search_page import AirbnbComSearchStrategy
+from scraper.utils.detail_cache import configure_detail_cache
+from scraper.utils.http_cache import configure_cache
+from scraper.utils.http_curl import add_request_hook, configure_host_overrides, configure_proxies, connection_stats, remove_request_hook
+from scraper.utils.operation_cache import operation_cache
+from scraper.utils.rate_limit import configure_rate_limiter
+
+SEARCH_URL = 'https://www.airbnb.com/s/Kissimmee--Florida--United-States/homes?adults=2&checkin=2024-04-01&checkout=2024-04-05'
+MAP_SEARCH_URL = (SEARCH_URL + '&ne_lat={}&ne_lng={}&sw_lat={}&sw_lng={}&zoom=11&search_by_map=true').format(*fixtures.MARKET_BBOX)
+
+logger = logging.getLogger('load_test')
+
+
+class RequestRecorder:
+
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def __call__(self, method, url, outcome, elapsed):
+        with self._lock:
+            self.records.append((request_type(urlparse(url).path), elapsed, dict(outcome)))
+
+    def report(self):
+        report = {}
+        kinds = sorted(set(kind for kind, _, _ in self.records))
+        for kind in kinds:
+            records = [(elapsed, outcome) for record_kind, elapsed, outcome in self.records if record_kind == kind]
+            timings = sorted(elapsed * 1000 for elapsed, _ in records)
+            report[kind] = {
+                'requests': len(records),
+                'p50_ms': round(percentile(timings, 50), 1),
+                'p99_ms': round(percentile(timings, 99), 1),
+                'mean_ms': round(statistics.mean(timings), 1),
+                'retries': sum(max(0, outcome.get('attempts', 0) - 1) for _, outcome in records),
+                'failed': len([1 for _, outcome in records if outcome.get('status_code') not in (200, 201)]),
+            }
+        return report
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(percent / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def run(args):
+    work_dir = tempfile.mkdtemp(prefix='load_test_')
+    operation_cache.path = os.path.join(work_dir, 'operation_ids.json')
+    operation_cache.clear()
+    configure_cache(mode='off')
+    # the refresh and calendar targets keep their bootstrap in the detail cache, it is always on for them
+    detail_cache = 'on' if args.detail_cache or args.target in ('refresh', 'calendar') else 'off'
+    configure_detail_cache(mode=detail_cache, path=os.path.join(work_dir, 'details.sqlite3'))
+    rate_limiter = configure_rate_limiter(rate=args.rate, burst=max(1, int(args.rate)))
+
+    mock = MockAirbnb(page_count=args.pages, latency_scale=args.latency_scale, block_rate=args.block_rate,
+                      block_burst=args.block_burst, error_rate=args.error_rate, seed=args.seed,
+                      market_size=args.market_size)
+    search_url = MAP_SEARCH_URL if args.market_size else SEARCH_URL
+    recorder = RequestRecorder()
+    with mock:
+        configure_host_overrides({'www.airbnb.com': mock.base_url, 'a0.muscache.com': mock.base_url})
+        # the mock also answers proxy style requests, the user part only tells the proxies apart
+        host_port = mock.base_url.split('://', 1)[1]
+        configure_proxies([f'http://proxy{index}@{host_port}' for index in range(args.proxies)],
+                          cooldown=args.proxy_cooldown)
+        if args.warm:
+            # an unmeasured crawl first, so the measured one sees warm caches like a repeat run
+            crawl(args, search_url, work_dir)
+        add_request_hook(recorder)
+        started = time.perf_counter()
+        try:
+            items = crawl(args, search_url, work_dir)
+        finally:
+            elapsed = time.perf_counter() - started
+            remove_request_hook(recorder)
+            stats = connection_stats()
+            configure_host_overrides({})
+            configure_proxies([])
+
+    requests = len(recorder.records)
+    return {
+        'target': args.target,
+        'wall_seconds': round(elapsed, 2),
+        'items': items,
+        'items_per_sec': round(items / elapsed, 2) if elapsed else None,
+        'requests': requests,
+        'requests_per_sec': round(requests / elapsed, 2) if elapsed else None,
+        'per_type': recorder.report(),
+        'served': mock.stats,
+        'connection_stats': stats,
+        'rate_limits': rate_limiter.stats(),
+    }
+
+
+def crawl(args, search_url, work_dir):
+    if args.target == 'main':
+        crawl_data = scraper_main.execute({
+            "property_preset": {"label": "load test", "url": search_url, "query": {}},
+            "detail_concurrency": args.detail_concurrency,
+            "max_in_flight": args.max_in_flight,
+            "output_dir": os.path.join(work_dir, 'output'),
+            "output_formats": ['jsonl'],
+            "fields": args.fields,
+            "search_only": args.search_only,
+            "page_concurrency": args.page_concurrency,
+            "tiles": args.tiles,
+            "tile_concurrency": args.tile_concurrency,
+            # the mock stops paginating at --pages like airbnb does at 15
+            "tile_page_cap": args.pages,
+        })
+        return crawl_data.get('count', 0)
+    elif args.target == 'sweep':
+        summary = sweep.execute({
+            "property_preset": {"label": "load test", "url": search_url, "query": {}},
+            "start_date": '2024-04-01',
+            "end_date": (datetime.date(2024, 4, 1) + datetime.timedelta(days=args.sweep_days - 1)).isoformat(),
+            "stay_lengths": args.stay_lengths or [4],
+            "window_concurrency": args.window_concurrency,
+            "detail_concurrency": args.detail_concurrency,
+            "page_concurrency": args.page_concurrency,
+            "fields": args.fields,
+            "output_dir": os.path.join(work_dir, 'output'),
+        })
+        return sum(window.get('count', 0) for window in summary.get('windows', []))
+    elif args.target == 'refresh':
+        # every run starts like a new process, the price context has to come from the cache
+        AirbnbComDetailStrategy.price_context = None
+        listing_ids = [fixtures.listing_id(page, index) for page in range(1, args.pages + 1) for index in range(fixtures.PAGE_SIZE)]
+        summary = price_refresh.execute({
+            "listing_ids": listing_ids,
+            "checkin": '2024-05-01',
+            "checkout": '2024-05-05',
+            "adults": 2,
+            "price_concurrency": args.price_concurrency,
+            "output_dir": os.path.join(work_dir, 'output'),
+            "output_formats": ['jsonl'],
+        })
+        return summary.get('priced', 0)
+    elif args.target == 'calendar':
+        AirbnbComCalendarStrategy.calendar_context = None
+        listing_ids = [fixtures.listing_id(page, index) for page in range(1, args.pages + 1) for index in range(fixtures.PAGE_SIZE)]
+        summary = availability.execute({
+            "listing_ids": listing_ids,
+            "start_date": '2024-04-01',
+            "calendar_concurrency": args.price_concurrency,
+            "output_dir": os.path.join(work_dir, 'output'),
+        })
+        return summary.get('count', 0)
+    else:
+        strategy = AirbnbComSearchStrategy(logger)
+        items = 0
+        for _ in strategy.iter_execute({
+            "url": search_url,
+            "detail_concurrency": args.detail_concurrency,
+            "max_in_flight": args.max_in_flight,
+            "fields": args.fields,
+            "search_only": args.search_only,
+            "page_concurrency": args.page_concurrency,
+            "tiles": args.tiles,
+            "tile_concurrency": args.tile_concurrency,
+            # the mock stops paginating at --pages like airbnb does at 15
+            "tile_page_cap": args.pages,
+        }):
+            items += 1
+        return items
+
+
+def print_report(report):
+    print(f'target {report["target"]}: {report["items"]} items in {report["wall_seconds"]}s '
+          f'({report["items_per_sec"]} items/s, {report["requests_per_sec"]} requests/s)')
+    print(f'{"type":<14} {"requests":>9} {"p50 ms":>9} {"p99 ms":>9} {"retries":>8} {"failed":>7}')
+    for kind, stats in report['per_type'].items():
+        print(f'{kind:<14} {stats["requests"]:>9} {stats["p50_ms"]:>9.1f} {stats["p99_ms"]:>9.1f} '
+              f'{stats["retries"]:>8} {stats["failed"]:>7}')
+    connection = dict(report['connection_stats'])
+    proxies = connection.pop('proxies', {})
+    print(f'connections {connection}')
+    for proxy, stats in proxies.items():
+        print(f'proxy {proxy} {stats}')
+    for host, stats in report['rate_limits'].items():
+        print(f'rate limit {host} {stats}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the crawler against a local mock airbnb')
+    parser.add_argument('--target', choices=['main', 'strategy', 'sweep', 'refresh', 'calendar'], default='main')
+    parser.add_argument('--pages', type=int, default=3)
+    parser.add_argument('--detail-concurrency', type=int, default=1)
+    parser.add_argument('--max-in-flight', type=int, default=8)
+    parser.add_argument('--page-concurrency', type=int, default=1)
+    parser.add_argument('--latency-scale', type=float, default=0.2)
+    parser.add_argument('--block-rate', type=float, default=0.0)
+    parser.add_argument('--block-burst', type=int, default=5)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--proxies', type=int, default=0, help='spread the requests over this many proxies')
+    parser.add_argument('--proxy-cooldown', type=float, default=2, help='seconds a blocked proxy sits out')
+    parser.add_argument('--rate', type=float, default=50, help='requests per second allowed per host')
+    parser.add_argument('--field', action='append', dest='fields', help='only crawl these output fields')
+    parser.add_argument('--search-only', action='store_true')
+    parser.add_argument('--market-size', type=int, default=0, help='crawl a map search over this many listings')
+    parser.add_argument('--tiles', action='store_true', help='cut the map search into tiles')
+    parser.add_argument('--tile-concurrency', type=int, default=4)
+    parser.add_argument('--sweep-days', type=int, default=3, help='check in days of the sweep target')
+    parser.add_argument('--stay-length', type=int, action='append', dest='stay_lengths', help='nights of the sweep target')
+    parser.add_argument('--window-concurrency', type=int, default=4)
+    parser.add_argument('--detail-cache', action='store_true', help='keep the listing details in a sqlite cache')
+    parser.add_argument('--price-concurrency', type=int, default=8, help='listings done at once by the refresh and calendar targets')
+    parser.add_argument('--warm', action='store_true', help='crawl once before the measured run')
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=4))
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,269 @@
+''' A local stand in for airbnb serving the fixtures.
+
+It answers the search page, the paginated StaysSearch api, PDP pages, StaysPdpSections,
+stayCheckout, PdpAvailabilityCalendar and the js bundles holding the operation ids. With a market_size, map searches
+only return the listings of their box, up to page_count pages like the real result cap. Latency, 429/403/401 block bursts
+and 5xx errors can be injected to see how the crawler behaves under pressure.
+'''
+import json
+import random
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks import fixtures
+
+# mean latency in ms per request type, scaled by latency_scale
+LATENCY_MS = {
+    'search_html': 250,
+    'search_api': 180,
+    'pdp_html': 200,
+    'pdp_sections': 150,
+    'checkout': 180,
+    'calendar': 150,
+    'js': 40,
+}
+
+STATIC_FILES = {
+    fixtures.SEARCH_JS_PATH: fixtures.search_js,
+    fixtures.PDP_JS_PATH: fixtures.pdp_js,
+    fixtures.ASYNC_REQUIRE_PATH: fixtures.async_require_js,
+    fixtures.CHECKOUT_JS_PATH: fixtures.checkout_js,
+}
+
+
+def request_type(path):
+    if path.startswith('/s/'):
+        return 'search_html'
+    if path.startswith('/rooms/'):
+        return 'pdp_html'
+    if path.startswith('/api/v3/StaysSearch'):
+        return 'search_api'
+    if path.startswith('/api/v3/StaysPdpSections'):
+        return 'pdp_sections'
+    if path.startswith('/api/v3/stayCheckout'):
+        return 'checkout'
+    if path.startswith('/api/v3/PdpAvailabilityCalendar'):
+        return 'calendar'
+    if path.endswith('.js'):
+        return 'js'
+    return 'other'
+
+
+class MockAirbnb:
+
+    def __init__(self, host='127.0.0.1', port=0, page_count=fixtures.PAGE_COUNT, latency_scale=1.0,
+                 block_rate=0.0, block_burst=5, error_rate=0.0, seed=0, market_size=0):
+        self.page_count = page_count
+        self.market = fixtures.market(market_size, seed=seed) if market_size else None
+        self.latency_scale = latency_scale
+        self.block_rate = block_rate
+        self.block_burst = block_burst
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.stats = {}
+        self._block_remaining = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), MockHandler)
+        self.server.daemon_threads = True
+        self.server.mock = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def record(self, kind, status):
+        with self._lock:
+            counts = self.stats.setdefault(kind, {})
+            counts[status] = counts.get(status, 0) + 1
+
+    def fault(self, kind):
+        ''' Returns the status to fail the request with, if any
+        '''
+        if kind == 'js':
+            return None
+        with self._lock:
+            if self._block_remaining:
+                self._block_remaining -= 1
+                return 403 if self._block_remaining % 2 else 401
+            if self.block_rate and self.random.random() < self.block_rate:
+                # a burst opens with a rate limit answer carrying Retry-After
+                self._block_remaining = self.block_burst - 1
+                return 429
+            if self.error_rate and self.random.random() < self.error_rate:
+                return self.random.choice([500, 502, 503])
+        return None
+
+    def latency(self, kind):
+        mean = LATENCY_MS.get(kind, 50) * self.latency_scale / 1000
+        with self._lock:
+            return max(0.0, self.random.gauss(mean, mean / 4))
+
+    def respond(self, method, path, query, body):
+        ''' Returns (status, content type, body) for a request
+        '''
+        params = parse_qs(query)
+        if path in STATIC_FILES:
+            return 200, 'application/javascript', static_file(path)
+
+        if path.startswith('/s/'):
+            bbox = query_bbox({key: values[0] for key, values in params.items()})
+            if self.market is not None and bbox:
+                listings, page_count = self.market_page(bbox, 0)
+                return 200, 'text/html; charset=utf-8', fixtures.search_html(page_count, fixtures.market_results(listings),
+                                                                             fixtures.bbox_params(bbox))
+            return 200, 'text/html; charset=utf-8', search_html(self.page_count)
+
+        if path.startswith('/rooms/'):
+            return 200, 'text/html; charset=utf-8', pdp_html(path.rstrip('/').split('/')[-1])
+
+        if path.startswith('/api/v3/StaysSearch/'):
+            payload = json.loads(body or '{}')
+            if not self.known_operation(path, fixtures.SEARCH_OPERATION_ID):
+                return persisted_query_not_found()
+            cursor = payload.get('variables', {}).get('staysSearchRequest', {}).get('cursor')
+            page = json.loads(cursor).get('items_offset', 0) // fixtures.PAGE_SIZE if cursor else 0
+            raw_params = payload.get('variables', {}).get('staysSearchRequest', {}).get('rawParams') or []
+            bbox = query_bbox({param.get('filterName'): (param.get('filterValues') or [None])[0] for param in raw_params})
+            if self.market is not None and bbox:
+                listings, page_count = self.market_page(bbox, page)
+                return 200, 'application/json', fixtures.search_api_json(page, fixtures.market_results(listings), page_count)
+            return 200, 'application/json', fixtures.search_api_json(page)
+
+        if path.startswith('/api/v3/StaysPdpSections/'):
+            if not self.known_operation(path, fixtures.PDP_OPERATION_ID):
+                return persisted_query_not_found()
+            variables = json.loads(params.get('variables', ['{}'])[0])
+            room_id = variables.get('id', '').split(':')[-1]
+            section_ids = variables.get('pdpSectionsRequest', {}).get('sectionIds')
+            return 200, 'application/json', fixtures.pdp_sections(room_id, section_ids)
+
+        if path.startswith('/api/v3/stayCheckout/'):
+            if not self.known_operation(path, fixtures.CHECKOUT_OPERATION_ID):
+                return persisted_query_not_found()
+            variables = json.loads(params.get('variables', ['{}'])[0])
+            product_id = str(variables.get('input', {}).get('productId') or '')
+            return 200, 'application/json', fixtures.checkout_json(product_id.split(':')[-1] or '0')
+
+        if path.startswith('/api/v3/PdpAvailabilityCalendar/'):
+            if not self.known_operation(path, fixtures.CALENDAR_OPERATION_ID):
+                return persisted_query_not_found()
+            request = json.loads(params.get('variables', ['{}'])[0]).get('request', {})
+            return 200, 'application/json', fixtures.calendar_json(str(request.get('listingId') or '0'), int(request.get('month') or 1),
+                                                                   int(request.get('year') or 2024), int(request.get('count') or 12))
+
+        return 404, 'text/plain', 'not found'
+
+    def known_operation(self, path, operation_id):
+        return path.rstrip('/').split('/')[-1] == operation_id
+
+    def market_page(self, bbox, page):
+        ''' The listings of one page of a map search and its page count, capped at page_count
+        '''
+        listings = fixtures.in_bbox(self.market, bbox)[:self.page_count * fixtures.PAGE_SIZE]
+        page_count = -(-len(listings) // fixtures.PAGE_SIZE)
+        return listings[page * fixtures.PAGE_SIZE:(page + 1) * fixtures.PAGE_SIZE], page_count
+
+
+def query_bbox(params):
+    try:
+        return tuple(float(params[key]) for key in ('ne_lat', 'ne_lng', 'sw_lat', 'sw_lng'))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def persisted_query_not_found():
+    return 400, 'application/json', json.dumps({"errors": [{"message": "PersistedQueryNotFound"}]})
+
+
+@lru_cache(maxsize=None)
+def static_file(path):
+    return STATIC_FILES[path]()
+
+
+@lru_cache(maxsize=4)
+def search_html(page_count):
+    return fixtures.search_html(page_count)
+
+
+@lru_cache(maxsize=2048)
+def pdp_html(room_id):
+    return fixtures.pdp_html(room_id)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def handle_request(self, method):
+        mock = self.server.mock
+        parsed = urlparse(self.path)
+        kind = request_type(parsed.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('UTF-8') if length else ''
+
+        time.sleep(mock.latency(kind))
+        status = mock.fault(kind)
+        if status:
+            content_type, content = 'application/json', json.dumps({"error": status})
+        else:
+            try:
+                status, content_type, content = mock.respond(method, parsed.path, parsed.query, body)
+            except Exception as e:
+                status, content_type, content = 500, 'text/plain', str(e)
+        mock.record(kind, status)
+
+        data = content.encode('UTF-8')
+        self.send_response(status)
+        if status == 429:
+            self.send_header('Retry-After', '1')
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serve the airbnb fixtures locally')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--pages', type=int, default=fixtures.PAGE_COUNT)
+    parser.add_argument('--latency-scale', type=float, default=1.0)
+    parser.add_argument('--block-rate', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--market-size', type=int, default=0, help='listings spread over the map searches')
+    args = parser.parse_args()
+
+    mock = MockAirbnb(port=args.port, page_count=args.pages, latency_scale=args.latency_scale,
+                      block_rate=args.block_rate, error_rate=args.error_rate, market_size=args.market_size)
+    print(f'Serving on {mock.base_url}, point HTTP_HOST_OVERRIDES at it for www.airbnb.com and a0.muscache.com')
+    mock.server.serve_forever()
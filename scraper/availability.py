@@ -0,0 +1,98 @@
+import argparse
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from scraper import main
+from scraper.price_refresh import ROOM_URL, ContextRefresh, load_listing_ids
+from scraper.strategies.airbnb_com.calendar_page import AirbnbComCalendarStrategy, CALENDAR_COLUMNS, CALENDAR_MONTHS
+from scraper.utils.http_curl import connection_stats
+from scraper.utils.sinks import MultiSink
+
+logger = logging.getLogger()
+
+
+def execute(config):
+    ''' Reads the availability calendar of known listings.
+
+    Every listing costs one PdpAvailabilityCalendar request covering config['months'] months
+    from config['start_date'], the PDP bundle and api key it needs are learned from the first
+    PDP page and kept in the detail cache. Each listing becomes one row holding a
+    [date, available, min_nights, price] array. The listings run on a pool of
+    config['calendar_concurrency'] workers.
+    '''
+    main.configure_runtime(config)
+
+    listing_ids = [str(listing_id) for listing_id in config.get('listing_ids') or []]
+    start_date = config.get('start_date')
+    months = config.get('months') or CALENDAR_MONTHS
+
+    timestamp = int(datetime.timestamp(datetime.now()))
+    output_dir = config.get('output_dir') or os.path.join(os.path.dirname(main.__file__), main.output_path)
+    output_formats = config.get('output_formats') or ['jsonl']
+    file_title = f'calendar_{timestamp}'
+    sink = MultiSink.create(output_formats, output_dir, {key: file_title for key in ['json', 'jsonl']}, [])
+    logger.info(f'[*] Writing to files: {", ".join(sink.files)}')
+
+    run_started = str(datetime.now())
+    sink.open({"calendar_columns": CALENDAR_COLUMNS, "run_start": run_started})
+    found = 0
+    context_refresh = ContextRefresh()
+    workers = max(1, min(config.get('calendar_concurrency', 8), len(listing_ids) or 1))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for row in executor.map(lambda listing_id: _listing_calendar(listing_id, start_date, months, context_refresh), listing_ids):
+            if row:
+                sink.write_items([row])
+                found += 1
+    run_finished = str(datetime.now())
+    sink.close({"run_finish": run_finished})
+
+    return {
+        "run_start": run_started,
+        "run_finish": run_finished,
+        "listings": len(listing_ids),
+        "count": found,
+        "files": sink.files,
+        "connection_stats": connection_stats(),
+    }
+
+
+def _listing_calendar(listing_id, start_date, months, context_refresh):
+    config = {"url": ROOM_URL.format(listing_id), "start_date": start_date, "months": months}
+
+    def run(refresh_context=False):
+        strategy = AirbnbComCalendarStrategy(logger)
+        data = strategy.execute(dict(config, refresh_context=refresh_context))
+        return data, strategy.context_rejected
+
+    data = {}
+    try:
+        data, rejected = run()
+        if rejected:
+            # the kept PDP bundle or api key went stale after a deploy, an empty calendar is left as is
+            logger.info(f'[*] Listing {listing_id} was rejected, refreshing the calendar context')
+            data = context_refresh.retry(run) or data
+    except Exception as e:
+        logger.info(f'[*] Listing {listing_id} failed {str(e)}')
+    return data
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Read the availability calendar of known listings with one request per listing')
+    parser.add_argument('--listing-id', action='append', dest='listing_ids', default=[])
+    parser.add_argument('--listings-file', default=None, help='one listing id or room url per line')
+    parser.add_argument('--start-date', default=None, help='YYYY-MM-DD, today when left out')
+    parser.add_argument('--months', type=int, default=CALENDAR_MONTHS)
+    parser.add_argument('--calendar-concurrency', type=int, default=8)
+    parser.add_argument('--max-in-flight', type=int, default=16)
+    parser.add_argument('--detail-cache', choices=['off', 'on'], default=None, help='keep the PDP bundle and api key for the next runs')
+    parser.add_argument('--output-dir', default=None)
+    parser.add_argument('--output-format', action='append', dest='output_formats', choices=['json', 'jsonl'])
+    parser.add_argument('--log-level', default='INFO')
+    args = parser.parse_args()
+
+    listing_ids = args.listing_ids + (load_listing_ids(args.listings_file) if args.listings_file else [])
+    summary = execute(dict(vars(args), listing_ids=listing_ids))
+    print(json.dumps({key: value for key, value in summary.items() if key != 'connection_stats'}, indent=4))
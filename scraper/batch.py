@@ -0,0 +1,109 @@
+import argparse
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from scraper import main
+from scraper.utils.http_curl import connection_stats
+
+logger = logging.getLogger()
+
+
+def execute(config):
+    ''' Crawls every profile of the target profiles file in one process.
+
+    Profiles run on a thread pool of config['profile_concurrency'] workers, each one enriches
+    its listings with config['detail_concurrency'] workers, and config['max_in_flight'] caps
+    the requests in flight across all of them. Every profile gets its own output folder and
+    the run ends with a summary.json next to them.
+    '''
+    profiles = config.get('profiles') or main.load_profiles(config.get('profiles_file'))
+    labels = config.get('labels')
+    if labels:
+        profiles = [profile for profile in profiles if profile.get('label') in labels]
+
+    main.configure_runtime(config)
+
+    timestamp = int(datetime.timestamp(datetime.now()))
+    output_dir = config.get('output_dir') or os.path.join(os.path.dirname(main.__file__), main.output_path, f'batch_{timestamp}')
+    os.makedirs(output_dir, exist_ok=True)
+
+    run_started = str(datetime.now())
+    workers = max(1, min(config.get('profile_concurrency', 4), len(profiles) or 1))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run_profile, index, profile, config, output_dir) for index, profile in enumerate(profiles)]
+        results = [future.result() for future in futures]
+    run_finished = str(datetime.now())
+
+    summary = {
+        "run_start": run_started,
+        "run_finish": run_finished,
+        "profiles": len(results),
+        "succeeded": len([result for result in results if result.get('status') == 'ok']),
+        "failed": len([result for result in results if result.get('status') != 'ok']),
+        "items": sum([result.get('count', 0) for result in results]),
+        "connection_stats": connection_stats(),
+        "results": results,
+    }
+    with open(os.path.join(output_dir, 'summary.json'), 'w', encoding='UTF-8') as file:
+        logger.info(f'[*] Writing to file: {os.path.join(output_dir, "summary.json")}')
+        file.write(json.dumps(summary, indent=4))
+
+    return summary
+
+
+def _run_profile(index, profile, config, output_dir):
+    label = profile.get('label', '')
+    folder = re.sub(r'[^a-z0-9_]', '', '_'.join(label.lower().split())) or 'profile'
+    profile_config = {
+        "property_preset": profile,
+        "detail_concurrency": config.get('detail_concurrency', 1),
+        "max_in_flight": config.get('max_in_flight'),
+        "fields": config.get('fields'),
+        "search_only": config.get('search_only', False),
+        "resume": config.get('resume', False),
+        "page_concurrency": config.get('page_concurrency', 1),
+        "tiles": config.get('tiles', False),
+        "tile_concurrency": config.get('tile_concurrency', 4),
+        "output_dir": os.path.join(output_dir, f'{index:03d}_{folder}'),
+    }
+    if config.get('output_formats'):
+        profile_config.update({"output_formats": config.get('output_formats')})
+
+    result = {"label": label, "url": profile.get('url')}
+    try:
+        logger.info(f'[*] Crawling profile {label}')
+        crawl_data = main.execute(profile_config)
+        result.update(crawl_data)
+        result.update({"status": "ok", "output_dir": profile_config.get('output_dir')})
+    except Exception as e:
+        logger.info(f'[*] Profile {label} failed {str(e)}')
+        result.update({"status": "failed", "error": str(e)})
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Crawl every profile of the target profiles file')
+    parser.add_argument('--profiles-file', default=None)
+    parser.add_argument('--label', action='append', dest='labels')
+    parser.add_argument('--profile-concurrency', type=int, default=4)
+    parser.add_argument('--detail-concurrency', type=int, default=4)
+    parser.add_argument('--max-in-flight', type=int, default=16)
+    parser.add_argument('--page-concurrency', type=int, default=1, help='search pages fetched at once after page 1')
+    parser.add_argument('--output-format', action='append', dest='output_formats', help='json, jsonl, csv or sqlite')
+    parser.add_argument('--store', default=None, help='sqlite file the sqlite output format records the crawls in')
+    parser.add_argument('--http-cache', choices=['off', 'record', 'replay'], default=None)
+    parser.add_argument('--detail-cache', choices=['off', 'on'], default=None, help='reuse the listing details of earlier runs')
+    parser.add_argument('--field', action='append', dest='fields', help='only crawl these output fields')
+    parser.add_argument('--search-only', action='store_true', help='skip the detail page of full search results')
+    parser.add_argument('--resume', action='store_true', help='checkpoint every page and carry on from the last one an earlier run finished')
+    parser.add_argument('--tiles', action='store_true', help='cut map searches into tiles to get past the result cap')
+    parser.add_argument('--tile-concurrency', type=int, default=4, help='tiles crawled at once')
+    parser.add_argument('--log-level', default='INFO')
+    args = parser.parse_args()
+
+    summary = execute(vars(args))
+    print(json.dumps({key: value for key, value in summary.items() if key != 'results'}, indent=4))
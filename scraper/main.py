@@ -1,24 +1,69 @@
+import json
 import logging
 import os
-import csv
-import json
 from datetime import datetime
 from urllib.parse import urlparse
 
 from scraper.utils.url_generator import generate_query_url
+from scraper.utils.http_curl import configure_host_overrides, configure_pool, configure_proxies, connection_stats
+from scraper.utils.http_cache import configure_cache, get_cache
+from scraper.utils.detail_cache import configure_detail_cache, get_detail_cache
+from scraper.utils.rate_limit import configure_rate_limiter
+from scraper.utils.sinks import MultiSink
+from scraper.utils.store import configure_store
 from scraper.factory import StrategyFactory
 
 output_path = 'output'
 target_file = 'target_profiles.json'
 
 logger = logging.getLogger()
+
+
+def load_profiles(path=None):
+    if path is None:
+        path = os.path.join(os.path.dirname(__file__), target_file)
+    with open(path, 'r', encoding='UTF-8') as file:
+        return json.load(file).get('profiles', [])
+
+
+def configure_runtime(config):
+    ''' Sets up the process wide pieces every entry point shares from its config: the session
+    pool, response and detail caches, listing store, rate limiter, proxies, host overrides and
+    logging. Keys left out keep what is configured already
+    '''
+    log_level = config.get('log_level')
+    if log_level:
+        logging.basicConfig(level=log_level)
+    max_in_flight = config.get('max_in_flight') or config.get('pool_size')
+    if max_in_flight:
+        configure_pool(max_in_flight)
+    # a cache already in the mode asked for is kept, with whatever path it was given
+    http_cache = config.get('http_cache')
+    if http_cache and get_cache().mode != http_cache:
+        configure_cache(mode=http_cache)
+    detail_cache = config.get('detail_cache')
+    if detail_cache and get_detail_cache().mode != detail_cache:
+        configure_detail_cache(mode=detail_cache)
+    store = config.get('store')
+    if store:
+        configure_store(path=store)
+    rate_limit = config.get('rate_limit')
+    if rate_limit:
+        configure_rate_limiter(**rate_limit)
+    proxies = config.get('proxies')
+    if proxies:
+        configure_proxies(proxies)
+    host_overrides = config.get('host_overrides')
+    if host_overrides:
+        configure_host_overrides(host_overrides)
+
+
 def execute(config):
     
     path_to_file = os.path.dirname(__file__)
 
 
-    results = []
-    crawl_data = {}
+    configure_runtime(config)
     profile = config.get('property_preset')
     url = profile.get('url')
     parsed = urlparse(url)
@@ -27,39 +72,63 @@ def execute(config):
     query = profile.get('query')
     if query:
         url = generate_query_url(url, **query)
-    crawl_started = str(datetime.now())
-    data = strategy.execute(config={"url": url})
-    crawl_finished = str(datetime.now())
+
     timestamp = int(datetime.timestamp(datetime.now()))
-    items_data = [item for items in data for item in items]
+    file_title = '_'.join(profile.get('label','').lower().split()) + f'_{timestamp}'
+    target_out_file_path = config.get('output_dir') or os.path.join(path_to_file, output_path)
+    output_formats = config.get('output_formats', ['json', 'csv'])
+    basenames = {
+        'json': f'{timestamp}',
+        'jsonl': file_title,
+        'csv': file_title,
+    }
+    sink = MultiSink.create(output_formats, target_out_file_path, basenames, strategy.selected_fields(config.get('fields')),
+                            profile=profile.get('label'))
+    logger.info(f'[*] Writing to files: {", ".join(sink.files)}')
+
+    # the items are only kept in memory for callers that read them off the result
+    collected = [] if config.get('collect') else None
+    crawl_started = str(datetime.now())
+    sink.open({
+        "url": url,
+        "file": f"{timestamp}.json",
+        "crawl_start": crawl_started,
+    })
+    try:
+        items = strategy.iter_execute(config={
+            "url": url,
+            "detail_concurrency": config.get('detail_concurrency', 1),
+            "max_in_flight": config.get('max_in_flight'),
+            "fields": config.get('fields'),
+            "search_only": config.get('search_only', False),
+            "resume": config.get('resume', False),
+            "page_concurrency": config.get('page_concurrency', 1),
+            "tiles": config.get('tiles', False),
+            "tile_concurrency": config.get('tile_concurrency', 4),
+            "tile_page_cap": config.get('tile_page_cap'),
+        })
+        for item in items:
+            sink.write_items([item])
+            if collected is not None:
+                collected.append(item)
+    finally:
+        crawl_finished = str(datetime.now())
+        sink.close({
+            "crawl_finish": crawl_finished,
+        })
+    logger.info(f'[*] Connection stats: {connection_stats()}')
+    if get_detail_cache().enabled:
+        logger.info(f'[*] Detail cache stats: {get_detail_cache().stats}')
+
     crawl_data = {
         "url": url,
         "file": f"{timestamp}.json",
+        "files": sink.files,
         "crawl_start": crawl_started ,
         "crawl_finish": crawl_finished,
-        "result": items_data,
+        "count": sink.count,
     }
-    # items_data = [item for items in data for item in items]
-
-    results.append(crawl_data)
-
-    target_out_file_path = os.path.join(path_to_file, output_path)
-    output_dir_exists = os.path.exists(target_out_file_path)
-    if not output_dir_exists:
-        os.makedirs(target_out_file_path)
-    
-
-    with open(f'{target_out_file_path}/{timestamp}.json', 'w', encoding='UTF-8' ) as file:
-        logger.info(f'[*] Writing to file: {timestamp}.json')
-        file.write(json.dumps(crawl_data, indent=4))
-
-    file_title = '_'.join(profile.get('label','').lower().split()) + f'_{timestamp}'
-    with open(f'{target_out_file_path}/{file_title}.csv', 'w', encoding='UTF-8',newline='' ) as file:
-        logger.info(f'[*] Writing to file: {file_title}.csv')
-        headers = list(items_data[0].keys())
-        writer = csv.DictWriter(file, fieldnames=headers)
-        writer.writeheader()
-        writer.writerows(items_data)
+    if collected is not None:
+        crawl_data.update({"result": collected})
 
     return crawl_data
-
@@ -0,0 +1,147 @@
+import argparse
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlencode
+
+from scraper import main
+from scraper.strategies.airbnb_com.detail_page import AirbnbComDetailStrategy
+from scraper.utils.http_curl import connection_stats
+from scraper.utils.detail_cache import get_detail_cache
+from scraper.utils.sinks import MultiSink
+
+logger = logging.getLogger()
+
+ROOM_URL = 'https://www.airbnb.com/rooms/{}'
+FIELDNAMES = ["listing_id", "url", "check_in_date", "check_out_date", "price_per_night", "orig_price_per_night"]
+
+
+def room_url(listing_id, checkin, checkout, adults=1):
+    query = urlencode({"adults": adults, "check_in": checkin, "check_out": checkout})
+    return f'{ROOM_URL.format(listing_id)}?{query}'
+
+
+class ContextRefresh:
+    ''' Takes the kept api context off a PDP page again at most once per run. The first listing
+    the api rejected the context for refreshes it, the listings rejected meanwhile wait for it
+    and retry with the new context
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refreshed = False
+        self._rejected = False
+
+    def retry(self, run):
+        ''' run(refresh_context) does the listing again and returns its data and whether the
+        context was rejected, the data is empty when there is nothing to retry with
+        '''
+        with self._lock:
+            if not self._refreshed:
+                self._refreshed = True
+                data, self._rejected = run(True)
+                return data
+        if self._rejected:
+            # the page did not give a context the api takes either
+            return {}
+        data, _ = run(False)
+        return data
+
+
+def execute(config):
+    ''' Reprices known listings for new dates.
+
+    The product id of every listing and the api key and checkout bundle shared by all of them
+    are read from the detail cache, so a listing costs a single stayCheckout request. A listing
+    the cache does not know yet goes through the PDP page and its sections once, and is cheap
+    from then on. The listings run on a pool of config['price_concurrency'] workers.
+    '''
+    # without the detail cache every listing would need its PDP page again
+    main.configure_runtime(dict(config, detail_cache=config.get('detail_cache', 'on')))
+
+    listing_ids = [str(listing_id) for listing_id in config.get('listing_ids') or []]
+    checkin = config.get('checkin')
+    checkout = config.get('checkout')
+    adults = config.get('adults') or 1
+
+    timestamp = int(datetime.timestamp(datetime.now()))
+    output_dir = config.get('output_dir') or os.path.join(os.path.dirname(main.__file__), main.output_path)
+    output_formats = config.get('output_formats') or ['json', 'csv']
+    file_title = f'prices_{timestamp}_{checkin}_{checkout}'
+    sink = MultiSink.create(output_formats, output_dir, {key: file_title for key in ['json', 'jsonl', 'csv']}, FIELDNAMES)
+    logger.info(f'[*] Writing to files: {", ".join(sink.files)}')
+
+    refresh_started = str(datetime.now())
+    sink.open({"check_in_date": checkin, "check_out_date": checkout, "refresh_start": refresh_started})
+    priced = 0
+    context_refresh = ContextRefresh()
+    workers = max(1, min(config.get('price_concurrency', 8), len(listing_ids) or 1))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for row in executor.map(lambda listing_id: _price_listing(listing_id, checkin, checkout, adults, context_refresh), listing_ids):
+            sink.write_items([row])
+            if row.get('price_per_night') is not None:
+                priced += 1
+    refresh_finished = str(datetime.now())
+    sink.close({"refresh_finish": refresh_finished})
+
+    return {
+        "check_in_date": checkin,
+        "check_out_date": checkout,
+        "refresh_start": refresh_started,
+        "refresh_finish": refresh_finished,
+        "listings": len(listing_ids),
+        "priced": priced,
+        "files": sink.files,
+        "detail_cache": dict(get_detail_cache().stats),
+        "connection_stats": connection_stats(),
+    }
+
+
+def _price_listing(listing_id, checkin, checkout, adults, context_refresh):
+    url = room_url(listing_id, checkin, checkout, adults)
+    row = {"listing_id": listing_id, "url": url, "check_in_date": checkin, "check_out_date": checkout}
+    config = {"url": url, "fields": AirbnbComDetailStrategy.fields_of_call('checkout'), "with_price": True}
+
+    def run(refresh_context=False):
+        strategy = AirbnbComDetailStrategy(logger)
+        data = strategy.execute(dict(config, refresh_context=refresh_context))
+        return data, strategy.context_rejected
+
+    try:
+        data, rejected = run()
+        if rejected:
+            # the kept api key or checkout bundle went stale, an empty checkout is only a taken stay
+            logger.info(f'[*] Listing {listing_id} was rejected, refreshing the price context')
+            data = context_refresh.retry(run) or data
+        row.update(data)
+    except Exception as e:
+        logger.info(f'[*] Listing {listing_id} failed {str(e)}')
+    return row
+
+
+def load_listing_ids(path):
+    with open(path, 'r', encoding='UTF-8') as file:
+        return [line.strip().rstrip('/').split('/')[-1].split('?')[0] for line in file if line.strip()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Reprice known listings for new dates with one checkout request per listing')
+    parser.add_argument('--listing-id', action='append', dest='listing_ids', default=[])
+    parser.add_argument('--listings-file', default=None, help='one listing id or room url per line')
+    parser.add_argument('--checkin', required=True, help='YYYY-MM-DD')
+    parser.add_argument('--checkout', required=True, help='YYYY-MM-DD')
+    parser.add_argument('--adults', type=int, default=1)
+    parser.add_argument('--price-concurrency', type=int, default=8)
+    parser.add_argument('--max-in-flight', type=int, default=16)
+    parser.add_argument('--detail-cache', choices=['off', 'on'], default='on')
+    parser.add_argument('--output-dir', default=None)
+    parser.add_argument('--output-format', action='append', dest='output_formats', choices=['json', 'jsonl', 'csv'])
+    parser.add_argument('--log-level', default='INFO')
+    args = parser.parse_args()
+
+    listing_ids = args.listing_ids + (load_listing_ids(args.listings_file) if args.listings_file else [])
+    summary = execute(dict(vars(args), listing_ids=listing_ids))
+    print(json.dumps({key: value for key, value in summary.items() if key != 'connection_stats'}, indent=4))
@@ -6,3 +6,13 @@ class AbstractCrawler(metaclass=ABCMeta):
     @abstractmethod
     def execute(self, config):
         raise NotImplementedError
+
+    def iter_execute(self, config):
+        ''' Yields the results one by one. Strategies that can produce them lazily override
+        this, the rest fall back to running execute and yielding what it returns
+        '''
+        results = self.execute(config)
+        if isinstance(results, list):
+            yield from results
+        elif results:
+            yield results
@@ -0,0 +1,173 @@
+import json
+import threading
+from datetime import date
+from typing import Dict
+from urllib.parse import urlencode, quote, urlparse, parse_qs
+
+from scraper.strategies.abstract import AbstractCrawler
+from scraper.strategies.airbnb_com.detail_page import AirbnbComDetailStrategy
+from scraper.strategies.airbnb_com.downloader import REJECTED_STATUSES, download_api
+from scraper.utils.detail_cache import get_detail_cache
+from scraper.utils.field_spec import Field, number
+from scraper.utils.operation_cache import operation_cache, rejects_operation
+
+# the calendar of the PDP asks for a year of months at once
+CALENDAR_MONTHS = 12
+
+# the columns of every day in the calendar array
+CALENDAR_COLUMNS = ["date", "available", "min_nights", "price"]
+
+
+# '$120', None when the day has no price or it holds no number
+calendar_price = Field("price", "price.localPriceFormatted", number)
+
+
+class AirbnbComCalendarStrategy(AbstractCrawler):
+    ''' The availability of a listing for the months ahead, read from the PdpAvailabilityCalendar
+    api the PDP date picker uses. One response covers up to twelve months.
+
+    The PDP sections are no way round it, their BOOK_IT_CALENDAR_SHEET only prices the stay of
+    the url and they cost the page and a large sections response per listing. The calendar
+    api is one small GET per listing once the first page gave the bundle and api key.
+    '''
+
+    # the PDP bundle holding the calendar operation id and the api key are the same on every
+    # PDP page, once one page gave them a calendar only costs its own request. They are also
+    # kept in the detail cache for the next runs
+    calendar_context = None
+    # one worker reads the PDP page, the others wait for the context it gives
+    _context_lock = threading.Lock()
+
+    def __init__(self, logger):
+        self.origin_url = None
+        self.logger = logger
+        self.detail = AirbnbComDetailStrategy(logger)
+        # set when the calendar api refused the calendar context, not when the calendar was empty
+        self.context_rejected = False
+
+    def execute(self, config) -> Dict:
+        self.origin_url = config.get('url')
+        url = self.origin_url
+        months = config.get('months') or CALENDAR_MONTHS
+        start = self.get_start_date(config.get('start_date'))
+        data = {}
+        try:
+            refresh_context = config.get('refresh_context')
+            calendar_context = self.get_calendar_context()
+            if not calendar_context or refresh_context:
+                with self._context_lock:
+                    # another worker may have read it while this one waited
+                    calendar_context = self.get_calendar_context()
+                    if not calendar_context or refresh_context:
+                        calendar_context = self.get_calendar_context(self.detail.fetch_pdp_page_state(url))
+
+            calendar_json = self.fetch_calendar(url, calendar_context, start, months)
+            if calendar_json:
+                data = {
+                    "listing_id": self.get_listing_id(),
+                    "url": url.split('?')[0],
+                    "calendar_start": start.isoformat(),
+                    "calendar": self.get_calendar_days(calendar_json, start),
+                }
+        except Exception as e:
+            self.logger.info(f'[*] Execution Failed {str(e)}')
+        return data
+
+    def get_listing_id(self):
+        return urlparse(self.origin_url).path.rstrip('/').split('/')[-1]
+
+    def get_start_date(self, start_date=None):
+        ''' The first day of the calendar, the check in of the url when none is given and
+        today otherwise
+        '''
+        if not start_date:
+            parsed_query = parse_qs(urlparse(self.origin_url).query)
+            start_date = (parsed_query.get('check_in') or parsed_query.get('checkin') or [None])[0]
+        return date.fromisoformat(start_date) if start_date else date.today()
+
+    def get_calendar_context(self, page_state=None):
+        ''' The PDP bundle and api key, taken from the page when there is one and kept
+        for the process
+        '''
+        if page_state is None:
+            if type(self).calendar_context is None:
+                type(self).calendar_context = get_detail_cache().get_bootstrap('calendar_context')
+            return type(self).calendar_context or {}
+        calendar_context = {
+            "js_link": self.detail.get_pdp_js_link(page_state),
+            "api_key": page_state.api_key,
+        }
+        if calendar_context.get('js_link') and calendar_context.get('api_key') and calendar_context != type(self).calendar_context:
+            type(self).calendar_context = calendar_context
+            get_detail_cache().put_bootstrap('calendar_context', calendar_context)
+        return calendar_context
+
+    def fetch_calendar(self, url, calendar_context, start, months):
+        js_link = calendar_context.get('js_link')
+        if not js_link:
+            return {}
+
+        self.logger.info(f'[*] Fetching calendar {url}')
+        headers = self.detail.generate_pdp_api_headers(None, url, api_key=calendar_context.get('api_key'))
+        for _ in range(2):
+            operation_id = self.fetch_calendar_operation_id(js_link)
+            if not operation_id:
+                # the kept bundle is gone or no longer holds the operation
+                self.context_rejected = True
+                break
+            status, raw = download_api(self.generate_calendar_api_url(operation_id, start, months), headers=headers)
+            rejected = rejects_operation(raw)
+            self.context_rejected = status in REJECTED_STATUSES or rejected
+            if not raw:
+                # a failed request, not a stale hash
+                break
+            if not rejected:
+                return json.loads(raw)
+            # the cached hash may be stale after a deploy, scan the bundle again once
+            operation_cache.invalidate(js_link, 'PdpAvailabilityCalendar')
+        return {}
+
+    def fetch_calendar_operation_id(self, js_link):
+        return operation_cache.get_or_fetch(js_link, 'PdpAvailabilityCalendar',
+                                            lambda: self.detail.scan_operation_id(js_link, 'PdpAvailabilityCalendar'))
+
+    def generate_calendar_api_url(self, operation_id, start, months):
+        variables_json = {
+            "request": {
+                "count": months,
+                "listingId": self.get_listing_id(),
+                "month": start.month,
+                "year": start.year,
+            }
+        }
+        query_params = {
+            "operationName": "PdpAvailabilityCalendar",
+            "locale": "en",
+            "currency": "USD",
+            "variables": json.dumps(variables_json, separators=(',',':')),
+            "extensions": json.dumps({"persistedQuery":{"version":1,"sha256Hash":operation_id}},separators=(',',':'))
+        }
+        return f'https://www.airbnb.com/api/v3/PdpAvailabilityCalendar/{operation_id}?{urlencode(query_params, quote_via=quote)}'
+
+    def get_calendar_days(self, calendar_json, start=None):
+        ''' [date, available, min nights, nightly price] of every day from start on, the price
+        is None when the api leaves it out
+        '''
+        value = []
+        try:
+            calendar_months = calendar_json.get('data', {}).get('merlin', {}).get('pdpAvailabilityCalendar', {}).get('calendarMonths') or []
+            first_day = start.isoformat() if start else ''
+            for month in calendar_months:
+                for day in month.get('days') or []:
+                    calendar_date = day.get('calendarDate')
+                    if not calendar_date or calendar_date < first_day:
+                        continue
+                    value.append([
+                        calendar_date,
+                        bool(day.get('available')),
+                        day.get('minNights'),
+                        calendar_price(day),
+                    ])
+        except Exception as e:
+            self.logger.info(str(e))
+        return value
@@ -1,155 +1,350 @@
 import json
 import re
+import threading
 from datetime import datetime
 from typing import Dict
 from urllib.parse import urlencode, quote, urlparse, parse_qs
 
-from bs4 import BeautifulSoup
-
 from scraper.strategies.abstract import AbstractCrawler
-from scraper.strategies.airbnb_com.downloader import download
+from scraper.strategies.airbnb_com.downloader import REJECTED_STATUSES, download, download_api
+from scraper.strategies.airbnb_com.page_state import PageState
+from scraper.strategies.airbnb_com.room_data import RoomDataView
+from scraper.utils.detail_cache import get_detail_cache
+from scraper.utils.field_spec import Field, FieldSpec, number, strip
+from scraper.utils.operation_cache import operation_cache, rejects_operation
+
+
+def listing_title(title):
+    # Note this is not accurate but this it to fix a listing title bug
+    return title.split('·')[0].strip()
+
+
+def nightly_price(txt):
+    # '$120 x 4 nights'
+    return float(txt.split('x')[0].replace('$','').strip())
 
 
 class AirbnbComDetailStrategy(AbstractCrawler):
 
+    # sections only sent on request, the default request leaves them out
+    hidden_section_ids = [
+        "CANCELLATION_POLICY_PICKER_MODAL",
+        "BOOK_IT_CALENDAR_SHEET",
+        "POLICIES_DEFAULT",
+        "BOOK_IT_SIDEBAR",
+        "URGENCY_COMMITMENT_SIDEBAR",
+        "BOOK_IT_NAV",
+        "BOOK_IT_FLOATING_FOOTER",
+        "EDUCATION_FOOTER_BANNER",
+        "URGENCY_COMMITMENT",
+        "EDUCATION_FOOTER_BANNER_MODAL"
+    ]
+    # default sections read from the initial data, metadata and sbuiData come with every response
+    initial_section_ids = [
+        "AMENITIES_DEFAULT",
+    ]
+    # read from the hidden sections
+    room_fields = FieldSpec([
+        Field("label", "sections.metadata.sharingConfig.title", listing_title, str),
+        Field("description", "sections.metadata.seoFeatures.ogTags.ogDescription", strip, str),
+        Field("image_url", "sections.metadata.sharingConfig.imageUrl", None, str),
+        Field("rating_score", "sections.metadata.sharingConfig.starRating", float, float),
+        Field("rating_count", "sections.metadata.sharingConfig.reviewCount", int, int),
+        Field("property_type", "sections.metadata.sharingConfig.propertyType", None, str),
+        Field("cleanliness", "sections.metadata.loggingContext.eventDataLogging.cleanlinessRating", None, float),
+        Field("communication", "sections.metadata.loggingContext.eventDataLogging.communicationRating", None, float),
+        Field("location_rate", "sections.metadata.loggingContext.eventDataLogging.locationRating", None, float),
+        Field("check_in_rating", "sections.metadata.loggingContext.eventDataLogging.checkinRating", None, float),
+        Field("guest", "sections.metadata.sharingConfig.personCapacity", None, int),
+    ])
+    # read from the initial sections
+    location_fields = FieldSpec([
+        Field("lattitude", "sections.metadata.loggingContext.eventDataLogging.listingLat", str, str),
+        Field("longtitude", "sections.metadata.loggingContext.eventDataLogging.listingLng", str, str),
+    ])
+    # read from stayCheckout
+    price_fields = FieldSpec([
+        Field("price_per_night", "sections.temporaryQuickPayData.bootstrapPayments.productPriceBreakdown.priceBreakdown.priceItems.0.localizedTitle", nightly_price, float),
+        Field("total_price", "sections.temporaryQuickPayData.bootstrapPayments.productPriceBreakdown.priceBreakdown.priceItems.0.total.amountFormatted", number, float),
+    ])
+
+    # ask for both section sets in one request, turned off for the process once the api
+    # refuses it while the two separate requests go through
+    combine_sections = True
+    _combine_lock = threading.Lock()
+
+    # the checkout bundle and api key are the same on every PDP page, once one page gave them
+    # the checkout of a listing whose product id is known needs no PDP request. They are also
+    # kept in the detail cache for the next runs
+    price_context = None
+
     def __init__(self, logger):
         self.origin_url = None
         self.logger = logger
         self.pdp_operation_id = None
         self.product_id = None
+        self.fetched_calls = set()
+        # set when the api answered the last sections request with errors or without the sections
+        self.sections_refused = False
+        # set when the checkout api refused the price context, not when it only had no price
+        self.context_rejected = False
+
+    # the api calls each field is read from, every call also needs the pdp html. Checkout
+    # needs the product id of the initial sections as well
+    field_calls = {
+        "label": ["sections_hidden"],
+        "description": ["sections_hidden"],
+        "image_url": ["sections_hidden"],
+        "rating_score": ["sections_hidden"],
+        "rating_count": ["sections_hidden"],
+        "property_type": ["sections_hidden"],
+        "host_name": ["sections_hidden"],
+        "cleanliness": ["sections_hidden"],
+        "accuracy": ["sections_hidden"],
+        "location_rate": ["sections_hidden"],
+        "communication": ["sections_hidden"],
+        "check_in_rating": ["sections_hidden"],
+        "guest": ["sections_hidden"],
+        "baths": ["sections_hidden"],
+        "beds": ["sections_hidden"],
+        "bedrooms": ["sections_hidden"],
+        "kitchen": ["sections_initial"],
+        "pool": ["sections_initial"],
+        "lattitude": ["sections_initial"],
+        "longtitude": ["sections_initial"],
+        "amenities": ["sections_initial"],
+        "cleaning_fee": ["sections_hidden"],
+        "service_fee": ["sections_hidden"],
+        "price_per_night": ["checkout"],
+        "orig_price_per_night": ["checkout"],
+    }
 
     def execute(self, config) -> Dict:
         self.origin_url = config.get('url')
         url = self.origin_url
-        with_pricing_data = config.get('with_price')
+        fields = config.get('fields')
+        self.combine_sections = config.get('combine_sections', self.combine_sections)
+        # a caller that kept the product id from an earlier crawl spares the initial sections
+        self.product_id = config.get('product_id')
+        detail_cache = get_detail_cache()
+        listing_id = self.get_listing_id() if detail_cache.enabled else None
+        cached = {}
+        cached_product_id = None
+        fetch_fields = fields
+        if listing_id:
+            cached, cached_product_id = detail_cache.get(listing_id, self.cached_fields(fields))
+            self.product_id = self.product_id or cached_product_id
+            # only the fields that went stale are fetched again
+            fetch_fields = [field for field in (self.field_calls if fields is None else fields) if field not in cached]
+        calls = self.plan_calls(fetch_fields, config.get('with_price'), self.product_id)
+        if calls and config.get('refresh_context'):
+            # the kept api key or checkout bundle stopped working, read them off the page again
+            calls.add('pdp_html')
         data = {}
         try:
-            soup = self.fetch_pdp_soup(url)
-            basic_details = self.fetch_basic(url, soup)
-            if basic_details:
-                data.update(basic_details)
-
-            if with_pricing_data:
-                price_details = self.fetch_pdp_price_data(url, soup)
+            page_state = self.fetch_pdp_page_state(url) if 'pdp_html' in calls else None
+            if calls & {'sections_initial', 'sections_hidden'}:
+                basic_details = self.fetch_basic(url, page_state, calls)
+                if basic_details:
+                    data.update(basic_details)
+
+            if 'checkout' in calls:
+                price_details = self.fetch_pdp_price_data(url, page_state)
                 data.update(price_details)
         except Exception as e:
             self.logger.info(f'[*] Execution Failed {str(e)}')
+        if listing_id:
+            # every field of a call that came back is written, not only the stale ones
+            fresh = {key: value for key, value in data.items()
+                     if key in self.cached_fields() and set(self.field_calls.get(key, [])) <= self.fetched_calls}
+            if fresh or self.product_id != cached_product_id:
+                detail_cache.put(listing_id, fresh, self.product_id)
+            data = dict(cached, **data)
+            data = {key: data[key] for key in self.field_calls if key in data}
+        if fields is not None:
+            data = {key: value for key, value in data.items() if key in fields}
+        if config.get('with_product_id') and self.product_id:
+            data.update({"product_id": self.product_id})
         return data
+
+    def plan_calls(self, fields=None, with_price=False, product_id=None):
+        ''' The api calls needed for the fields, all the fields when none are given
+        '''
+        calls = set()
+        for field in self.field_calls if fields is None else fields:
+            calls.update(self.field_calls.get(field, []))
+        if not with_price:
+            calls.discard('checkout')
+        if 'checkout' in calls and not product_id:
+            calls.add('sections_initial')
+        if calls - {'checkout'} or ('checkout' in calls and not self.get_price_context()):
+            calls.add('pdp_html')
+        return calls
+
+    @classmethod
+    def fields_of_call(cls, call):
+        return [field for field, calls in cls.field_calls.items() if call in calls]
+
+    def cached_fields(self, fields=None):
+        ''' The fields the detail cache keeps, the prices change with the dates so they are left out
+        '''
+        return [field for field, calls in self.field_calls.items()
+                if 'checkout' not in calls and (fields is None or field in fields)]
+
+    def get_listing_id(self):
+        return urlparse(self.origin_url).path.rstrip('/').split('/')[-1]
     
-    def fetch_basic(self, url, soup):
+    def fetch_basic(self, url, page_state, calls=('sections_initial', 'sections_hidden')):
         data = {}
         try:
-            initial_room_data = self.fetch_room_data(url, soup, initial=True)
-            room_data = self.fetch_room_data(url, soup)
-            self.product_id = self.get_pdp_product_id(initial_room_data)
+            initial_room_data, room_data = self.fetch_sections(url, page_state, calls)
+            self.fetched_calls = {call for call, call_data in (('sections_initial', initial_room_data), ('sections_hidden', room_data))
+                                  if call in calls and call_data}
+            # index the sections once, every getter below reads from the views
+            room_view = RoomDataView(room_data)
+            initial_room_data = room_view if initial_room_data is room_data else RoomDataView(initial_room_data)
+            room_data = room_view
+            self.product_id = self.get_pdp_product_id(initial_room_data) or self.product_id
+            values = self.room_fields.extract(room_data.room_data)
+            location = self.location_fields.extract(initial_room_data.room_data)
             host_name = self.get_pdp_host_name(room_data)
-            cleanliness = self.get_pdp_clean(room_data)
-            accuracy = self.get_pdp_clean(room_data)
-            communication = self.get_pdp_communication(room_data)
-            location_rate = self.get_pdp_location_rating(room_data)
-            check_in_rate = self.get_pdp_check_in(room_data)
-            guest_capacity = self.get_pdp_capacity(room_data)
-            lat = self.get_pdp_lat(initial_room_data)
-            lon = self.get_pdp_lon(initial_room_data)
             rooms = self.get_pdp_rooms(room_data)
             amenties = self.get_pdp_amenties(initial_room_data)
-            property_type = self.get_property_type(room_data)
             fees = self.get_pdp_fees(room_data)
-            title = self.get_pdp_title(room_data)
-            description = self.get_pdp_description(room_data)
-            image_url = self.get_pdp_image_url(room_data)
-            rating_score = self.get_pdp_rating_score(room_data)
-            rating_count = self.get_pdp_rating_count(room_data)
             data = {
-                "label": title,
-                "description": description,
-                "image_url": image_url,
-                "rating_score": rating_score,
-                "rating_count": rating_count,
-                "property_type": property_type,
+                "label": values["label"],
+                "description": values["description"],
+                "image_url": values["image_url"],
+                "rating_score": values["rating_score"],
+                "rating_count": values["rating_count"],
+                "property_type": values["property_type"],
                 "host_name": host_name,
-                "cleanliness" : cleanliness,
-                "accuracy": accuracy,
-                "location_rate": location_rate,
-                "communication": communication,
-                "check_in_rating": check_in_rate,
-                "guest": guest_capacity,
+                "cleanliness" : values["cleanliness"],
+                "accuracy": values["cleanliness"],
+                "location_rate": values["location_rate"],
+                "communication": values["communication"],
+                "check_in_rating": values["check_in_rating"],
+                "guest": values["guest"],
                 "baths": rooms.get('bath'),
                 'beds': rooms.get('beds'),
                 'bedrooms': rooms.get('bedroom'),
                 'kitchen': amenties.get('kitchen'),
                 'pool': amenties.get('pool'),
-                'lattitude': lat,
-                'longtitude': lon,
+                'lattitude': location["lattitude"],
+                'longtitude': location["longtitude"],
                 'amenities': amenties.get('extra',[]),
                 "cleaning_fee": fees.get('cleaning_fee'),
                 "service_fee": fees.get('service_fee'),
             }
+            # fields of the calls that were skipped are left out instead of left empty
+            data = {key: value for key, value in data.items() if set(self.field_calls.get(key, [])) <= set(calls)}
 
         except Exception as e:
             self.logger.info(str(e))
         return data
     
 
-    def fetch_room_data(self, url, soup, initial=False):
+    def fetch_sections(self, url, page_state, calls):
+        ''' Returns (initial_room_data, room_data). Both come from a single request for the union
+        of the sections when both are needed, and from two requests if the api refuses that
+        '''
+        initial_room_data = {}
+        room_data = {}
+        combined_refused = False
+        if 'sections_initial' in calls and 'sections_hidden' in calls and self.combine_sections:
+            section_ids = self.initial_section_ids + self.hidden_section_ids
+            room_data = self.fetch_room_data(url, page_state, section_ids=section_ids)
+            if self.has_combined_sections(room_data):
+                # the getters look sections up by id, so both consumers read the same response
+                return room_data, room_data
+            # a response without the sections is a refusal, no response at all is only a failed request
+            combined_refused = bool(room_data) or self.sections_refused
+            room_data = {}
+
+        if 'sections_initial' in calls:
+            initial_room_data = self.fetch_room_data(url, page_state, initial=True)
+        if 'sections_hidden' in calls:
+            room_data = self.fetch_room_data(url, page_state)
+
+        if combined_refused and initial_room_data and room_data:
+            with self._combine_lock:
+                if type(self).combine_sections:
+                    self.logger.info('[*] Combined PDP sections refused, using separate requests')
+                    type(self).combine_sections = False
+            self.combine_sections = False
+        return initial_room_data, room_data
+
+    def has_combined_sections(self, room_data):
+        ''' True when a combined response holds the initial sections and hidden ones. An api that
+        drops the extra section ids answers with its defaults only, while a listing may lack
+        some of the hidden sections, so one of them is enough
+        '''
+        room_view = RoomDataView.of(room_data)
+        return bool(room_view) and all(room_view.section(section_id) for section_id in self.initial_section_ids) \
+            and any(room_view.section(section_id) for section_id in self.hidden_section_ids)
+
+    def fetch_room_data(self, url, page_state, initial=False, section_ids=None):
 
         try:
-            if initial:
+            if section_ids:
+                self.logger.info(f'[*] Fetching combined PDP data {url}')
+            elif initial:
                 self.logger.info(f'[*] Fetching initial PDP data {url}')
             else:
                 self.logger.info(f'[*] Fetching hidden PDP data {url}')
 
-            pdp_link = self.get_pdp_js_link(soup)
+            pdp_link = self.get_pdp_js_link(page_state)
             if pdp_link:
-
-                operation_id = None
-                if self.pdp_operation_id is None:
+                for _ in range(2):
+                    self.sections_refused = False
                     operation_id = self.fetch_pdp_operation_id(pdp_link)
-                else:
-                    operation_id = self.pdp_operation_id
-
-                if operation_id:
-                    pdp_api_url = self.generate_pdp_api_url(soup, operation_id, initial=initial)
-                    pdp_api_header = self.generate_pdp_api_headers(soup, url)
-                    pdp_raw = download(pdp_api_url, headers=pdp_api_header)
-                    if pdp_raw:
+                    if not operation_id:
+                        break
+
+                    pdp_api_url = self.generate_pdp_api_url(page_state, operation_id, initial=initial, section_ids=section_ids)
+                    pdp_api_header = self.generate_pdp_api_headers(page_state, url)
+                    _, pdp_raw = download_api(pdp_api_url, headers=pdp_api_header)
+                    if not pdp_raw:
+                        # a failed request, not a stale hash
+                        break
+                    if not rejects_operation(pdp_raw):
                         pdp_json = json.loads(pdp_raw)
-                        room_data = pdp_json.get('data', {}).get('presentation', {}).get('stayProductDetailPage', {})
+                        room_data = (pdp_json.get('data') or {}).get('presentation', {}).get('stayProductDetailPage', {})
                         if room_data:
                             return room_data
+                        self.sections_refused = True
+                        break
+
+                    # the cached hash may be stale after a deploy, scan the bundle again once
+                    self.sections_refused = True
+                    operation_cache.invalidate(pdp_link, 'StaysPdpSections')
+                    self.pdp_operation_id = None
 
         except Exception as e:
             self.logger.info(f'[*] Failed to fetch {str(e)}')
         return {}
     
-    def fetch_pdp_soup(self, url):
+    def fetch_pdp_page_state(self, url):
         try:
             raw = download(url)
             if raw:
-                return BeautifulSoup(raw, 'lxml')
+                return PageState(raw)
         except Exception as e:
             self.logger.info(str(e))
         return None
     
-    def get_pdp_js_link(self, soup):
+    def get_pdp_js_link(self, page_state):
         ''' This script url will contain the hash of the operation_id for the PDP api route
         '''
-        tag = soup.find('script', src=re.compile('web/common/frontend/gp-stays-pdp-route/routes/PdpPlatformRoute.prepare', re.IGNORECASE))
-        if tag:
-            return tag.get('src')
-        return None
+        return page_state.find_script_src('web/common/frontend/gp-stays-pdp-route/routes/PdpPlatformRoute.prepare')
     
-    def get_pdp_js_link_price_prerequisite(self, soup):
+    def get_pdp_js_link_price_prerequisite(self, page_state):
 
-        tag = soup.find('script', src=re.compile('web/en/frontend/airmetro/src/browser/asyncRequire'))
-        if tag:
-            return tag.get('src')
-        return None
+        return page_state.find_script_src('web/en/frontend/airmetro/src/browser/asyncRequire')
 
-    def generate_pdp_api_url(self, soup, operation_id, initial=False):
-        injector_json = self.get_injector_instance_json(soup)
-        spa_data = injector_json.get('root > core-guest-spa', {})
+    def generate_pdp_api_url(self, page_state, operation_id, initial=False, section_ids=None):
         try:
+            spa_data = page_state.spa_data
             if spa_data:
                 client_data = spa_data[1][1]
                 niobe_data = client_data.get('niobeMinimalClientData',[None])[0][0]
@@ -157,19 +352,9 @@ class AirbnbComDetailStrategy(AbstractCrawler):
                 variables_txt = niobe_data.replace('StaysPdpSections:','')
                 variables_json = json.loads(variables_txt)
 
-                if not initial:
-                    section_ids = [
-                        "CANCELLATION_POLICY_PICKER_MODAL",
-                        "BOOK_IT_CALENDAR_SHEET",
-                        "POLICIES_DEFAULT",
-                        "BOOK_IT_SIDEBAR",
-                        "URGENCY_COMMITMENT_SIDEBAR",
-                        "BOOK_IT_NAV",
-                        "BOOK_IT_FLOATING_FOOTER",
-                        "EDUCATION_FOOTER_BANNER",
-                        "URGENCY_COMMITMENT",
-                        "EDUCATION_FOOTER_BANNER_MODAL"
-                    ]
+                if section_ids is None and not initial:
+                    section_ids = self.hidden_section_ids
+                if section_ids:
                     variables_json['pdpSectionsRequest'].update({'sectionIds': section_ids})
                 
                 extensions = json.dumps({"persistedQuery":{"version":1,"sha256Hash":operation_id}},separators=(',',':'))
@@ -186,9 +371,9 @@ class AirbnbComDetailStrategy(AbstractCrawler):
 
         return None
     
-    def generate_pdp_checkout_api_url(self, soup):
+    def generate_pdp_checkout_api_url(self, price_context):
 
-        checkout_operation_id = self.fetch_checkout_operation_id(soup)
+        checkout_operation_id = self.fetch_checkout_operation_id(price_context.get('js_link'))
 
         parsed = urlparse(self.origin_url)
         parsed_query = parse_qs(parsed.query)
@@ -234,13 +419,10 @@ class AirbnbComDetailStrategy(AbstractCrawler):
 
         return f'https://www.airbnb.com/api/v3/stayCheckout/{checkout_operation_id}?{urlencode(query_params, quote_via=quote)}'
 
-    def generate_pdp_api_headers(self, soup, pdp_url):
+    def generate_pdp_api_headers(self, page_state, pdp_url, api_key=None):
         header = {}
         try:
-            injector_json = self.get_injector_instance_json(soup)
-            spa_data = injector_json.get('root > core-guest-spa', {})
-            bootstrap_token_data= spa_data[0][1]
-            api_key = bootstrap_token_data.get('layout-init', {}).get('api_config', {}).get('key')
+            api_key = api_key or page_state.api_key
             header = {
                 "authority":"www.airbnb.com",
                 "accept":"*/*",
@@ -266,9 +448,12 @@ class AirbnbComDetailStrategy(AbstractCrawler):
         return header
     
 
-    def fetch_checkout_operation_id(self, soup):
+    def fetch_checkout_operation_id(self, js_link):
 
-        js_link = self.get_pdp_js_link_price_prerequisite(soup)
+        operation_id = operation_cache.get_or_fetch(js_link, 'stayCheckout', lambda: self.scan_checkout_operation_id(js_link))
+        return operation_id or str()
+
+    def scan_checkout_operation_id(self, js_link):
         try:
             if js_link:
                 raw = download(js_link)
@@ -277,34 +462,32 @@ class AirbnbComDetailStrategy(AbstractCrawler):
                     if matches:
                         path = matches.group(0)
                         url = f'https://a0.muscache.com/airbnb/static/packages/web/{path}'
-                        requirements_raw = download(url)
-                        if requirements_raw:
-                            matches = re.search(r"'stayCheckout',type:'query',operationId:'([0-9a-zA-Z]+)'", requirements_raw)
-                            if matches:
-                                return matches.group(1)
+                        return self.scan_operation_id(url, 'stayCheckout')
                             
         except Exception as e:
             self.logger.info(str(e))
-        return str()
+        return None
 
         
     def fetch_pdp_operation_id(self, url):
+        if self.pdp_operation_id is None:
+            self.pdp_operation_id = operation_cache.get_or_fetch(url, 'StaysPdpSections', lambda: self.scan_operation_id(url, 'StaysPdpSections'))
+        return self.pdp_operation_id
+
+    def scan_operation_id(self, url, operation_name):
         try:
             raw = download(url)
             if raw:
-                matches = re.search(r"'StaysPdpSections',type:'query',operationId:'([0-9a-zA-Z]+)'", raw)
+                matches = re.search(f"'{re.escape(operation_name)}',type:'query',operationId:'([0-9a-zA-Z]+)'", raw)
                 if matches:
                     return matches.group(1)
         except Exception as e:
             self.logger.info(str(e))
         return None
     
-    def get_injector_instance_json(self, soup):
+    def get_injector_instance_json(self, page_state):
         try:
-            tag = soup.select_one('#data-injector-instances')
-            if tag:
-                txt = tag.get_text().strip()
-                return json.loads(txt)
+            return page_state.injector_instances
         except Exception as e:
             self.logger.info(str(e))
         return {}
@@ -312,228 +495,75 @@ class AirbnbComDetailStrategy(AbstractCrawler):
     def get_pdp_host_name(self, room_data):
         value = str()
         try:
-            sbui_data = room_data.get('sections', {}).get('sbuiData')
-            if sbui_data:
-                sections = sbui_data.get('sectionConfiguration', {}).get('root', {}).get('sections',[])
-                for section in sections:
-                    if section.get('sectionId') == 'HOST_OVERVIEW_DEFAULT':
-                        sec_data = section.get('sectionData')
-                        title = sec_data.get('title')
-                        if title:
-                            value = title.replace('Hosted by','').strip()
+            section = RoomDataView.of(room_data).sbui_section('HOST_OVERVIEW_DEFAULT')
+            if section:
+                title = section.get('sectionData').get('title')
+                if title:
+                    value = title.replace('Hosted by','').strip()
         except Exception as e:
             self.logger.info(str(e))
         return value
 
 
     def get_pdp_title(self, room_data):
-        meta_data = room_data.get('sections', {}).get('metadata')
-        try:
-            if meta_data:
-                title = meta_data.get('sharingConfig', {}).get('title')
-                if title:
-                    # Note this is not accurate but this it to fix a listing title bug
-                    return title.split('·')[0].strip()
-        except Exception as e:
-            self.logger.info(str(e))
-        return str()
+        return self.room_fields["label"](RoomDataView.raw(room_data))
     
 
     def get_pdp_description(self, room_data):
-        meta_data = room_data.get('sections', {}).get('metadata')
-        try:
-            if meta_data:
-                description = meta_data.get('seoFeatures', {}).get('ogTags', {}).get('ogDescription')
-                if description:
-                    return description.strip()
-        except Exception as e:
-            self.logger.info(str(e))
-        return str()
+        return self.room_fields["description"](RoomDataView.raw(room_data))
 
     def get_pdp_orig_price_per_night(self, room_data):
 
         pass
 
     def get_pdp_total_price(self, price_data_json):
-        value = float()
-        try:
-            quick_pay_data = price_data_json.get('sections', {}).get('temporaryQuickPayData', {})
-            price_breakdown = quick_pay_data.get('bootstrapPayments', {}).get('productPriceBreakdown', {}).get('priceBreakdown')
-            price_items = price_breakdown.get('priceItems')
-            if price_items:
-                price_data = price_items[0]
-                if price_data:
-                    total = price_data.get('total')
-                    if total:
-                        txt = total.get('amountFormatted')
-                        value = float(float(re.sub('[^0-9.]', '', txt)))
-
-        except Exception as e:
-            self.logger.info(str(e))
-
-        return value
+        return self.price_fields["total_price"](price_data_json)
     
 
     def get_pdp_price_per_night(self, price_data_json):
-        value = float()
-        try:
-            quick_pay_data = price_data_json.get('sections', {}).get('temporaryQuickPayData', {})
-            price_breakdown = quick_pay_data.get('bootstrapPayments', {}).get('productPriceBreakdown', {}).get('priceBreakdown')
-            price_items = price_breakdown.get('priceItems')
-            if price_items:
-                price_data = price_items[0]
-                if price_data:
-                    txt = price_data.get('localizedTitle')
-                    if txt:
-                        clean_txt = txt.split('x')[0].replace('$','').strip()
-                        value = float(clean_txt)
-
-        except Exception as e:
-            self.logger.info(str(e))
-
-        return value
+        return self.price_fields["price_per_night"](price_data_json)
     
     def get_pdp_rating_score(self, room_data):
-        value = float()
-        try:
-            meta_data = room_data.get('sections', {}).get('metadata')
-            if meta_data:
-                rating = meta_data.get('sharingConfig', {}).get('starRating')
-                if rating:
-                    value = float(rating)
-                    
-        except Exception as e:
-            self.logger.info(str(e))
-
-        return value
+        return self.room_fields["rating_score"](RoomDataView.raw(room_data))
 
 
     def get_pdp_rating_count(self, room_data):
-        value = int()
-        try:
-            meta_data = room_data.get('sections', {}).get('metadata')
-            if meta_data:
-                count = meta_data.get('sharingConfig', {}).get('reviewCount')
-                if count:
-                    value = int(count)
-                    
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.room_fields["rating_count"](RoomDataView.raw(room_data))
 
 
     def get_pdp_labels(self, room_data):
         pass
 
     def get_pdp_image_url(self, room_data):
-        value = str()
-        try:
-            meta_data = room_data.get('sections', {}).get('metadata')
-            if meta_data:
-                url = meta_data.get('sharingConfig', {}).get('imageUrl')
-                if url:
-                    value = url
-                    
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.room_fields["image_url"](RoomDataView.raw(room_data))
 
 
     def get_pdp_clean(self, room_data):
-        value = float()
-        try:
-            meta_data = room_data.get('sections', {}).get('metadata')
-            if meta_data:
-                event_data = meta_data.get('loggingContext', {}).get('eventDataLogging')
-                rate = event_data.get('cleanlinessRating', 0)
-                if rate:
-                    value = rate
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.room_fields["cleanliness"](RoomDataView.raw(room_data))
     
 
     def get_pdp_communication(self, room_data):
-        value = float()
-        try:
-            meta_data = room_data.get('sections', {}).get('metadata')
-            if meta_data:
-                event_data = meta_data.get('loggingContext', {}).get('eventDataLogging')
-                rate = event_data.get('communicationRating', 0)
-                if rate:
-                    value = rate
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.room_fields["communication"](RoomDataView.raw(room_data))
     
 
     def get_pdp_location_rating(self, room_data):
-        value = float()
-        try:
-            meta_data = room_data.get('sections', {}).get('metadata')
-            if meta_data:
-                event_data = meta_data.get('loggingContext', {}).get('eventDataLogging')
-                rate = event_data.get('locationRating', 0)
-                if rate:
-                    value = rate
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.room_fields["location_rate"](RoomDataView.raw(room_data))
     
 
     def get_pdp_check_in(self, room_data):
-        value = float()
-        try:
-            meta_data = room_data.get('sections', {}).get('metadata')
-            if meta_data:
-                event_data = meta_data.get('loggingContext', {}).get('eventDataLogging')
-                rate = event_data.get('checkinRating', 0)
-                if rate:
-                    value = rate
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.room_fields["check_in_rating"](RoomDataView.raw(room_data))
     
 
     def get_pdp_lat(self, room_data):
-        value = str()
-        try:
-            meta_data = room_data.get('sections', {}).get('metadata')
-            if meta_data:
-                event_data = meta_data.get('loggingContext', {}).get('eventDataLogging')
-                lat = event_data.get('listingLat', 0)
-                if lat:
-                    value = str(lat)
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.location_fields["lattitude"](RoomDataView.raw(room_data))
     
 
     def get_pdp_lon(self, room_data):
-        value = str()
-        try:
-            meta_data = room_data.get('sections', {}).get('metadata')
-            if meta_data:
-                event_data = meta_data.get('loggingContext', {}).get('eventDataLogging')
-                lon = event_data.get('listingLng', 0)
-                if lon:
-                    value = str(lon)
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.location_fields["longtitude"](RoomDataView.raw(room_data))
     
 
     def get_pdp_capacity(self, room_data):
-        value = int()
-        try:
-            meta_data = room_data.get('sections', {}).get('metadata')
-            if meta_data:
-                capacity = meta_data.get('sharingConfig', {}).get('personCapacity')
-                if capacity:
-                    value = capacity
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.room_fields["guest"](RoomDataView.raw(room_data))
     
     
     def get_pdp_rooms(self, room_data):
@@ -543,22 +573,18 @@ class AirbnbComDetailStrategy(AbstractCrawler):
             'beds': 0
         }
         try:
-            sbui_data = room_data.get('sections', {}).get('sbuiData')
-            if sbui_data:
-                sections = sbui_data.get('sectionConfiguration', {}).get('root', {}).get('sections',[])
-                for section in sections:
-                    if section.get('sectionId') == 'OVERVIEW_DEFAULT_V2':
-                        sec_data = section.get('sectionData')
-                        overview_items = sec_data.get('overviewItems', [])
-                        if overview_items:
-                            keys = list(value)
-                            for key in keys:
-                                room = [room.get('title') for room in overview_items if key in room.get('title')]
-                                if room:
-                                    room_txt = room[0]
-                                    matches = re.search(r'([0-9+]+)', room_txt)
-                                    if matches:
-                                        value.update({key: matches.group(1)})
+            section = RoomDataView.of(room_data).sbui_section('OVERVIEW_DEFAULT_V2')
+            if section:
+                overview_items = section.get('sectionData').get('overviewItems', [])
+                if overview_items:
+                    keys = list(value)
+                    for key in keys:
+                        room = [room.get('title') for room in overview_items if key in room.get('title')]
+                        if room:
+                            room_txt = room[0]
+                            matches = re.search(r'([0-9+]+)', room_txt)
+                            if matches:
+                                value.update({key: matches.group(1)})
         except Exception as e:
             self.logger.info(str(e))
         return value
@@ -570,21 +596,19 @@ class AirbnbComDetailStrategy(AbstractCrawler):
             'service_fee':0
         }
         try:
-            sections = room_data.get('sections', {}).get('sections')
-            if sections:
-                for section in sections:
-                    if section.get('sectionComponentType') == 'BOOK_IT_CALENDAR_SHEET':
-                        sec_data = section.get('section')
-                        price_items = sec_data.get('structuredDisplayPrice', {}).get('explanationData', {}).get('priceDetails', [None])[0].get('items')
-                        fees = list(value)
-                        if price_items:
-                            for key in fees:
-                                fee = ' '.join(key.split('_'))
-                                item = [item.get('priceString') for item in price_items if fee in item.get('description').lower()]
-                                if item:
-                                    fee_val = float(re.sub('[^0-9.]', '', item[0]))
-                                    if fee_val:
-                                        value.update({key: fee_val})
+            section = RoomDataView.of(room_data).section_of_type('BOOK_IT_CALENDAR_SHEET')
+            if section:
+                sec_data = section.get('section')
+                price_items = sec_data.get('structuredDisplayPrice', {}).get('explanationData', {}).get('priceDetails', [None])[0].get('items')
+                fees = list(value)
+                if price_items:
+                    for key in fees:
+                        fee = ' '.join(key.split('_'))
+                        item = [item.get('priceString') for item in price_items if fee in item.get('description').lower()]
+                        if item:
+                            fee_val = float(re.sub('[^0-9.]', '', item[0]))
+                            if fee_val:
+                                value.update({key: fee_val})
 
         except Exception as e:
             self.logger.info(str(e))
@@ -592,16 +616,7 @@ class AirbnbComDetailStrategy(AbstractCrawler):
 
     
     def get_property_type(self, room_data):
-        value = str()
-        try:
-            meta_data = room_data.get('sections', {}).get('metadata')
-            if meta_data:
-                property_type = meta_data.get('sharingConfig', {}).get('propertyType')
-                if property_type:
-                    value = property_type
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.room_fields["property_type"](RoomDataView.raw(room_data))
 
     
     def get_pdp_amenties(self, room_data):
@@ -612,25 +627,23 @@ class AirbnbComDetailStrategy(AbstractCrawler):
         }
         try:
             extras = []
-            sections = room_data.get('sections', {}).get('sections',[])
-            if sections:
-                for section in sections:
-                    if section.get('sectionId') == 'AMENITIES_DEFAULT':
-                        all_amenities_group = section.get('section', {}).get('seeAllAmenitiesGroups')
-                        if all_amenities_group:
-                            for group in all_amenities_group:
-                                amenties = group.get('amenities', [])
-                                for item in amenties:
-                                    if 'kitchen' in item.get('title').lower():
-                                        available = item.get('available', False)
-                                        value.update({'kitchen': available})
-                                    elif 'pool' in item.get('title').lower():
-                                        available = item.get('available', False)
-                                        value.update({'pool': available})
-                                    else:
-                                        title = item.get('title')
-                                        if item.get('available', False):
-                                            extras.append(title)
+            section = RoomDataView.of(room_data).section('AMENITIES_DEFAULT')
+            if section:
+                all_amenities_group = section.get('section', {}).get('seeAllAmenitiesGroups')
+                if all_amenities_group:
+                    for group in all_amenities_group:
+                        amenties = group.get('amenities', [])
+                        for item in amenties:
+                            if 'kitchen' in item.get('title').lower():
+                                available = item.get('available', False)
+                                value.update({'kitchen': available})
+                            elif 'pool' in item.get('title').lower():
+                                available = item.get('available', False)
+                                value.update({'pool': available})
+                            else:
+                                title = item.get('title')
+                                if item.get('available', False):
+                                    extras.append(title)
                                             
             if extras:
                 value.update({'extra': extras})
@@ -655,14 +668,38 @@ class AirbnbComDetailStrategy(AbstractCrawler):
         return value
 
 
-    def fetch_pdp_price_data(self, url, soup):
+    def get_price_context(self, page_state=None):
+        ''' The checkout bundle and api key, taken from the page when there is one and kept
+        for the process
+        '''
+        if page_state is None:
+            if type(self).price_context is None:
+                type(self).price_context = get_detail_cache().get_bootstrap('price_context')
+            return type(self).price_context or {}
+        price_context = {
+            "js_link": self.get_pdp_js_link_price_prerequisite(page_state),
+            "api_key": page_state.api_key,
+        }
+        if price_context.get('js_link') and price_context.get('api_key') and price_context != type(self).price_context:
+            type(self).price_context = price_context
+            get_detail_cache().put_bootstrap('price_context', price_context)
+        return price_context
+
+    def fetch_pdp_price_data(self, url, page_state=None):
         data = {}
 
         try:
-            api_url = self.generate_pdp_checkout_api_url(soup)
-            headers = self.generate_pdp_api_headers(soup, url)
-            raw = download(api_url, headers=headers)
-            if raw:
+            price_context = self.get_price_context(page_state)
+            api_url = self.generate_pdp_checkout_api_url(price_context)
+            headers = self.generate_pdp_api_headers(page_state, url, api_key=price_context.get('api_key'))
+            status, raw = download_api(api_url, headers=headers)
+            if rejects_operation(raw):
+                operation_cache.invalidate(price_context.get('js_link'), 'stayCheckout')
+                api_url = self.generate_pdp_checkout_api_url(price_context)
+                status, raw = download_api(api_url, headers=headers)
+            # an api key or bundle the api turns away, a rescanned hash did not help either
+            self.context_rejected = status in REJECTED_STATUSES or rejects_operation(raw)
+            if raw and not rejects_operation(raw):
                 _json = json.loads(raw)
                 price_data_json = _json.get('data', {}).get('presentation', {}).get('stayCheckout')
                 price_per_night = self.get_pdp_price_per_night(price_data_json)
@@ -734,14 +771,10 @@ class AirbnbComDetailStrategy(AbstractCrawler):
 
     def get_pdp_product_id(self, room_data):
         try:
-            sbui_data = room_data.get('sections', {}).get('sbuiData')
-            if sbui_data:
-                sections = sbui_data.get('sectionConfiguration', {}).get('root', {}).get('sections',[])
-                for section in sections:
-                    if section and 'OVERVIEW_DEFAULT_V2' in section.get('sectionId'):
-                        product_id = section.get('loggingData', {}).get('eventData', {}).get('productId')
-                        if product_id:
-                            return product_id
+            for section in RoomDataView.of(room_data).find_sbui_sections('OVERVIEW_DEFAULT_V2'):
+                product_id = section.get('loggingData', {}).get('eventData', {}).get('productId')
+                if product_id:
+                    return product_id
         except Exception as e:
             self.logger.info(str(e))
         return None
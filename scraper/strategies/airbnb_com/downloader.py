@@ -1,5 +1,18 @@
+import logging
+
 from scraper.utils.http_curl import HTTP
 
+logger = logging.getLogger(__name__)
+
+# one client for the whole process, every call borrows a warm session from the shared pool
+http = HTTP()
+
+# the graphql api answers a persisted query hash it does not know with a 400 and an errors payload
+API_STATUSES = [200, 201, 400]
+
+# the api turning the api key or the session away
+REJECTED_STATUSES = [401, 403]
+
 
 def download(url, headers={}, data=None):
 
@@ -17,19 +30,34 @@ def download(url, headers={}, data=None):
             'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
             'viewport-width': '1920',
         }
-    http = HTTP()
+    response = _send(url, headers, data)
+    if response is not None and response.status_code in [200, 201]:
+        return response.text
+    return None
+
+
+def download_api(url, headers={}, data=None):
+    ''' Returns (status_code, text) of a graphql api call. The text of an error answer is kept
+    so the caller can tell a stale operation id from a failed request, status_code is None
+    when nothing came back
+    '''
+    response = _send(url, headers, data)
+    if response is None:
+        return None, None
+    if response.status_code in API_STATUSES:
+        return response.status_code, response.text
+    return response.status_code, None
+
+
+def _send(url, headers, data):
     if not data:
-    
         response = http.get(url, headers=headers )
-        if response and response.status_code in [200, 201]:
-            return response.text
-        else:
-            print(response.status_code)
     else:
         response = http.post(url, headers=headers, data=data )
-        if response and response.status_code in [200, 201]:
-            return response.text
-        else:
-            print(response.status_code)
-    return None
+
+    if response is None:
+        logger.info(f'No response from {url}')
+    elif response.status_code not in [200, 201]:
+        logger.info(f'Status {response.status_code} from {url}')
+    return response
 
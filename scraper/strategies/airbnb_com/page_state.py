@@ -0,0 +1,62 @@
+import html
+import json
+import re
+from functools import cached_property
+
+DEFERRED_STATE_RE = re.compile(r'<script\b[^>]*\bid=["\']data-deferred-state[^"\']*["\'][^>]*>(.*?)</script>', re.DOTALL | re.IGNORECASE)
+INJECTOR_INSTANCES_RE = re.compile(r'<script\b[^>]*\bid=["\']data-injector-instances["\'][^>]*>(.*?)</script>', re.DOTALL | re.IGNORECASE)
+SCRIPT_SRC_RE = re.compile(r'<script\b[^>]*\bsrc=["\']([^"\']+)["\']', re.IGNORECASE)
+
+
+class PageState:
+    ''' The state airbnb embeds in a page, pulled out of the raw html with one targeted scan
+    per script block instead of building a full soup. Every value is computed on first use
+    and kept, so the strategies can ask for it as often as they like.
+    '''
+
+    def __init__(self, raw_data):
+        self.raw_data = raw_data
+        self._script_links = {}
+
+    def _script_json(self, pattern):
+        matches = pattern.search(self.raw_data)
+        if matches:
+            txt = matches.group(1).strip()
+            if txt:
+                return json.loads(txt)
+        return {}
+
+    @cached_property
+    def deferred_state(self):
+        return self._script_json(DEFERRED_STATE_RE)
+
+    @cached_property
+    def injector_instances(self):
+        return self._script_json(INJECTOR_INSTANCES_RE)
+
+    @cached_property
+    def script_srcs(self):
+        return [html.unescape(src) for src in SCRIPT_SRC_RE.findall(self.raw_data)]
+
+    def find_script_src(self, pattern):
+        ''' Returns the first script src matching the pattern, case insensitive
+        '''
+        if pattern not in self._script_links:
+            link = None
+            compiled = re.compile(pattern, re.IGNORECASE)
+            for src in self.script_srcs:
+                if compiled.search(src):
+                    link = src
+                    break
+            self._script_links[pattern] = link
+        return self._script_links[pattern]
+
+    @cached_property
+    def spa_data(self):
+        return self.injector_instances.get('root > core-guest-spa', {})
+
+    @cached_property
+    def api_key(self):
+        bootstrap_token_data = self.spa_data[0][1]
+        return bootstrap_token_data.get('layout-init', {}).get('api_config', {}).get('key')
+
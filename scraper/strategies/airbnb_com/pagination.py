@@ -0,0 +1,84 @@
+import copy
+import json
+
+CURSOR_MARK = '__page_cursor__'
+
+
+class PaginationPlan:
+    ''' Everything the StaysSearch calls after page 1 need, taken from page 1 once: the search
+    variables, the page cursors, the listings to skip hydrating and the api headers.
+
+    The variables are serialized once with a mark where the cursor goes, so the payload of a
+    page is the cursor joined into that template. The plan is plain json so a checkpoint can
+    carry it and a resumed crawl does not need page 1 again.
+    '''
+
+    def __init__(self, variables, cursors, skip_ids, operation_id, api_headers=None, search_js_url=None):
+        self.variables = variables
+        self.cursors = list(cursors or [])
+        self.skip_ids = list(skip_ids or [])
+        self.api_headers = api_headers
+        self.search_js_url = search_js_url
+        self.set_operation_id(operation_id)
+
+    @property
+    def last_page(self):
+        return len(self.cursors)
+
+    def set_operation_id(self, operation_id):
+        ''' Rebuilds the payload template, the template is swapped in one assignment so pages
+        being fetched meanwhile see either hash but never half of one
+        '''
+        # the variables are shared with the checkpoint so only a copy is changed
+        variables = copy.deepcopy(self.variables)
+        for request in ('staysSearchRequest', 'staysMapSearchRequestV2'):
+            variables[request].update({
+                "cursor": CURSOR_MARK,
+                "skipHydrationListingIds": self.skip_ids
+            })
+        payload = {
+            "operationName": "StaysSearch",
+            "variables": variables,
+            "extensions": {
+                "persistedQuery": {
+                "version": 1,
+                "sha256Hash": operation_id
+                }
+            }
+        }
+        template = json.dumps(payload, separators=(',',':'))
+        self._parts = (operation_id, template.split(json.dumps(CURSOR_MARK)))
+
+    @property
+    def operation_id(self):
+        return self._parts[0]
+
+    def payload(self, page):
+        ''' The StaysSearch payload of a page, counted from 1. None past the last page
+        '''
+        # the cursor of page n sits at n - 1 since the cursors start at page 1
+        if page < 1 or page > self.last_page:
+            return None
+        _, parts = self._parts
+        return json.dumps(self.cursors[page - 1]).join(parts)
+
+    def to_state(self):
+        return {
+            "variables": self.variables,
+            "cursors": self.cursors,
+            "skip_ids": self.skip_ids,
+            "operation_id": self.operation_id,
+            "api_headers": self.api_headers,
+            "search_js_url": self.search_js_url,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(
+            state.get('variables'),
+            state.get('cursors'),
+            state.get('skip_ids'),
+            state.get('operation_id'),
+            api_headers=state.get('api_headers'),
+            search_js_url=state.get('search_js_url'),
+        )
@@ -0,0 +1,72 @@
+from functools import cached_property
+
+
+class RoomDataView:
+    ''' Read side of a StaysPdpSections response. The sections are indexed by sectionId and
+    sectionComponentType on first use and the subtrees the getters share are kept, so a
+    listing costs one pass over its sections whatever the number of getters.
+    '''
+
+    def __init__(self, room_data):
+        self.room_data = room_data or {}
+
+    @classmethod
+    def of(cls, room_data):
+        return room_data if isinstance(room_data, cls) else cls(room_data)
+
+    @staticmethod
+    def raw(room_data):
+        return room_data.room_data if isinstance(room_data, RoomDataView) else room_data
+
+    def __bool__(self):
+        return bool(self.room_data)
+
+    @cached_property
+    def sections_root(self):
+        return self.room_data.get('sections') or {}
+
+    @cached_property
+    def metadata(self):
+        return self.sections_root.get('metadata') or {}
+
+    @cached_property
+    def sharing_config(self):
+        return self.metadata.get('sharingConfig') or {}
+
+    @cached_property
+    def event_data(self):
+        return self.metadata.get('loggingContext', {}).get('eventDataLogging') or {}
+
+    @cached_property
+    def sbui_sections(self):
+        sbui_data = self.sections_root.get('sbuiData') or {}
+        sections = sbui_data.get('sectionConfiguration', {}).get('root', {}).get('sections') or []
+        index = {}
+        for section in sections:
+            if section:
+                index.setdefault(section.get('sectionId'), section)
+        return index
+
+    @cached_property
+    def _sections_index(self):
+        by_id = {}
+        by_type = {}
+        for section in self.sections_root.get('sections') or []:
+            if section:
+                by_id.setdefault(section.get('sectionId'), section)
+                by_type.setdefault(section.get('sectionComponentType'), section)
+        return by_id, by_type
+
+    def sbui_section(self, section_id):
+        return self.sbui_sections.get(section_id)
+
+    def find_sbui_sections(self, text):
+        ''' The sbui sections whose id contains the text, in response order
+        '''
+        return [section for section_id, section in self.sbui_sections.items() if section_id and text in section_id]
+
+    def section(self, section_id):
+        return self._sections_index[0].get(section_id)
+
+    def section_of_type(self, component_type):
+        return self._sections_index[1].get(component_type)
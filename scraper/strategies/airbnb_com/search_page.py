@@ -1,80 +1,358 @@
+import copy
 import json
 import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import List
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterator, List
 from urllib.parse import urlencode, quote, urlparse, parse_qs
 
-from bs4 import BeautifulSoup
-
 from scraper.strategies.abstract import AbstractCrawler
-from scraper.strategies.airbnb_com.downloader import download
+from scraper.strategies.airbnb_com.downloader import download, download_api
+from scraper.strategies.airbnb_com.page_state import PageState
+from scraper.strategies.airbnb_com.pagination import PaginationPlan
 from scraper.strategies.airbnb_com.detail_page import AirbnbComDetailStrategy
+from scraper.utils.checkpoint import CrawlCheckpoint
+from scraper.utils.http_curl import configure_pool
+from scraper.utils.field_spec import Field, FieldSpec, number, pluck, regex, strip
+from scraper.utils.geo_tiles import ListingClaims, Tile
+from scraper.utils.operation_cache import operation_cache, rejects_operation
+from scraper.utils.url_generator import generate_query_url
+
+# airbnb stops paginating a search at 15 pages, a tile showing all of them may hold more
+TILE_PAGE_CAP = 15
 
 class AirbnbComSearchStrategy(AbstractCrawler):
 
+    output_fields = [
+        "check_in_date",
+        "check_out_date",
+        "rank",
+        "label",
+        "url",
+        "description",
+        "currency",
+        "price_per_night",
+        "orig_price_per_night",
+        "total_price",
+        "rating_score",
+        "rating_count",
+        "labels",
+        "image_url",
+        "property_type",
+        "host_name",
+        "cleanliness",
+        "accuracy",
+        "location_rate",
+        "communication",
+        "check_in_rating",
+        "guest",
+        "baths",
+        "beds",
+        "bedrooms",
+        "kitchen",
+        "pool",
+        "lattitude",
+        "longtitude",
+        "amenities",
+        "cleaning_fee",
+        "service_fee",
+    ]
+
+    # kept whatever fields are asked for so every row can still be told apart
+    key_fields = ["rank", "url"]
+
+    # what is read from every search result, compiled once for the class
+    search_fields = FieldSpec([
+        Field("label", "listing.title", strip, str),
+        Field("description", "listing.name", strip, str),
+        # a discounted card leaves price empty and shows discountedPrice instead
+        Field("price_per_night", [
+            "pricingQuote.structuredStayDisplayPrice.primaryLine.price",
+            "pricingQuote.structuredStayDisplayPrice.primaryLine.discountedPrice",
+        ], number, float, skip_empty=True),
+        Field("orig_price_per_night", "pricingQuote.structuredStayDisplayPrice.primaryLine.originalPrice", number, float),
+        Field("total_price", "pricingQuote.structuredStayDisplayPrice.secondaryLine.price", number, float),
+        Field("rating_score", "listing.avgRatingA11yLabel", regex(r'([0-9.]+) out', float), float),
+        Field("rating_count", "listing.avgRatingA11yLabel", regex(r'(\d+) reviews', int), int),
+        Field("labels", "listing.formattedBadges", pluck("text"), list),
+        Field("image_url", "listing.contextualPictures.0.picture", None, str),
+    ])
+
+    # what a search only crawl takes from the card of a full result, its detail page is only
+    # fetched for the ones of these that were asked for and that the card lacks
+    search_only_fields = ["label", "price_per_night", "rating_score", "rating_count"]
+
     def __init__(self, logger):
         self.origin_url = None
         self.logger=logger
+        self.detail_concurrency = 1
+        self.search_js_url = None
+        self.fields = None
+        self.search_only = False
+        self.checkpoint = False
+        self.resume = False
+        self.page_concurrency = 1
+        self.tiles = False
+        self.tile_concurrency = 4
+        self.tile_max_depth = 6
+        self.tile_page_cap = TILE_PAGE_CAP
+        self.claims = None
+        self.static_listings = None
+        self.skip_ids = set()
+        self.page_listing_ids = []
 
     def execute(self, config) -> List:
-        self.origin_url = config.get('url')
+        self.configure(config)
         page_limit = config.get('page_limit', None)
         results = self._crawl_listing(self.origin_url,page_limit=page_limit)
 
         return results
+
+    def iter_execute(self, config) -> Iterator[Dict]:
+        self.configure(config)
+        page_limit = config.get('page_limit', None)
+        for _, data in self._iter_search(self.origin_url, page_limit=page_limit):
+            yield data
+
+    def configure(self, config):
+        self.origin_url = config.get('url')
+        self.detail_concurrency = config.get('detail_concurrency', 1)
+        self.fields = config.get('fields')
+        # listings other than SkinnyListingItem usually carry title, price and rating in the
+        # search payload, search only runs take those and skip their detail page
+        self.search_only = config.get('search_only', False)
+        # a resumed crawl checkpoints every finished page and carries on after the last one
+        # an earlier run of the same search left
+        self.resume = config.get('resume', False)
+        self.checkpoint = config.get('checkpoint', self.resume)
+        # every page cursor is known after page 1, so the later pages can be fetched together
+        self.page_concurrency = config.get('page_concurrency', 1)
+        # map searches can be cut into tiles to get past the result cap of a single search
+        self.tiles = config.get('tiles', False)
+        self.tile_concurrency = config.get('tile_concurrency', 4)
+        self.tile_max_depth = config.get('tile_max_depth', 6)
+        self.tile_page_cap = config.get('tile_page_cap') or TILE_PAGE_CAP
+        # a date sweep shares the static detail data of the listings across its windows
+        self.static_listings = config.get('static_listings')
+        max_in_flight = config.get('max_in_flight')
+        if max_in_flight:
+            # every request borrows a session from the shared pool, so its size caps the
+            # number of requests in flight across all the detail workers
+            configure_pool(max_in_flight)
     
     def _crawl_listing(self, url, page_limit=None):
-        self.origin_url = url
-        next_page_url = url
         results = []
-        initial_raw = None
-        payload = None
-        api_headers = None
-        search_operation_id = None
+        for _, items in groupby(self._iter_search(url, page_limit=page_limit), key=itemgetter(0)):
+            results.append([data for _, data in items])
+        return results
+
+    def _iter_search(self, url, page_limit=None):
+        if self.tiles and Tile.from_url(url):
+            return self._iter_tiles(url, page_limit=page_limit)
+        return self._iter_listing(url, page_limit=page_limit)
+
+    def _iter_tiles(self, url, page_limit=None):
+        ''' Yields (tile, listing) pairs of a map search cut into quadtree tiles. A tile whose
+        page 1 shows the result cap is split in four, the others are crawled on
+        tile_concurrency workers. A listing found by two tiles is kept once and the ranks
+        count the listings in the order they come out
+        '''
+        self.origin_url = url
+        claims = ListingClaims()
+        tiles_done = 0
+        rank = 1
+        with ThreadPoolExecutor(max_workers=max(1, self.tile_concurrency)) as executor:
+            pending = {executor.submit(self.crawl_tile, Tile.from_url(url), claims, page_limit)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tiles, items = future.result()
+                    if tiles:
+                        pending.update(executor.submit(self.crawl_tile, tile, claims, page_limit) for tile in tiles)
+                        continue
+                    tiles_done += 1
+                    for data in items:
+                        data.update({"rank": rank})
+                        rank += 1
+                        yield tiles_done, data
+        self.logger.info(f'[*] Crawled {tiles_done} tiles, {len(claims)} listings')
+
+    def crawl_tile(self, tile, claims, page_limit=None):
+        ''' Returns (tiles, listings), the quadrants to crawl instead when the tile is capped,
+        otherwise the enriched listings of the tile
+        '''
+        try:
+            tile_url = generate_query_url(self.origin_url, **tile.query())
+            self.logger.info(f'Connecting to: {tile_url}')
+            raw_data = download(tile_url)
+            if not raw_data:
+                self.logger.info(f"No raw data found for {tile}")
+                return [], []
+            page_state = PageState(raw_data)
+            if tile.depth < self.tile_max_depth and self.is_capped(page_state):
+                self.logger.info(f'[*] Splitting {tile}')
+                return tile.split(), []
+
+            # the per crawl state lives on the strategy, so every tile runs on its own copy
+            crawler = copy.copy(self)
+            crawler.claims = claims
+            crawler.checkpoint = False
+            crawler.resume = False
+            return [], [data for _, data in crawler._iter_listing(tile_url, page_limit, page_state=page_state)]
+        except Exception as e:
+            self.logger.info(str(e))
+        return [], []
+
+    def is_capped(self, page_state):
+        pagination_json = self.get_pagination_json(self.get_deffered_state(page_state))
+        cursors = pagination_json.get('page_info', {}).get('pageCursors') or []
+        return len(cursors) >= self.tile_page_cap
+
+    def _iter_listing(self, url, page_limit=None, page_state=None):
+        ''' Yields (page, listing) pairs as soon as each listing is enriched. page_state is page 1
+        when the caller already has it
+        '''
+        self.origin_url = url
+        plan = None
         page = 1
         start_rank = 1
+        checkpoint = None
+        if self.checkpoint:
+            checkpoint = CrawlCheckpoint(url, fields=sorted(self.fields or []), search_only=self.search_only)
+            checkpoint.prune()
+        resume_state = checkpoint.load() if checkpoint and self.resume else None
+        listing_ids = []
+        if resume_state and resume_state.get('plan'):
+            # the plan carries what page 1 gave, so the crawl goes straight to the saved page
+            plan = PaginationPlan.from_state(resume_state.get('plan'))
+            page = resume_state.get('page')
+            start_rank = resume_state.get('start_rank')
+            listing_ids = resume_state.get('listing_ids', [])
+            self.skip_ids = set(listing_ids)
+            self.search_js_url = plan.search_js_url
+            self.logger.info(f'[*] Resuming from page {page}')
+        completed = False
         try:
-            while(next_page_url):
-                self.logger.info(f'Connecting to: {next_page_url}')
-                raw_data = download(next_page_url, headers=api_headers, data=payload)
+            while(True):
+                if plan is None:
+                    if page_state is None:
+                        self.logger.info(f'Connecting to: {url}')
+                        raw_data = download(url)
+                        page_state = PageState(raw_data) if raw_data else None
+                    raw_data = page_state
+                else:
+                    raw_data = self.fetch_search_page(plan, page)
                 if not raw_data:
                     self.logger.info(f"No raw data found")
                     break
-                
-                if initial_raw is None:
-                    initial_raw = raw_data
 
                 self.logger.info(f'Parsing Data')
-                result = self.parse(raw_data, start_rank)
-                if not result:
+                if plan is None:
+                    for data in self.iter_parse(page_state, start_rank):
+                        yield page, data
+                    if self.page_listing_ids:
+                        plan = self.build_pagination_plan(page_state, url)
+                    # the plan keeps what the later pages need, the page 1 html can go
+                    page_state = raw_data = None
+                else:
+                    for data in self.iter_parse(raw_data, start_rank):
+                        yield page, data
+                page_size = len(self.page_listing_ids)
+                if not page_size or not plan or not plan.payload(page + 1):
+                    completed = True
                     break
-                results.append(result)
-    
-                if search_operation_id is None:
-                    search_operation_id = self.fetch_search_operation_id(raw_data)
 
-                payload = self.generate_search_api_payload(initial_raw, page, search_operation_id)
-                if not payload:
+                if checkpoint:
+                    listing_ids.extend(self.page_listing_ids)
+                    checkpoint.save(
+                        page=page + 1,
+                        start_rank=start_rank + page_size,
+                        plan=plan.to_state(),
+                        listing_ids=listing_ids,
+                    )
+
+                if page_limit and page >= page_limit:
+                    completed = True
                     break
 
-                if api_headers is None:
-                    soup = BeautifulSoup(raw_data, 'lxml')
-                    api_headers = self.generate_api_headers(soup, url)
-                next_page_url = self.generate_search_api_url(search_operation_id)
-
-                if page_limit and page_limit >= page:
+                if self.page_concurrency > 1:
+                    completed = yield from self._iter_pages(plan, page + 1, page_size, start_rank + page_size,
+                                                            page_limit, checkpoint, listing_ids)
                     break
                 page += 1
-                start_rank = len(result) + start_rank
+                start_rank = page_size + start_rank
 
         except Exception as e:
             self.logger.info(str(e))
-        return results
+
+        if checkpoint and completed:
+            checkpoint.clear()
     
+    def _iter_pages(self, plan, first_page, page_size, start_rank, page_limit=None, checkpoint=None, listing_ids=None):
+        ''' Fetches first_page up to the last page concurrently and yields their (page, listing)
+        pairs in page order. The rank of a page follows from its position. Returns True when
+        every page went through
+        '''
+        last_page = plan.last_page
+        if page_limit:
+            last_page = min(last_page, page_limit)
+        pages = list(range(first_page, last_page + 1))
+        if not pages:
+            return True
+
+        def page_rank(page):
+            return start_rank + (page - first_page) * page_size
+
+        def crawl_page(page):
+            # each worker also enriches its page, so the detail requests of all the pages overlap
+            raw_data = self.fetch_search_page(plan, page)
+            if not raw_data:
+                return None
+            listing_items_json = self.get_page_items(raw_data)
+            page_ids = [self.get_listing_id(item) for item in listing_items_json]
+            return page_ids, list(self.iter_parse_items(listing_items_json, page_rank(page)))
+
+        workers = min(self.page_concurrency, len(pages))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for page, result in zip(pages, executor.map(crawl_page, pages)):
+                if result is None:
+                    self.logger.info(f"No raw data found for page {page}")
+                    return False
+
+                page_ids, items = result
+                for data in items:
+                    yield page, data
+                if not page_ids:
+                    return True
+
+                if checkpoint and plan.payload(page + 1):
+                    listing_ids.extend(page_ids)
+                    checkpoint.save(
+                        page=page + 1,
+                        start_rank=page_rank(page + 1),
+                        plan=plan.to_state(),
+                        listing_ids=listing_ids,
+                    )
+        return True
+
+    def fetch_search_page(self, plan, page):
+        url = self.generate_search_api_url(plan.operation_id)
+        self.logger.info(f'Connecting to: {url}')
+        _, raw_data = download_api(url, headers=plan.api_headers, data=plan.payload(page))
+        if rejects_operation(raw_data) and self.search_js_url:
+            # the cached hash may be stale after a deploy, scan the bundle again once
+            operation_cache.invalidate(self.search_js_url, 'StaysSearch')
+            operation_id = self.fetch_search_operation_id()
+            if operation_id:
+                plan.set_operation_id(operation_id)
+            _, raw_data = download_api(self.generate_search_api_url(plan.operation_id), headers=plan.api_headers, data=plan.payload(page))
+        return None if rejects_operation(raw_data) else raw_data
+
     def get_next_page(self, raw_data, url):
         next_url = None
-        soup = BeautifulSoup(raw_data, 'lxml')
-        deffered_state_json = self.get_deffered_state(soup)
+        deffered_state_json = self.get_deffered_state(PageState(raw_data))
         pagination_json =  self.get_pagination_json(deffered_state_json)
         if pagination_json:
             next_page_cursor = pagination_json.get('page_info', {}).get('nextPageCursor')
@@ -85,71 +363,104 @@ class AirbnbComSearchStrategy(AbstractCrawler):
 
     
     def parse(self, raw_data, start_rank):
-        results = []
-        listing_items_json = []
-        if '<!doctype html' in raw_data:
-            soup = BeautifulSoup(raw_data, 'lxml')
-            deffered_state_json = self.get_deffered_state(soup)
-            listing_items_json = self.get_listing_items(deffered_state_json)
-        else:
-            state_json = json.loads(raw_data)
-            listing_items_json = self.get_listing_items(state_json)
-
+        return list(self.iter_parse(raw_data, start_rank))
+
+    def iter_parse(self, raw_data, start_rank):
+        listing_items_json = self.get_page_items(raw_data)
+        self.page_listing_ids = [self.get_listing_id(item) for item in listing_items_json]
+        yield from self.iter_parse_items(listing_items_json, start_rank)
+
+    def get_page_items(self, raw_data):
+        if isinstance(raw_data, PageState) or '<!doctype html' in raw_data:
+            page_state = raw_data if isinstance(raw_data, PageState) else PageState(raw_data)
+            deffered_state_json = self.get_deffered_state(page_state)
+            return self.get_listing_items(deffered_state_json)
+        state_json = json.loads(raw_data)
+        return self.get_listing_items(state_json)
+
+    def iter_parse_items(self, listing_items_json, start_rank):
+        listing_ids = [self.get_listing_id(item) for item in listing_items_json]
+        skip_ids = self.skip_ids
+        if self.claims is not None:
+            # a listing on the edge of two tiles is left to the tile that claimed it first
+            skip_ids = skip_ids | (set(listing_ids) - self.claims.claim(listing_ids))
         try:
             dates = self.get_check_dates()
             check_in = dates.get('checkin')
             check_out = dates.get('checkout')
+            rows = self.search_fields.extract_many(listing_items_json)
+            rooms_data = self.iter_listing_room_data(listing_items_json, skip_ids)
             rank = start_rank
-            for item in listing_items_json:
-                url = self.get_url(item)
-                room_data = {}
-                if item.get('__typename') == 'SkinnyListingItem':
-                    config = {"with_price": True}
-                    room_data = self.fetch_room_data(url, config)
-                    title = room_data.get('title')
-                    image_url = room_data.get('image_url')
-                    description = room_data.get('description')
-                    price_per_night = room_data.get('price_per_night')
-                    orig_price_per_night = room_data.get('orig_price_per_night')
-                    total_price = room_data.get('total_price')
-                    rating_score = room_data.get('rating_score')
-                    rating_count = room_data.get('rating_count')
+            for listing_id, row, (url, room_data) in zip(listing_ids, rows, rooms_data):
+                if listing_id in skip_ids:
+                    rank += 1
+                    continue
+                try:
+                    # guests = self.get_pdp_guests(room_data)
+
+                    data = {
+                        "check_in_date": check_in,
+                        "check_out_date": check_out,
+                        "rank": rank,
+                        "label": row["label"],
+                        "url": url,
+                        "description": row["description"],
+                        "currency": "USD",
+                        "price_per_night": row["price_per_night"],
+                        "orig_price_per_night": row["orig_price_per_night"],
+                        "total_price": row["total_price"],
+                        "rating_score": row["rating_score"],
+                        "rating_count": row["rating_count"],
+                        "labels": row["labels"],
+                        "image_url": row["image_url"],
+
+                    }
+                    data.update(room_data)
+                    if self.fields is not None:
+                        data = {key: value for key, value in data.items() if key in self.fields or key in self.key_fields}
+                except Exception as e:
+                    self.logger.info(f'[*] Failed to parse listing {url} {str(e)}')
                 else:
-                    room_data = self.fetch_room_data(url)
-                title = self.get_title(item)
-                description = self.get_description(item)
-                price_per_night = self.get_price_per_night(item)
-                orig_price_per_night = self.get_orig_price_per_night(item)
-                total_price = self.get_total_price(item)
-                rating_score = self.get_rating_score(item)
-                rating_count = self.get_rating_count(item)
-                labels = self.get_labels(item)
-                image_url = self.get_image_url(item)
-                # guests = self.get_pdp_guests(room_data)
-
-                data = {
-                    "check_in_date": check_in,
-                    "check_out_date": check_out,
-                    "rank": rank,
-                    "label": title,
-                    "url": url,
-                    "description": description,
-                    "currency": "USD",
-                    "price_per_night": price_per_night,
-                    "orig_price_per_night": orig_price_per_night,
-                    "total_price": total_price,
-                    "rating_score": rating_score,
-                    "rating_count": rating_count,
-                    "labels": labels,
-                    "image_url": image_url,
-
-                }
-                data.update(room_data)
+                    yield data
                 rank += 1
-                results.append(data)
         except Exception as e:
             self.logger.info(str(e))
-        return results
+
+    def iter_listing_room_data(self, listing_items_json, skip_ids=None):
+        ''' Fetches the detail page data of every listing, yields (url, room_data) pairs in the
+        same order as the listing items so the ranks are kept
+        '''
+        skip_ids = self.skip_ids if skip_ids is None else skip_ids
+        checked_fields = [field for field in self.search_only_fields if self.fields is None or field in self.fields]
+        jobs = []
+        for item in listing_items_json:
+            url = self.get_url(item)
+            config = {"fields": self.fields}
+            skinny = item.get('__typename') == 'SkinnyListingItem'
+            if skinny:
+                config.update({"with_price": True})
+            # a listing enriched by the run this one resumes or by another tile is skipped
+            fetch = self.get_listing_id(item) not in skip_ids
+            if fetch and self.search_only and not skinny:
+                # a search only crawl keeps a full result as it is, unless its card lacks one of
+                # the fields asked for, only those are then read from the detail page
+                absent = self.search_fields.missing(item, checked_fields)
+                fetch = bool(absent)
+                config = {"fields": absent, "with_price": "price_per_night" in absent}
+            jobs.append((url, config, fetch))
+
+        def room_data(job):
+            url, config, fetch = job
+            return self.fetch_room_data(url, config) if fetch else {}
+
+        urls = [url for url, _, _ in jobs]
+        if self.detail_concurrency > 1 and len(jobs) > 1:
+            workers = min(self.detail_concurrency, len(jobs))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                yield from zip(urls, executor.map(room_data, jobs))
+        else:
+            for job in jobs:
+                yield job[0], room_data(job)
     
     def get_url(self, item_json):
         value = str()
@@ -168,8 +479,7 @@ class AirbnbComSearchStrategy(AbstractCrawler):
                 quary_params.update({'check_out': check_out[0]})
 
             base_url = 'https://www.airbnb.com/rooms/'
-            id = item_json.get('listing', {}).get('id') \
-                or item_json.get('listingId')
+            id = self.get_listing_id(item_json)
             if id and quary_params:
                 value = f'{base_url}{id.strip()}?{urlencode(quary_params, quote_via=quote)}'
             elif id:
@@ -178,6 +488,10 @@ class AirbnbComSearchStrategy(AbstractCrawler):
             self.logger.info(str(e))
         return value
 
+    def get_listing_id(self, item_json):
+        return item_json.get('listing', {}).get('id') \
+            or item_json.get('listingId')
+
     def get_pagination_json(self, deffered_state_json):
         client_data = deffered_state_json.get('niobeMinimalClientData')
         try:
@@ -202,55 +516,56 @@ class AirbnbComSearchStrategy(AbstractCrawler):
 
         return {}
     
-    def generate_search_api_payload(self, raw_data, page, operation_id):
-        soup = BeautifulSoup(raw_data, 'lxml')
-        
+    def build_pagination_plan(self, page_state, url=None, operation_id=None):
+        ''' Takes what the later StaysSearch calls need out of page 1, once
+        '''
         try:
-            deffered_state_json = self.get_deffered_state(soup)
+            deffered_state_json = self.get_deffered_state(page_state)
             listing_items_json = self.get_listing_items(deffered_state_json)
             item_ids = [item.get('listing', {}).get('id') for item in listing_items_json]
             pagination_json =  self.get_pagination_json(deffered_state_json)
+            cursors = pagination_json.get('page_info', {}).get('pageCursors') or []
 
             client_data = deffered_state_json.get('niobeMinimalClientData')
             search_result = client_data[0][1]
-            # the next page cursor is the page number since the cursor index starts at 0
-            # but the page start at 1
-            cursor = pagination_json.get('page_info', {}).get('pageCursors')[page]
-            variables = search_result.get('variables', {})
-
-            variables['staysSearchRequest'].update({
-                "cursor": cursor,
-                "skipHydrationListingIds": item_ids
-                })
-            
-            variables['staysMapSearchRequestV2'].update({
-                "cursor": cursor,
-                "skipHydrationListingIds": item_ids
-                })
-            
-            payload = {
-                "operationName": "StaysSearch",
-                "variables": variables,
-                "extensions": {
-                    "persistedQuery": {
-                    "version": 1,
-                    "sha256Hash": operation_id
-                    }
-                }
-            }
-            return json.dumps(payload, separators=(',',':'))
+            return PaginationPlan(
+                search_result.get('variables', {}),
+                cursors,
+                item_ids,
+                operation_id or self.fetch_search_operation_id(page_state),
+                api_headers=self.generate_api_headers(page_state, url or self.origin_url),
+                search_js_url=self.search_js_url,
+            )
+        except Exception as e:
+            self.logger.info(str(e))
+
+        return None
+
+    def generate_search_api_payload(self, page_state, page, operation_id):
+        ''' The payload of the page after page, kept for callers holding a page state. A crawl
+        builds the plan once instead
+        '''
+        try:
+            return self.build_pagination_plan(page_state, operation_id=operation_id).payload(page + 1)
         except Exception as e:
             self.logger.info(str(e))
 
         return None
     
-    def fetch_search_operation_id(self, raw_data):
+    def fetch_search_operation_id(self, page_state=None):
+        try:
+            js_url = self.get_search_js_link(page_state) if page_state is not None else self.search_js_url
+            self.search_js_url = js_url
+            return operation_cache.get_or_fetch(js_url, 'StaysSearch', lambda: self.scan_operation_id(js_url, 'StaysSearch'))
+        except Exception as e:
+            self.logger.info(str(e))
+        return None
+
+    def scan_operation_id(self, url, operation_name):
         try:
-            soup = BeautifulSoup(raw_data, 'lxml')
-            js_url = self.get_search_js_link(soup)
-            raw = download(js_url)
+            raw = download(url)
             if raw:
-                matches = re.search(r"'StaysSearch',type:'query',operationId:'([0-9a-zA-Z]+)'", raw)
+                matches = re.search(f"'{re.escape(operation_name)}',type:'query',operationId:'([0-9a-zA-Z]+)'", raw)
                 if matches:
                     return matches.group(1)
         except Exception as e:
@@ -260,31 +575,22 @@ class AirbnbComSearchStrategy(AbstractCrawler):
     def generate_search_api_url(self, operation_id):
         return f'https://www.airbnb.com/api/v3/StaysSearch/{operation_id}?operationName=StaysSearch&locale=en&currency=USD'
     
-    def get_search_js_link(self, soup):
+    def get_search_js_link(self, page_state):
         ''' This script url will contain the hash of the operation_id for the search api route
         '''
-        tag = soup.find('script', src=re.compile('web/common/frontend/stays-search/routes/StaysSearchRoute/StaysSearchRoute.prepare', re.IGNORECASE))
-        if tag:
-            return tag.get('src')
-        return None
+        return page_state.find_script_src('web/common/frontend/stays-search/routes/StaysSearchRoute/StaysSearchRoute.prepare')
     
-    def get_injector_instance_json(self, soup):
+    def get_injector_instance_json(self, page_state):
         try:
-            tag = soup.select_one('#data-injector-instances')
-            if tag:
-                txt = tag.get_text().strip()
-                return json.loads(txt)
+            return page_state.injector_instances
         except Exception as e:
             self.logger.info(str(e))
         return {}
         
-    def generate_api_headers(self, soup, url):
+    def generate_api_headers(self, page_state, url):
         header = {}
         try:
-            injector_json = self.get_injector_instance_json(soup)
-            spa_data = injector_json.get('root > core-guest-spa', {})
-            bootstrap_token_data= spa_data[0][1]
-            api_key = bootstrap_token_data.get('layout-init', {}).get('api_config', {}).get('key')
+            api_key = page_state.api_key
             header = {
                 "authority":"www.airbnb.com",
                 "accept":"*/*",
@@ -307,10 +613,45 @@ class AirbnbComSearchStrategy(AbstractCrawler):
             print('failed to generate api headers')
         return header
 
-    def fetch_room_data(self, url, config={}):
+    def fetch_room_data(self, url, config=None):
+        config = config or {}
+        if self.static_listings is not None:
+            return self.fetch_window_room_data(url, config)
+        return self.fetch_detail(url, config)
 
+    def fetch_window_room_data(self, url, config):
+        ''' The first window to reach a listing fetches it whole and keeps its static data and
+        product id, later windows only fetch their price, straight from stayCheckout
+        '''
+        listing_id = urlparse(url).path.rstrip('/').split('/')[-1]
+        price_fields = AirbnbComDetailStrategy.fields_of_call('checkout')
+        fetched = {}
+
+        def fetch():
+            fetched.update(self.fetch_detail(url, dict(config, with_product_id=True)))
+            return {key: value for key, value in fetched.items() if key not in price_fields}
+
+        static_data = self.static_listings.get_or_fetch(listing_id, fetch)
+        if fetched:
+            return {key: value for key, value in fetched.items() if key != 'product_id'}
+        data = {key: value for key, value in static_data.items() if key != 'product_id'}
+        if config.get('with_price'):
+            if self.fields is not None:
+                price_fields = [field for field in price_fields if field in self.fields]
+            if price_fields:
+                price_config = dict(config, fields=price_fields, product_id=static_data.get('product_id'), with_product_id=True)
+                price_data = self.fetch_detail(url, price_config)
+                product_id = price_data.pop('product_id', None)
+                if product_id and not static_data.get('product_id'):
+                    # the window that fetched the listing had no price to fetch and so no product id
+                    self.static_listings.update(listing_id, {"product_id": product_id})
+                data.update(price_data)
+        return data
+
+    def fetch_detail(self, url, config):
         try:
             strategy = AirbnbComDetailStrategy(self.logger)
+            config = dict(config or {})
             config.update({"url":url})
             room_data = strategy.execute(config)
             if room_data:
@@ -321,120 +662,43 @@ class AirbnbComSearchStrategy(AbstractCrawler):
         return {}
 
 
+    def selected_fields(self, fields=None):
+        if fields is None:
+            return self.output_fields
+        return [field for field in self.output_fields if field in fields or field in self.key_fields]
+
     def get_title(self, item_json):
-        value = str()
-        try:
-            txt = item_json.get('listing', {}).get('title')
-            if txt:
-                return txt.strip()
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.search_fields["label"](item_json)
 
     def get_description(self, item_json):
-        value = str()
-        try:
-            txt = item_json.get('listing', {}).get('name')
-            if txt:
-                return txt.strip()
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.search_fields["description"](item_json)
 
     def get_price_per_night(self, item_json):
-        value = float()
-        try:
-            price_displays = item_json.get('pricingQuote', {}).get('structuredStayDisplayPrice')
-            if price_displays:
-                price_txt = price_displays.get('primaryLine', {}).get('price','')
-                if not price_txt:
-                    price_txt = price_displays.get('primaryLine', {}).get('discountedPrice')
-                if price_txt:
-                    value = float(re.sub('[^0-9.]', '', price_txt))
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.search_fields["price_per_night"](item_json)
     
     def get_orig_price_per_night(self, item_json):
-        value = float()
-        try:
-            price_displays = item_json.get('pricingQuote', {}).get('structuredStayDisplayPrice')
-            if price_displays:
-                price_txt = price_displays.get('primaryLine', {}).get('originalPrice')
-                if price_txt:
-                    value = float(re.sub('[^0-9.]', '', price_txt))
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.search_fields["orig_price_per_night"](item_json)
 
 
     def get_total_price(self, item_json):
-        value = float()
-        try:
-            price_displays = item_json.get('pricingQuote', {}).get('structuredStayDisplayPrice')
-            if price_displays:
-                price_txt = price_displays.get('secondaryLine', {}).get('price')
-                if price_txt:
-                    value = float(re.sub('[^0-9.]', '', price_txt))
-
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.search_fields["total_price"](item_json)
 
     def get_rating_score(self, item_json):
-        value = float()
-        try:
-            label_txt = item_json.get('listing', {}).get('avgRatingA11yLabel')
-            matches = re.search(r'([0-9.]+) out', label_txt)
-            if matches:
-                return float(matches.group(1))
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.search_fields["rating_score"](item_json)
 
     def get_rating_count(self, item_json):
-        value = int()
-        try:
-            label_txt = item_json.get('listing', {}).get('avgRatingA11yLabel')
-            matches = re.search(r'(\d+) reviews', label_txt)
-            if matches:
-                return int(matches.group(1))
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.search_fields["rating_count"](item_json)
 
 
     def get_image_url(self, item_json):
-        value = str()
-        try:
-            images = item_json.get('listing', {}).get('contextualPictures',[])
-            if images:
-                url = images[0].get('picture')
-                if url:
-                    return url
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.search_fields["image_url"](item_json)
 
     def get_labels(self, item_json):
-        value = []
-        try:
-            badges = item_json.get('listing', {}).get('formattedBadges',[])
-            if badges:
-                for badge in badges:
-                    txt = badge.get('text')
-                    if txt:
-                        value.append(txt.strip())
-        except Exception as e:
-            self.logger.info(str(e))
-        return value
+        return self.search_fields["labels"](item_json)
     
-    def get_deffered_state(self, soup):
-        tag = soup.select_one('script[id^="data-deferred-state"]')
+    def get_deffered_state(self, page_state):
         try:
-            if tag:
-                txt = tag.get_text().strip()
-                return json.loads(txt)
+            return page_state.deferred_state
         except Exception as e:
             self.logger.info(str(e))
         return {}
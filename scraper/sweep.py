@@ -0,0 +1,171 @@
+import argparse
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from urllib.parse import urlparse
+
+from scraper import main
+from scraper.factory import StrategyFactory
+from scraper.utils.http_curl import connection_stats
+from scraper.utils.sinks import CSVSink
+from scraper.utils.static_listings import StaticListings
+from scraper.utils.url_generator import generate_query_url
+
+logger = logging.getLogger()
+
+# the fields that change from one stay window to the next, everything else is fetched once
+WINDOW_FIELDS = ["check_in_date", "check_out_date", "rank", "price_per_night", "orig_price_per_night", "total_price"]
+
+
+def stay_windows(start_date, end_date, stay_lengths, step_days=1):
+    ''' (checkin, checkout) of every stay of the given lengths checking in from start_date up to
+    end_date, one check in every step_days
+    '''
+    if step_days < 1:
+        raise ValueError(f'step_days must be at least 1, got {step_days}')
+    if not stay_lengths or any(nights < 1 for nights in stay_lengths):
+        raise ValueError(f'stay_lengths must be one or more positive night counts, got {stay_lengths}')
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    windows = []
+    checkin = start
+    while checkin <= end:
+        for nights in stay_lengths:
+            windows.append((checkin.isoformat(), (checkin + timedelta(days=nights)).isoformat()))
+        checkin += timedelta(days=step_days)
+    return windows
+
+
+def execute(config):
+    ''' Prices one profile over many stay windows.
+
+    The search of every window runs on a pool of config['window_concurrency'] workers. The
+    detail data that does not depend on the dates (host, amenities, location, rooms) is fetched
+    once per listing and shared by all the windows, a window only adds its own prices. The
+    result is a listing by window price matrix written as price_matrix.json and .csv.
+    '''
+    main.configure_runtime(config)
+
+    profile = config.get('property_preset')
+    url = profile.get('url')
+    query = profile.get('query')
+    if query:
+        url = generate_query_url(url, **query)
+    windows = stay_windows(config.get('start_date'), config.get('end_date'), config.get('stay_lengths') or [7],
+                           config.get('step_days', 1))
+
+    timestamp = int(datetime.timestamp(datetime.now()))
+    folder = re.sub(r'[^a-z0-9_]', '', '_'.join(profile.get('label', '').lower().split()))
+    output_dir = config.get('output_dir') or os.path.join(os.path.dirname(main.__file__), main.output_path, f'sweep_{timestamp}_{folder}')
+    os.makedirs(output_dir, exist_ok=True)
+
+    static_listings = StaticListings()
+    sweep_started = str(datetime.now())
+    workers = max(1, min(config.get('window_concurrency', 4), len(windows) or 1))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda window: _crawl_window(url, window, config, static_listings), windows))
+    sweep_finished = str(datetime.now())
+
+    matrix = price_matrix(results)
+    summary = {
+        "url": url,
+        "sweep_start": sweep_started,
+        "sweep_finish": sweep_finished,
+        "windows": [{"checkin": checkin, "checkout": checkout, "count": len(rows)} for (checkin, checkout), rows in results],
+        "listings": len(matrix),
+        "static_fetches": static_listings.misses,
+        "static_reused": static_listings.hits,
+        "connection_stats": connection_stats(),
+    }
+    write_matrix(output_dir, summary, matrix, windows)
+    return summary
+
+
+def _crawl_window(url, window, config, static_listings):
+    checkin, checkout = window
+    window_url = generate_query_url(url, checkin=checkin, checkout=checkout)
+    rows = []
+    try:
+        logger.info(f'[*] Crawling window {checkin} to {checkout}')
+        strategy = StrategyFactory().get_strategy(urlparse(url).netloc, 'Search')(logger=logger)
+        rows = list(strategy.iter_execute(config={
+            "url": window_url,
+            "detail_concurrency": config.get('detail_concurrency', 1),
+            "fields": config.get('fields'),
+            "page_concurrency": config.get('page_concurrency', 1),
+            "static_listings": static_listings,
+        }))
+    except Exception as e:
+        logger.info(f'[*] Window {checkin} to {checkout} failed {str(e)}')
+    return window, rows
+
+
+def price_matrix(results):
+    ''' {listing id: {"listing": static fields, "prices": {window: window fields}}}
+    '''
+    matrix = {}
+    for (checkin, checkout), rows in results:
+        for row in rows:
+            listing_url = row.get('url') or ''
+            listing_id = urlparse(listing_url).path.rstrip('/').split('/')[-1]
+            if not listing_id:
+                continue
+            entry = matrix.get(listing_id)
+            if entry is None:
+                listing = {key: value for key, value in row.items() if key not in WINDOW_FIELDS}
+                listing.update({"url": listing_url.split('?')[0]})
+                entry = matrix[listing_id] = {"listing": listing, "prices": {}}
+            entry["prices"][window_key(checkin, checkout)] = {key: row.get(key) for key in WINDOW_FIELDS if key in row}
+    return matrix
+
+
+def window_key(checkin, checkout):
+    return f'{checkin}/{checkout}'
+
+
+def write_matrix(output_dir, summary, matrix, windows):
+    keys = [window_key(checkin, checkout) for checkin, checkout in windows]
+    json_path = os.path.join(output_dir, 'price_matrix.json')
+    with open(json_path, 'w', encoding='UTF-8') as file:
+        logger.info(f'[*] Writing to file: {json_path}')
+        file.write(json.dumps(dict(summary, matrix=matrix), separators=(',',':')))
+
+    # one row per listing, the nightly price of every window in its own column
+    csv_path = os.path.join(output_dir, 'price_matrix.csv')
+    logger.info(f'[*] Writing to file: {csv_path}')
+    with CSVSink(csv_path, ['listing_id', 'url', 'label'] + keys) as sink:
+        sink.open({})
+        for listing_id, entry in matrix.items():
+            row = {"listing_id": listing_id, "url": entry["listing"].get('url'), "label": entry["listing"].get('label')}
+            row.update({key: prices.get('price_per_night') for key, prices in entry["prices"].items()})
+            sink.write_items([row])
+        sink.close({})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Price the profiles of the target profiles file over many stay windows')
+    parser.add_argument('--profiles-file', default=None)
+    parser.add_argument('--label', action='append', dest='labels')
+    parser.add_argument('--start-date', required=True, help='first check in date, YYYY-MM-DD')
+    parser.add_argument('--end-date', required=True, help='last check in date, YYYY-MM-DD')
+    parser.add_argument('--stay-length', type=int, action='append', dest='stay_lengths', help='nights, can be repeated')
+    parser.add_argument('--step-days', type=int, default=1, help='days between two check ins')
+    parser.add_argument('--window-concurrency', type=int, default=4)
+    parser.add_argument('--detail-concurrency', type=int, default=4)
+    parser.add_argument('--page-concurrency', type=int, default=1)
+    parser.add_argument('--max-in-flight', type=int, default=16)
+    parser.add_argument('--http-cache', choices=['off', 'record', 'replay'], default=None)
+    parser.add_argument('--detail-cache', choices=['off', 'on'], default=None, help='reuse the listing details of earlier runs')
+    parser.add_argument('--field', action='append', dest='fields', help='only crawl these output fields')
+    parser.add_argument('--log-level', default='INFO')
+    args = parser.parse_args()
+
+    profiles = main.load_profiles(args.profiles_file)
+    if args.labels:
+        profiles = [profile for profile in profiles if profile.get('label') in args.labels]
+    for profile in profiles:
+        summary = execute(dict(vars(args), property_preset=profile))
+        print(json.dumps({key: value for key, value in summary.items() if key != 'connection_stats'}, indent=4))
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+import time
+
+from scraper.utils.operation_cache import CACHE_DIR
+
+# the page cursors of a search go stale, an older checkpoint is not worth carrying on from
+CHECKPOINT_TTL = int(os.getenv('CHECKPOINT_TTL', 6 * 60 * 60))
+
+
+class CrawlCheckpoint:
+    ''' Pagination state of one search, written after every finished page so a crawl that
+    dies half way can carry on from the last good page.
+
+    The search is the url plus whatever else changes the output, e.g. the fields, so a crawl
+    only resumes a checkpoint written by the same search. The file is replaced atomically and
+    removed once the crawl reaches the last page. Checkpoints older than max_age are ignored
+    and pruned.
+    '''
+
+    def __init__(self, url, directory=None, max_age=CHECKPOINT_TTL, **search):
+        self.url = url
+        self.search = json.loads(json.dumps(dict(search, url=url), sort_keys=True, default=str))
+        self.directory = directory or os.path.join(CACHE_DIR, 'checkpoints')
+        self.max_age = max_age
+        key = hashlib.sha1(json.dumps(self.search, sort_keys=True).encode('UTF-8')).hexdigest()[:16]
+        self.path = os.path.join(self.directory, f'{key}.json')
+
+    def load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='UTF-8') as file:
+                    state = json.load(file)
+                if time.time() - state.get('saved_at', 0) > self.max_age:
+                    self.clear()
+                elif state.get('search') == self.search:
+                    return state
+        except Exception:
+            pass
+        return None
+
+    def save(self, **state):
+        state.update({'url': self.url, 'search': self.search, 'saved_at': time.time()})
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='UTF-8') as file:
+            json.dump(state, file)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def prune(self):
+        ''' Removes the checkpoints of every search that was left longer than max_age ago
+        '''
+        if not os.path.isdir(self.directory):
+            return
+        expired = time.time() - self.max_age
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < expired:
+                    os.remove(path)
+            except OSError:
+                pass
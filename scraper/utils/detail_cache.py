@@ -0,0 +1,207 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from scraper.utils.operation_cache import CACHE_DIR
+
+DAY = 24 * 60 * 60
+
+DETAIL_CACHE_MODE = os.getenv('DETAIL_CACHE_MODE', 'off')
+DETAIL_CACHE_PATH = os.getenv('DETAIL_CACHE_PATH', os.path.join(CACHE_DIR, 'details.sqlite3'))
+DETAIL_CACHE_TTL = int(os.getenv('DETAIL_CACHE_TTL', 7 * DAY))
+DETAIL_CACHE_MAX_LISTINGS = int(os.getenv('DETAIL_CACHE_MAX_LISTINGS', 200000))
+BOOTSTRAP_TTL = int(os.getenv('BOOTSTRAP_TTL', DAY))
+
+MODES = ('off', 'on')
+
+# how long a field is trusted, the ones left out get the default ttl
+FIELD_TTLS = {
+    # reviews come in after every stay
+    "rating_score": DAY,
+    "rating_count": DAY,
+    "cleanliness": DAY,
+    "accuracy": DAY,
+    "location_rate": DAY,
+    "communication": DAY,
+    "check_in_rating": DAY,
+    # fees follow the pricing of the host
+    "cleaning_fee": DAY,
+    "service_fee": DAY,
+    # the place itself hardly ever moves
+    "lattitude": 30 * DAY,
+    "longtitude": 30 * DAY,
+    "property_type": 30 * DAY,
+}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS listings (
+    listing_id TEXT PRIMARY KEY,
+    product_id TEXT,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS listings_used_at ON listings (used_at);
+CREATE TABLE IF NOT EXISTS listing_fields (
+    listing_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (listing_id, field)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS bootstrap (
+    name TEXT PRIMARY KEY,
+    value TEXT,
+    fetched_at REAL NOT NULL
+);
+'''
+
+
+class DetailCache:
+    ''' PDP details of the listings kept across runs in a sqlite file, keyed by listing id.
+
+    Every field is stored with the time it was fetched and trusted for its own ttl, so a
+    crawl only asks the api for the fields that went stale. Listings are evicted least
+    recently used first once there are more than max_listings of them. The values every
+    listing shares, like the api key taken from a PDP page, are kept next to them.
+
+    off  the details are always fetched
+    on   fresh fields are read from the file, stale ones fetched and written back
+    '''
+
+    def __init__(self, mode=DETAIL_CACHE_MODE, path=DETAIL_CACHE_PATH, ttl=DETAIL_CACHE_TTL, field_ttls=None,
+                 max_listings=DETAIL_CACHE_MAX_LISTINGS):
+        if mode not in MODES:
+            raise ValueError(f'Unknown cache mode {mode}')
+        self.mode = mode
+        self.path = path
+        self.ttl = ttl
+        self.field_ttls = dict(FIELD_TTLS, **(field_ttls or {}))
+        self.max_listings = max_listings
+        self._connection = None
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {'hits': 0, 'refreshes': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+
+    @property
+    def enabled(self):
+        return self.mode != 'off'
+
+    def ttl_for(self, field):
+        return self.field_ttls.get(field, self.ttl)
+
+    def _db(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # one connection shared by the detail workers, every use holds the lock
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def get(self, listing_id, fields):
+        ''' Returns (values, product_id), values only holds the fields still within their ttl
+        '''
+        if not self.enabled:
+            return {}, None
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            listing = db.execute('SELECT product_id FROM listings WHERE listing_id = ?', (listing_id,)).fetchone()
+            if listing is None:
+                self.stats['misses'] += 1
+                return {}, None
+            rows = db.execute('SELECT field, value, fetched_at FROM listing_fields WHERE listing_id = ?', (listing_id,)).fetchall()
+            db.execute('UPDATE listings SET used_at = ? WHERE listing_id = ?', (now, listing_id))
+            db.commit()
+
+        values = {}
+        for field, value, fetched_at in rows:
+            if field in fields and now - fetched_at < self.ttl_for(field):
+                values[field] = json.loads(value)
+        self.stats['hits' if len(values) == len(fields) else 'refreshes'] += 1
+        return values, listing[0]
+
+    def put(self, listing_id, values, product_id=None):
+        if not self.enabled or not (values or product_id):
+            return
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                'INSERT INTO listings (listing_id, product_id, used_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (listing_id) DO UPDATE SET product_id = COALESCE(excluded.product_id, product_id), used_at = excluded.used_at',
+                (listing_id, product_id, now))
+            db.executemany(
+                'INSERT OR REPLACE INTO listing_fields (listing_id, field, value, fetched_at) VALUES (?, ?, ?, ?)',
+                [(listing_id, field, json.dumps(value), now) for field, value in values.items()])
+            db.commit()
+            self.stats['writes'] += 1
+            self._writes += 1
+            should_evict = self._writes % 500 == 0
+        if should_evict:
+            self.evict()
+
+    def get_bootstrap(self, name, ttl=BOOTSTRAP_TTL):
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._db().execute('SELECT value, fetched_at FROM bootstrap WHERE name = ?', (name,)).fetchone()
+        if row and time.time() - row[1] < ttl:
+            return json.loads(row[0])
+        return None
+
+    def put_bootstrap(self, name, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            db = self._db()
+            db.execute('INSERT OR REPLACE INTO bootstrap (name, value, fetched_at) VALUES (?, ?, ?)',
+                       (name, json.dumps(value), time.time()))
+            db.commit()
+
+    def evict(self):
+        ''' Drops the least recently used listings past max_listings and every field older than
+        the longest ttl
+        '''
+        oldest = time.time() - max([self.ttl] + list(self.field_ttls.values()))
+        with self._lock:
+            db = self._db()
+            evicted = db.execute(
+                'DELETE FROM listings WHERE listing_id IN '
+                '(SELECT listing_id FROM listings ORDER BY used_at DESC LIMIT -1 OFFSET ?)', (self.max_listings,)).rowcount
+            db.execute('DELETE FROM listing_fields WHERE fetched_at < ? '
+                       'OR listing_id NOT IN (SELECT listing_id FROM listings)', (oldest,))
+            db.commit()
+            self.stats['evictions'] += evicted
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_detail_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DetailCache()
+    return _cache
+
+
+def configure_detail_cache(**kwargs):
+    ''' Replaces the process wide detail cache, takes the DetailCache arguments
+    '''
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+        _cache = DetailCache(**kwargs)
+    return _cache
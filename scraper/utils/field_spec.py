@@ -0,0 +1,179 @@
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+NUMBER_RE = re.compile(r'[^0-9.]')
+
+
+class Field:
+    ''' One output field: where it lives in the json, how it is cleaned and what to give
+    when it is missing.
+
+    path is a dotted path ('listing.contextualPictures.0.picture') or a list of paths tried in
+    order. transform gets the raw value and default is used when the value is missing or None
+    or the transform fails, falsy values like 0 or '' are kept. With skip_empty an empty
+    string counts as missing too and the next path is tried. A callable default is called
+    so lists are never shared.
+    '''
+
+    def __init__(self, name, path, transform=None, default=None, skip_empty=False):
+        self.name = name
+        self.paths = [path] if isinstance(path, str) else list(path)
+        self.transform = transform
+        self.default = default
+        self.skip_empty = skip_empty
+        self.extract = compile_field(self)
+        # the same lookup giving None for a missing value, to tell it from the default
+        self.find = compile_field(self, missing=_none)
+
+    def missing(self):
+        return self.default() if callable(self.default) else self.default
+
+    def __call__(self, data):
+        return self.extract(data)
+
+
+class FieldSpec:
+    ''' A set of fields compiled once into a single function, applied to one item or a whole
+    page of items. spec[name] gives the compiled function of one field.
+    '''
+
+    def __init__(self, fields):
+        self.fields = list(fields)
+        self._by_name = {field.name: field.extract for field in self.fields}
+        self._find = {field.name: field.find for field in self.fields}
+        self.extract = compile_fields(self.fields)
+
+    def __getitem__(self, name):
+        return self._by_name[name]
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    @property
+    def names(self):
+        return [field.name for field in self.fields]
+
+    def extract_many(self, items):
+        extract = self.extract
+        return [extract(item) for item in items]
+
+    def missing(self, item, names=None):
+        ''' The names of the fields, all of them when none are given, the item has no value for
+        '''
+        names = self.names if names is None else names
+        return [name for name in names if self._find[name](item) is None]
+
+
+def _none():
+    return None
+
+
+def _keys(path):
+    return tuple(int(key) if key.isdigit() else key for key in path.split('.'))
+
+
+def compile_field(field, missing=None):
+    ''' Builds the function of one field. The paths are split once here, a lookup is then a
+    plain walk over the keys, what the hand written getters did with .get chains and a
+    try/except each. Most fields have a single path and get a function without the loop over
+    the paths. missing replaces what the field gives when there is no value.
+    '''
+    paths = [_keys(path) for path in field.paths]
+    transform = field.transform
+    missing = missing or field.missing
+    name = field.name
+    skip_empty = field.skip_empty
+
+    if len(paths) == 1 and not skip_empty:
+        keys = paths[0]
+        if transform is None:
+            def extract(data):
+                try:
+                    for key in keys:
+                        data = data[key]
+                except (KeyError, IndexError, TypeError):
+                    return missing()
+                return missing() if data is None else data
+            return extract
+
+        def extract(data):
+            try:
+                for key in keys:
+                    data = data[key]
+            except (KeyError, IndexError, TypeError):
+                return missing()
+            if data is None:
+                return missing()
+            try:
+                return transform(data)
+            except Exception as e:
+                logger.debug(f'{name}: {str(e)}')
+                return missing()
+        return extract
+
+    def extract(data):
+        for keys in paths:
+            value = data
+            try:
+                for key in keys:
+                    value = value[key]
+            except (KeyError, IndexError, TypeError):
+                continue
+            if value is not None and not (skip_empty and value == ''):
+                break
+        else:
+            return missing()
+        if transform is None:
+            return value
+        try:
+            return transform(value)
+        except Exception as e:
+            logger.debug(f'{name}: {str(e)}')
+            return missing()
+    return extract
+
+
+def compile_fields(fields):
+    ''' One function giving the dict of the values of all the fields
+    '''
+    extractors = [(field.name, field.extract) for field in fields]
+
+    def extract(data):
+        return {name: extract_field(data) for name, extract_field in extractors}
+    return extract
+
+
+def number(value):
+    ''' '$1,234.50' -> 1234.5
+    '''
+    return float(NUMBER_RE.sub('', str(value)))
+
+
+def strip(value):
+    return value.strip()
+
+
+def regex(pattern, cast=str, group=1):
+    compiled = re.compile(pattern)
+
+    def transform(value):
+        matches = compiled.search(value)
+        if matches:
+            return cast(matches.group(group))
+        raise ValueError(f'{pattern} not found')
+    return transform
+
+
+def pluck(key, transform=strip):
+    ''' The key of every item of a list, empty values left out
+    '''
+    def pluck_values(items):
+        values = []
+        for item in items:
+            value = item.get(key)
+            if value:
+                values.append(transform(value) if transform else value)
+        return values
+    return pluck_values
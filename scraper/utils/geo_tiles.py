@@ -0,0 +1,73 @@
+import threading
+from urllib.parse import urlparse, parse_qs
+
+BBOX_KEYS = ('ne_lat', 'ne_lng', 'sw_lat', 'sw_lng')
+
+
+class Tile:
+    ''' One box of a map search. split() cuts it into its four quadrants, one zoom level in,
+    and query() gives the url parameters generate_query_url puts on the search url.
+    '''
+
+    def __init__(self, ne_lat, ne_lng, sw_lat, sw_lng, zoom=None, depth=0):
+        self.ne_lat = ne_lat
+        self.ne_lng = ne_lng
+        self.sw_lat = sw_lat
+        self.sw_lng = sw_lng
+        self.zoom = zoom
+        self.depth = depth
+
+    @classmethod
+    def from_url(cls, url):
+        ''' The box of a search url, None when the url is not a map search
+        '''
+        try:
+            query = parse_qs(urlparse(url).query)
+            ne_lat, ne_lng, sw_lat, sw_lng = [float(query[key][0]) for key in BBOX_KEYS]
+            zoom = float(query['zoom'][0]) if query.get('zoom') else None
+        except (KeyError, ValueError):
+            return None
+        return cls(ne_lat, ne_lng, sw_lat, sw_lng, zoom)
+
+    def split(self):
+        mid_lat = (self.ne_lat + self.sw_lat) / 2
+        mid_lng = (self.ne_lng + self.sw_lng) / 2
+        zoom = self.zoom + 1 if self.zoom is not None else None
+        depth = self.depth + 1
+        return [
+            Tile(self.ne_lat, mid_lng, mid_lat, self.sw_lng, zoom, depth),
+            Tile(self.ne_lat, self.ne_lng, mid_lat, mid_lng, zoom, depth),
+            Tile(mid_lat, mid_lng, self.sw_lat, self.sw_lng, zoom, depth),
+            Tile(mid_lat, self.ne_lng, self.sw_lat, mid_lng, zoom, depth),
+        ]
+
+    def query(self):
+        query = {key: f'{getattr(self, key):.8f}' for key in BBOX_KEYS}
+        query.update({"search_by_map": "true", "search_type": "user_map_move"})
+        if self.zoom is not None:
+            query.update({"zoom": f'{self.zoom:.6f}', "zoom_level": f'{self.zoom:.6f}'})
+        return query
+
+    def __repr__(self):
+        return f'Tile({self.ne_lat}, {self.ne_lng}, {self.sw_lat}, {self.sw_lng}, depth={self.depth})'
+
+
+class ListingClaims:
+    ''' The listing ids already taken by a tile, a listing on the edge of two tiles is only
+    kept by the first one to claim it
+    '''
+
+    def __init__(self):
+        self.ids = set()
+        self._lock = threading.Lock()
+
+    def claim(self, listing_ids):
+        ''' Returns the ids nobody claimed before, they are claimed in the same step
+        '''
+        with self._lock:
+            fresh = set(listing_ids) - self.ids
+            self.ids.update(fresh)
+        return fresh
+
+    def __len__(self):
+        return len(self.ids)
@@ -0,0 +1,203 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+from scraper.utils.operation_cache import CACHE_DIR
+
+HTTP_CACHE_MODE = os.getenv('HTTP_CACHE_MODE', 'off')
+HTTP_CACHE_DIR = os.getenv('HTTP_CACHE_DIR', os.path.join(CACHE_DIR, 'http'))
+HTTP_CACHE_TTL = int(os.getenv('HTTP_CACHE_TTL', 60 * 60))
+HTTP_CACHE_STATIC_TTL = int(os.getenv('HTTP_CACHE_STATIC_TTL', 7 * 24 * 60 * 60))
+HTTP_CACHE_MAX_SIZE = int(os.getenv('HTTP_CACHE_MAX_SIZE', 2 * 1024 * 1024 * 1024))
+
+MODES = ('off', 'record', 'replay')
+
+# js bundles and images are content hashed by airbnb, they never change under the same url
+STATIC_ASSET_RE = re.compile(r'\.(js|css|png|jpe?g|webp|svg|woff2?)$', re.IGNORECASE)
+CHARSET_RE = re.compile(r'charset=([\w-]+)', re.IGNORECASE)
+
+
+class CacheMissError(Exception):
+    pass
+
+
+class CachedResponse:
+    ''' The parts of a curl response the crawler reads, rebuilt from the disk cache
+    '''
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.infos = {}
+        self.from_cache = True
+
+    @property
+    def text(self):
+        matches = CHARSET_RE.search(self.headers.get('content-type', ''))
+        encoding = matches.group(1) if matches else 'utf-8'
+        return self.content.decode(encoding, errors='replace')
+
+
+class ResponseCache:
+    ''' Content addressed response cache keyed on method, url and body hash.
+
+    off     the network is used for everything
+    record  fresh entries are served from disk, everything else is fetched and written
+    replay  only the disk is used and a missing entry raises CacheMissError
+    '''
+
+    def __init__(self, mode=HTTP_CACHE_MODE, directory=HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL,
+                 static_ttl=HTTP_CACHE_STATIC_TTL, max_size=HTTP_CACHE_MAX_SIZE):
+        if mode not in MODES:
+            raise ValueError(f'Unknown cache mode {mode}')
+        self.mode = mode
+        self.directory = directory
+        self.ttl = ttl
+        self.static_ttl = static_ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+
+    @property
+    def enabled(self):
+        return self.mode != 'off'
+
+    def key(self, method, url, data=None):
+        if data is None:
+            body = b''
+        elif isinstance(data, bytes):
+            body = data
+        elif isinstance(data, str):
+            body = data.encode('UTF-8')
+        else:
+            body = json.dumps(data, sort_keys=True, separators=(',',':')).encode('UTF-8')
+        body_hash = hashlib.sha256(body).hexdigest()
+        return hashlib.sha256(f'{method.upper()} {url} {body_hash}'.encode('UTF-8')).hexdigest()
+
+    def ttl_for(self, url):
+        if STATIC_ASSET_RE.search(urlparse(url).path):
+            return self.static_ttl
+        return self.ttl
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.gz')
+
+    def get(self, method, url, data=None):
+        if not self.enabled:
+            return None
+        key = self.key(method, url, data)
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rb') as file:
+                meta = json.loads(file.readline())
+                content = file.read()
+        except (OSError, ValueError):
+            self.stats['misses'] += 1
+            if self.mode == 'replay':
+                raise CacheMissError(f'{method} {url} is not in the cache')
+            return None
+
+        # replay serves whatever was recorded, record only trusts entries younger than their ttl
+        if self.mode == 'record' and time.time() - meta.get('stored_at', 0) > meta.get('ttl', self.ttl):
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        return CachedResponse(meta.get('url', url), meta.get('status_code', 200), meta.get('headers', {}), content)
+
+    def put(self, method, url, data, response):
+        if self.mode != 'record':
+            return
+        key = self.key(method, url, data)
+        path = self._path(key)
+        meta = {
+            'method': method,
+            'url': url,
+            'status_code': response.status_code,
+            'headers': {'content-type': response.headers.get('content-type', '')},
+            'stored_at': time.time(),
+            'ttl': self.ttl_for(url),
+        }
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            with gzip.open(tmp_path, 'wb', compresslevel=6) as file:
+                file.write(json.dumps(meta).encode('UTF-8'))
+                file.write(b'\n')
+                file.write(response.content)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+
+        with self._lock:
+            self.stats['writes'] += 1
+            self._writes += 1
+            should_evict = self._writes % 200 == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        ''' Removes expired entries, then the oldest ones until the cache fits in max_size
+        '''
+        entries = []
+        now = time.time()
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = 0
+        kept = []
+        for mtime, size, path in entries:
+            # nothing is kept longer than the static ttl, the longest one handed out
+            if now - mtime > max(self.ttl, self.static_ttl):
+                self._remove(path)
+            else:
+                kept.append((mtime, size, path))
+                total_size += size
+
+        kept.sort()
+        while kept and total_size > self.max_size:
+            _, size, path = kept.pop(0)
+            self._remove(path)
+            total_size -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            self.stats['evictions'] += 1
+        except OSError:
+            pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def configure_cache(**kwargs):
+    ''' Replaces the process wide cache, takes the ResponseCache arguments
+    '''
+    global _cache
+    with _cache_lock:
+        _cache = ResponseCache(**kwargs)
+    return _cache
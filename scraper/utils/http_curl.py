@@ -1,65 +1,377 @@
-import requests
+import logging
 import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
 from dotenv import load_dotenv, find_dotenv
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 from curl_cffi import requests as c_requests
+from curl_cffi import CurlOpt, CurlInfo, CurlHttpVersion
+from scraper.utils.http_cache import get_cache
+from scraper.utils.rate_limit import get_rate_limiter, backoff_delay, parse_retry_after
+from scraper.utils.proxy_pool import ProxyPool, load_proxies
 load_dotenv(find_dotenv())
 
-class HTTP:
-	def __init__(self):
-		
-		self.session = c_requests.Session()
-		self.session.verify = False
-		self.session.trust_env = False
-		self.session.headers.update({
-			    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.0.0 Safari/537.36"
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.0.0 Safari/537.36"
+
+POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 8))
+DNS_CACHE_TIMEOUT = int(os.getenv('HTTP_DNS_CACHE_TIMEOUT', 600))
+KEEPALIVE_IDLE = int(os.getenv('HTTP_KEEPALIVE_IDLE', 60))
+PROXY_SESSIONS = int(os.getenv('HTTP_PROXY_SESSIONS', 4))
+
+# host=base_url pairs, lets a crawl run against a local stand in for the real site
+HOST_OVERRIDES = dict(item.strip().split('=', 1) for item in os.getenv('HTTP_HOST_OVERRIDES', '').split(',') if '=' in item)
+
+# callables run after every request with (method, url, outcome, elapsed seconds)
+request_hooks = []
+
+BLOCKED_STATUSES = [401, 403, 429]
+# worth another attempt, any other status means the request itself is wrong
+RETRY_STATUSES = BLOCKED_STATUSES + [408, 425, 500, 502, 503, 504]
+
+
+class SessionPool:
+	''' A fixed size pool of warm curl sessions shared by every HTTP instance.
+
+	Each session owns a single libcurl handle, so its connection cache (keep-alive and
+	HTTP/2 multiplexing), DNS cache and TLS session ids survive between requests. A
+	session is only ever used by one thread at a time, which also makes the pool size
+	the global cap on requests in flight. Given a proxy, every session egresses through it.
+	'''
+	def __init__(self, size=POOL_SIZE, proxy=None):
+		self.size = size
+		self.proxy = proxy
+		self._idle = []
+		self._opened = 0
+		self._cond = threading.Condition()
+		self._stats = {
+			'requests': 0,
+			'new_connections': 0,
+			'reused_connections': 0,
+			'sessions_opened': 0,
+			'sessions_closed': 0,
+		}
+
+	def _new_session(self):
+		session = c_requests.Session(
+			use_thread_local_curl=False,
+			http_version=CurlHttpVersion.V2TLS,
+			curl_options={
+				CurlOpt.DNS_CACHE_TIMEOUT: DNS_CACHE_TIMEOUT,
+				CurlOpt.TCP_KEEPALIVE: 1,
+				CurlOpt.TCP_KEEPIDLE: KEEPALIVE_IDLE,
+				CurlOpt.TCP_KEEPINTVL: KEEPALIVE_IDLE,
+				CurlOpt.SSL_SESSIONID_CACHE: 1,
+			},
+			curl_infos=[CurlInfo.NUM_CONNECTS],
+		)
+		session.verify = False
+		session.trust_env = False
+		if self.proxy:
+			session.proxies = {'http': self.proxy, 'https': self.proxy}
+		session.headers.update({
+			"User-Agent": USER_AGENT
 		})
-		# self.proxy = {
-		# 	'http': os.getenv('PROXY_HTTP'),
-		# 	'https': os.getenv('PROXY_HTTPS')
-		# }
+		return session
+
+	def acquire(self):
+		with self._cond:
+			while True:
+				if self._idle:
+					return self._idle.pop()
+				if self._opened < self.size:
+					self._opened += 1
+					self._stats['sessions_opened'] += 1
+					break
+				self._cond.wait()
+		try:
+			return self._new_session()
+		except Exception:
+			with self._cond:
+				self._opened -= 1
+				self._cond.notify()
+			raise
+
+	def release(self, session):
+		with self._cond:
+			if self._opened > self.size:
+				# the pool was shrunk while this session was checked out
+				self._opened -= 1
+				self._stats['sessions_closed'] += 1
+				session.close()
+			else:
+				self._idle.append(session)
+			self._cond.notify()
+
+	def discard(self, session):
+		session.close()
+		with self._cond:
+			self._opened -= 1
+			self._stats['sessions_closed'] += 1
+			self._cond.notify()
+
+	@contextmanager
+	def session(self):
+		session = self.acquire()
+		try:
+			yield session
+		finally:
+			self.release(session)
+
+	def resize(self, size):
+		with self._cond:
+			self.size = max(1, int(size))
+			while self._idle and self._opened > self.size:
+				self._idle.pop().close()
+				self._opened -= 1
+				self._stats['sessions_closed'] += 1
+			self._cond.notify_all()
+
+	def record(self, response):
+		num_connects = response.infos.get(CurlInfo.NUM_CONNECTS, 0)
+		with self._cond:
+			self._stats['requests'] += 1
+			if num_connects:
+				self._stats['new_connections'] += num_connects
+			else:
+				self._stats['reused_connections'] += 1
+
+	def stats(self):
+		with self._cond:
+			stats = dict(self._stats)
+			stats.update({
+				'pool_size': self.size,
+				'open_sessions': self._opened,
+				'idle_sessions': len(self._idle),
+			})
+		if stats['requests']:
+			stats['reuse_ratio'] = round(stats['reused_connections'] / stats['requests'], 3)
+		return stats
+
+	def close(self):
+		with self._cond:
+			while self._idle:
+				self._idle.pop().close()
+				self._opened -= 1
+				self._stats['sessions_closed'] += 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+	global _pool
+	if _pool is None:
+		with _pool_lock:
+			if _pool is None:
+				_pool = SessionPool()
+	return _pool
+
+
+_proxy_pool = None
+
+
+def get_proxy_pool():
+	global _proxy_pool
+	if _proxy_pool is None:
+		with _pool_lock:
+			if _proxy_pool is None:
+				_proxy_pool = ProxyPool(load_proxies(), lambda proxy: SessionPool(PROXY_SESSIONS, proxy=proxy))
+	return _proxy_pool
+
+
+def configure_proxies(proxies, sessions_per_proxy=PROXY_SESSIONS, **options):
+	''' Replaces the proxy pool, an empty list sends everything direct again.
+	Options are passed on to ProxyPool (cooldown, cooldown_cap)
+	'''
+	global _proxy_pool
+	with _pool_lock:
+		previous = _proxy_pool
+		_proxy_pool = ProxyPool(load_proxies(proxies), lambda proxy: SessionPool(sessions_per_proxy, proxy=proxy), **options)
+	if previous:
+		previous.close()
+	return _proxy_pool
+
+
+def configure_pool(size):
+	get_pool().resize(size)
+	proxy_pool = get_proxy_pool()
+	if proxy_pool:
+		proxy_pool.resize(size)
+
+
+def connection_stats():
+	stats = get_pool().stats()
+	proxy_pool = get_proxy_pool()
+	if proxy_pool:
+		stats['proxies'] = proxy_pool.stats()
+	return stats
+
+
+def configure_host_overrides(overrides):
+	HOST_OVERRIDES.clear()
+	HOST_OVERRIDES.update(overrides or {})
+
+
+def resolve_url(url):
+	if not HOST_OVERRIDES:
+		return url
+	parsed = urlparse(url)
+	base_url = HOST_OVERRIDES.get(parsed.netloc)
+	if not base_url:
+		return url
+	base = urlparse(base_url)
+	return parsed._replace(scheme=base.scheme, netloc=base.netloc).geturl()
+
+
+def add_request_hook(hook):
+	request_hooks.append(hook)
+
+
+def remove_request_hook(hook):
+	if hook in request_hooks:
+		request_hooks.remove(hook)
+
+
+class HTTP:
+	def __init__(self, pool=None, cache=None, rate_limiter=None, proxy_pool=None):
+		self.pool = pool or get_pool()
+		self._cache = cache
+		self._rate_limiter = rate_limiter
+		self._proxy_pool = proxy_pool
 		self.max_retries = 5
 
 
 	def _send_request(self, method, url, **kwargs):
-		# if 'proxies' not in kwargs:
-		# 	kwargs.update({
-		# 		'proxies': self.proxy
-		# 	})
+		started = time.perf_counter()
+		outcome = {'status_code': None, 'attempts': 0, 'cached': False}
+		try:
+			return self._send_with_retries(method, url, outcome, **kwargs)
+		finally:
+			if request_hooks:
+				elapsed = time.perf_counter() - started
+				for hook in list(request_hooks):
+					hook(method, url, outcome, elapsed)
+
+	def _send_with_retries(self, method, url, outcome, **kwargs):
+		cache = self.cache
+		if cache.enabled:
+			cached = cache.get(method, url, kwargs.get('data'))
+			if cached:
+				outcome.update({'status_code': cached.status_code, 'cached': True})
+				return cached
+
+		target_url = resolve_url(url)
+		limiter = self.rate_limiter.for_host(urlparse(url).netloc)
+		proxy_pool = self.proxy_pool
 		kwargs.update({'impersonate': "chrome110"})
 		error = None
-		for _ in range(self.max_retries):
-			try:
-				response = method(url, **kwargs)
-				if response.status_code in [403, 401]:
-					raise requests.exceptions.ReadTimeout
-				if response.status_code not in [200, 201]:
-					raise Exception(f'Status {response.status_code}')
-				return response
-			
-			except requests.exceptions.ReadTimeout:
-				self.rotate_proxy()
-		
-			except Exception as e:
-				error = str(e)
-				print(f'An error occurred: {error}')
-		# raise Exception(error)
+		delay = 0
+		last_response = None
+		for attempt in range(self.max_retries):
+			if delay:
+				time.sleep(delay)
+			outcome['attempts'] += 1
+			last_response = None
+			retry_after = None
+			status_code = None
+			# waiting out the cooldown of every proxy happens before taking a slot, so it does
+			# not hold back the other requests to the host
+			proxy = proxy_pool.choose() if proxy_pool else None
+			with limiter.slot():
+				sessions = proxy.sessions if proxy else self.pool
+				session = sessions.acquire()
+				try:
+					sent = time.perf_counter()
+					response = session.request(method, target_url, **kwargs)
+					last_response = response
+					sessions.record(response)
+					status_code = response.status_code
+					outcome['status_code'] = status_code
+					if status_code in [200, 201]:
+						limiter.on_success()
+						if proxy:
+							proxy_pool.on_success(proxy, time.perf_counter() - sent)
+						if cache.enabled:
+							cache.put(method, url, kwargs.get('data'), response)
+						return response
+
+					error = f'Status {status_code}'
+					if status_code in BLOCKED_STATUSES:
+						retry_after = parse_retry_after(response.headers.get('retry-after'))
+						self.rotate_proxy(session, proxy, retry_after)
+						session = None
+						# a block on one proxy only cools that proxy, the host slows down
+						# when there is no proxy or none is left to move to
+						if not proxy or proxy_pool.all_cooling():
+							limiter.on_block(retry_after)
+						else:
+							# the next attempt goes to a healthy proxy, it need not sit out the pause
+							retry_after = None
+					elif status_code in RETRY_STATUSES:
+						limiter.on_error()
+						if proxy:
+							proxy_pool.on_error(proxy)
+
+				except Exception as e:
+					error = str(e)
+					limiter.on_error()
+					if proxy:
+						proxy_pool.on_error(proxy)
+
+				finally:
+					if session is not None:
+						sessions.release(session)
+					if proxy:
+						proxy_pool.done(proxy)
+
+			if status_code is not None and status_code not in RETRY_STATUSES:
+				break
+			delay = backoff_delay(attempt, retry_after)
+			logger.warning(f'{method} {url} failed: {error}, attempt {attempt + 1} of {self.max_retries}')
+
+		logger.error(f'{method} {url} gave up after {outcome["attempts"]} attempts: {error}')
+		# the last answer, if there was one, lets the caller tell a refused request from a lost one
+		return last_response
 	
+	@property
+	def cache(self):
+		# resolved per request so configure_cache also applies to clients created before it
+		return self._cache or get_cache()
+
+	@property
+	def rate_limiter(self):
+		return self._rate_limiter or get_rate_limiter()
+
+	@property
+	def proxy_pool(self):
+		return self._proxy_pool if self._proxy_pool is not None else get_proxy_pool()
+
 	def get(self, url, **kwargs):
-		return self._send_request(self.session.get, url, **kwargs)
+		return self._send_request('GET', url, **kwargs)
 	
 	def post(self, url, **kwargs):
-		return self._send_request(self.session.post, url, **kwargs)
+		return self._send_request('POST', url, **kwargs)
 	
 	def head(self, url, **kwargs):
-		return self._send_request(self.session.head, url, **kwargs)
+		return self._send_request('HEAD', url, **kwargs)
 	
-	def rotate_proxy(self):
-		print('Rotating proxy')
-		self.session.close()
-		# self.proxy = {
-		# 	'http': os.getenv('PROXY_HTTP2'),
-		# 	'https': os.getenv('PROXY_HTTPS2')
-		# }
-		self.session = c_requests.Session()
+	def rotate_proxy(self, session, proxy=None, retry_after=None):
+		''' Moves the next attempt to another egress.
+
+		With a proxy pool the blocked proxy cools down and its session goes back warm, the
+		next attempt picks a healthy proxy. Without one the session is dropped so the next
+		attempt at least starts on a fresh connection.
+		'''
+		if proxy:
+			logger.info(f'Rotating away from proxy {proxy.url}')
+			self.proxy_pool.on_block(proxy, retry_after)
+			proxy.sessions.release(session)
+		else:
+			logger.info('Rotating proxy')
+			self.pool.discard(session)
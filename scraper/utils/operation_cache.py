@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+import time
+
+CACHE_DIR = os.getenv('SCRAPER_CACHE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache'))
+OPERATION_ID_TTL = int(os.getenv('OPERATION_ID_TTL', 24 * 60 * 60))
+
+
+class OperationIdCache:
+    ''' Persisted query hashes keyed by the js bundle they were scraped from and the operation name.
+
+    Entries live in memory and are mirrored to a json file so a new process does not have to
+    download the bundles again until the ttl runs out.
+    '''
+
+    def __init__(self, path=None, ttl=OPERATION_ID_TTL):
+        self.path = path or os.path.join(CACHE_DIR, 'operation_ids.json')
+        self.ttl = ttl
+        self._entries = None
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, bundle_url, operation_name):
+        return f'{operation_name} {bundle_url}'
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            try:
+                if os.path.exists(self.path):
+                    with open(self.path, 'r', encoding='UTF-8') as file:
+                        self._entries = json.load(file)
+            except Exception:
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='UTF-8') as file:
+                json.dump(self._entries, file)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            pass
+
+    def get(self, bundle_url, operation_name):
+        with self._lock:
+            entry = self._load().get(self._key(bundle_url, operation_name))
+            if entry and time.time() - entry.get('fetched_at', 0) < self.ttl:
+                return entry.get('operation_id')
+        return None
+
+    def set(self, bundle_url, operation_name, operation_id):
+        with self._lock:
+            self._load()[self._key(bundle_url, operation_name)] = {
+                'operation_id': operation_id,
+                'fetched_at': time.time(),
+            }
+            self._save()
+
+    def invalidate(self, bundle_url, operation_name):
+        with self._lock:
+            if self._load().pop(self._key(bundle_url, operation_name), None):
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._save()
+
+    def get_or_fetch(self, bundle_url, operation_name, fetch):
+        ''' Returns the cached operation id, otherwise calls fetch() once even when several
+        threads ask for the same bundle at the same time
+        '''
+        if not bundle_url:
+            return None
+        operation_id = self.get(bundle_url, operation_name)
+        if operation_id:
+            self.hits += 1
+            return operation_id
+
+        key = self._key(bundle_url, operation_name)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            operation_id = self.get(bundle_url, operation_name)
+            if operation_id:
+                self.hits += 1
+                return operation_id
+            self.misses += 1
+            operation_id = fetch()
+            if operation_id:
+                self.set(bundle_url, operation_name, operation_id)
+        return operation_id
+
+
+operation_cache = OperationIdCache()
+
+
+def rejects_operation(raw):
+    ''' True when a graphql response came back with errors only, which is how the api answers
+    a persisted query hash it does not know anymore. A response that did not come back at all
+    is a failed request, the cached hash is still good
+    '''
+    if not raw:
+        return False
+    try:
+        response_json = json.loads(raw)
+    except ValueError:
+        return False
+    return bool(response_json.get('errors')) and not response_json.get('data')
@@ -0,0 +1,168 @@
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+HTTP_RATE = float(os.getenv('HTTP_RATE', 20))
+HTTP_BURST = int(os.getenv('HTTP_BURST', 20))
+HTTP_INITIAL_CONCURRENCY = int(os.getenv('HTTP_INITIAL_CONCURRENCY', 8))
+HTTP_MAX_CONCURRENCY = int(os.getenv('HTTP_MAX_CONCURRENCY', 32))
+BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', 0.5))
+BACKOFF_CAP = float(os.getenv('HTTP_BACKOFF_CAP', 30))
+MIN_RATE = 0.2
+
+
+class TokenBucket:
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostLimiter:
+    ''' Request rate and concurrency for one host, adapted with AIMD.
+
+    Every success adds a little to the concurrency limit and the rate until they are back at
+    their ceiling, a block (401/403/429) halves both and a Retry-After pauses the host.
+    '''
+
+    def __init__(self, rate=HTTP_RATE, burst=HTTP_BURST, initial_concurrency=HTTP_INITIAL_CONCURRENCY,
+                 max_concurrency=HTTP_MAX_CONCURRENCY):
+        self.max_rate = rate
+        self.bucket = TokenBucket(rate, burst)
+        self.limit = float(min(initial_concurrency, max_concurrency))
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.blocked_until = 0
+        self._cond = threading.Condition()
+        self.stats = {'requests': 0, 'successes': 0, 'blocks': 0, 'errors': 0}
+
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            while True:
+                wait = self.blocked_until - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                elif self.in_flight < max(1, int(self.limit)):
+                    break
+                else:
+                    self._cond.wait()
+            self.in_flight += 1
+            self.stats['requests'] += 1
+        try:
+            self.bucket.acquire()
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            self.stats['successes'] += 1
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self.bucket.rate = min(self.max_rate, self.bucket.rate + self.max_rate / 100)
+            self._cond.notify_all()
+
+    def on_block(self, retry_after=None):
+        with self._cond:
+            self.stats['blocks'] += 1
+            self.limit = max(1.0, self.limit / 2)
+            self.bucket.rate = max(MIN_RATE, self.bucket.rate / 2)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def on_error(self):
+        with self._cond:
+            self.stats['errors'] += 1
+            self.limit = max(1.0, self.limit * 0.75)
+
+    def snapshot(self):
+        with self._cond:
+            stats = dict(self.stats)
+            stats.update({
+                'concurrency_limit': round(self.limit, 2),
+                'rate': round(self.bucket.rate, 2),
+                'in_flight': self.in_flight,
+            })
+        return stats
+
+
+class RateLimiter:
+
+    def __init__(self, **limits):
+        self.limits = limits
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def for_host(self, host):
+        limiter = self._hosts.get(host)
+        if limiter is None:
+            with self._lock:
+                limiter = self._hosts.setdefault(host, HostLimiter(**self.limits))
+        return limiter
+
+    def stats(self):
+        return {host: limiter.snapshot() for host, limiter in list(self._hosts.items())}
+
+
+def backoff_delay(attempt, retry_after=None, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    ''' Exponential backoff with full jitter, never shorter than what the server asked for
+    '''
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after:
+        delay = max(delay, min(retry_after, cap))
+    return delay
+
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter()
+    return _rate_limiter
+
+
+def configure_rate_limiter(**limits):
+    ''' Replaces the process wide limiter, takes the HostLimiter arguments
+    '''
+    global _rate_limiter
+    with _rate_limiter_lock:
+        _rate_limiter = RateLimiter(**limits)
+    return _rate_limiter
@@ -0,0 +1,179 @@
+import csv
+import json
+import os
+
+from scraper.utils.store import get_store
+
+
+class Sink:
+    ''' Writes crawl results as they arrive. Every write is flushed so a crash only loses
+    the page in flight.
+    '''
+    extension = None
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.file = open(path, 'w', encoding='UTF-8', newline='')
+
+    def open(self, meta):
+        pass
+
+    def write_items(self, items):
+        for item in items:
+            self.write_item(item)
+            self.count += 1
+        self.file.flush()
+
+    def write_item(self, item):
+        raise NotImplementedError
+
+    def close(self, meta):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if not self.file.closed:
+            self.file.close()
+
+
+class JSONLinesSink(Sink):
+    extension = 'jsonl'
+
+    def write_item(self, item):
+        self.file.write(json.dumps(item, separators=(',',':')))
+        self.file.write('\n')
+
+
+class CSVSink(Sink):
+    ''' The columns are fixed up front so every row has the same layout no matter which
+    fields the first listing happened to have
+    '''
+    extension = 'csv'
+
+    def __init__(self, path, fieldnames):
+        super().__init__(path)
+        self.writer = csv.DictWriter(self.file, fieldnames=fieldnames, restval='', extrasaction='ignore')
+
+    def open(self, meta):
+        self.writer.writeheader()
+        self.file.flush()
+
+    def write_item(self, item):
+        self.writer.writerow(item)
+
+
+class JSONSink(Sink):
+    ''' Compact json document with the crawl metadata and a streamed result array
+    '''
+    extension = 'json'
+
+    def open(self, meta):
+        header = json.dumps(meta, separators=(',',':'))[:-1]
+        if meta:
+            header += ','
+        self.file.write(f'{header}"result":[')
+        self.file.flush()
+
+    def write_item(self, item):
+        if self.count:
+            self.file.write(',')
+        self.file.write(json.dumps(item, separators=(',',':')))
+
+    def close(self, meta):
+        self.file.write(']')
+        for key, value in meta.items():
+            self.file.write(f',{json.dumps(key)}:{json.dumps(value, separators=(",",":"))}')
+        self.file.write('}')
+        super().close(meta)
+
+
+class StoreSink:
+    ''' Records the crawl in the listing store. Rows are held back and written batch_size
+    at a time, every batch in one transaction
+    '''
+    extension = 'sqlite3'
+
+    def __init__(self, store, profile=None, batch_size=100):
+        self.store = store
+        self.path = store.path
+        self.profile = profile
+        self.batch_size = batch_size
+        self.count = 0
+        self.crawl_id = None
+        self.pending = []
+
+    def open(self, meta):
+        self.crawl_id = self.store.start_crawl(self.profile, meta.get('url'), meta.get('crawl_start'))
+
+    def write_items(self, items):
+        self.pending.extend(items)
+        self.count += len(items)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.store.record(self.crawl_id, self.pending, self.profile)
+            self.pending = []
+
+    def close(self, meta):
+        self.flush()
+        self.store.finish_crawl(self.crawl_id, meta.get('crawl_finish'), self.count)
+
+
+SINKS = {
+    'json': JSONSink,
+    'jsonl': JSONLinesSink,
+    'csv': CSVSink,
+    'sqlite': StoreSink,
+}
+
+
+class MultiSink:
+    ''' Fans every page out to one sink per requested output format
+    '''
+
+    def __init__(self, sinks):
+        self.sinks = sinks
+
+    @classmethod
+    def create(cls, formats, directory, basenames, fieldnames, profile=None):
+        os.makedirs(directory, exist_ok=True)
+        sinks = []
+        for output_format in formats:
+            sink_class = SINKS.get(output_format)
+            if sink_class is None:
+                raise ValueError(f'Unknown output format {output_format}')
+            if sink_class is StoreSink:
+                # every crawl goes to the same store, it is not a file of this run
+                sinks.append(sink_class(get_store(), profile))
+                continue
+            path = os.path.join(directory, f'{basenames[output_format]}.{sink_class.extension}')
+            if sink_class is CSVSink:
+                sinks.append(sink_class(path, fieldnames))
+            else:
+                sinks.append(sink_class(path))
+        return cls(sinks)
+
+    @property
+    def files(self):
+        return [os.path.basename(sink.path) for sink in self.sinks]
+
+    @property
+    def count(self):
+        return max([sink.count for sink in self.sinks], default=0)
+
+    def open(self, meta):
+        for sink in self.sinks:
+            sink.open(meta)
+
+    def write_items(self, items):
+        for sink in self.sinks:
+            sink.write_items(items)
+
+    def close(self, meta):
+        for sink in self.sinks:
+            sink.close(meta)
@@ -0,0 +1,50 @@
+import threading
+
+
+class StaticListings:
+    ''' The detail data of a listing that does not change with the dates, keyed by listing id.
+
+    A date sweep crawls the same listings once per window, the first window to reach a
+    listing fetches it and the others wait for that fetch instead of repeating it.
+    '''
+
+    def __init__(self):
+        self.listings = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, listing_id):
+        with self._lock:
+            return self.listings.get(listing_id)
+
+    def get_or_fetch(self, listing_id, fetch):
+        ''' Returns the kept data, otherwise calls fetch() once even when several windows ask
+        for the listing at the same time. An empty result is not kept so a later window retries
+        '''
+        data = self.get(listing_id)
+        if data is not None:
+            self.hits += 1
+            return data
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(listing_id, threading.Lock())
+        with key_lock:
+            data = self.get(listing_id)
+            if data is not None:
+                self.hits += 1
+                return data
+            self.misses += 1
+            data = fetch()
+            if data:
+                with self._lock:
+                    self.listings[listing_id] = data
+        return data or {}
+
+    def update(self, listing_id, data):
+        with self._lock:
+            self.listings[listing_id] = dict(self.listings.get(listing_id) or {}, **data)
+
+    def __len__(self):
+        return len(self.listings)
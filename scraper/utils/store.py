@@ -0,0 +1,209 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from urllib.parse import urlparse
+
+STORE_PATH = os.getenv('STORE_PATH', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'output', 'listings.sqlite3'))
+
+# the fields of a row that belong to one crawl of a listing, the rest describe the listing itself
+OBSERVATION_FIELDS = ["check_in_date", "check_out_date", "rank", "price_per_night", "orig_price_per_night",
+                      "total_price", "rating_score", "rating_count"]
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS crawls (
+    crawl_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    profile TEXT,
+    url TEXT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    item_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS crawls_profile ON crawls (profile, started_at);
+CREATE TABLE IF NOT EXISTS listings (
+    listing_id TEXT PRIMARY KEY,
+    url TEXT,
+    data TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS observations (
+    listing_id TEXT NOT NULL,
+    crawl_id INTEGER NOT NULL,
+    profile TEXT,
+    observed_at TEXT NOT NULL,
+    check_in_date TEXT,
+    check_out_date TEXT,
+    rank INTEGER,
+    price_per_night REAL,
+    orig_price_per_night REAL,
+    total_price REAL,
+    rating_score REAL,
+    rating_count INTEGER,
+    PRIMARY KEY (listing_id, crawl_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS observations_listing_date ON observations (listing_id, observed_at);
+CREATE INDEX IF NOT EXISTS observations_check_in ON observations (check_in_date);
+CREATE INDEX IF NOT EXISTS observations_profile ON observations (profile, observed_at);
+CREATE INDEX IF NOT EXISTS observations_crawl ON observations (crawl_id);
+'''
+
+
+def listing_id_of(url):
+    return urlparse(url or '').path.rstrip('/').split('/')[-1]
+
+
+class ListingStore:
+    ''' Every crawl kept in one sqlite file, so the history of a listing is an index lookup
+    instead of a scan over the output files.
+
+    crawls        one row per crawl of a profile
+    listings      the latest details of every listing, keyed by listing id
+    observations  the prices and rank of a listing in one crawl, keyed by listing id and crawl
+    '''
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # one connection shared by the profiles of a batch, every use holds the lock
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._connection.row_factory = sqlite3.Row
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def start_crawl(self, profile, url, started_at=None):
+        with self._lock:
+            db = self._db()
+            crawl_id = db.execute('INSERT INTO crawls (profile, url, started_at) VALUES (?, ?, ?)',
+                                  (profile, url, started_at or str(datetime.now()))).lastrowid
+            db.commit()
+        return crawl_id
+
+    def finish_crawl(self, crawl_id, finished_at=None, item_count=0):
+        with self._lock:
+            db = self._db()
+            db.execute('UPDATE crawls SET finished_at = ?, item_count = ? WHERE crawl_id = ?',
+                       (finished_at or str(datetime.now()), item_count, crawl_id))
+            db.commit()
+
+    def record(self, crawl_id, rows, profile=None):
+        ''' Upserts the listings of the rows and their observations in one transaction. The
+        details a row leaves out, like on a search only crawl, keep their stored value
+        '''
+        now = str(datetime.now())
+        listings = []
+        observations = []
+        for row in rows:
+            listing_id = listing_id_of(row.get('url'))
+            if not listing_id:
+                continue
+            # json_patch deletes the keys set to null, a detail the crawl missed keeps its stored value
+            details = {key: value for key, value in row.items() if key not in OBSERVATION_FIELDS and value is not None}
+            listings.append((listing_id, (row.get('url') or '').split('?')[0], json.dumps(details), now, now))
+            observations.append((listing_id, crawl_id, profile, now) + tuple(row.get(key) for key in OBSERVATION_FIELDS))
+        if not listings:
+            return
+
+        with self._lock:
+            db = self._db()
+            with db:
+                db.executemany(
+                    'INSERT INTO listings (listing_id, url, data, first_seen, last_seen) VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT (listing_id) DO UPDATE SET url = excluded.url, data = json_patch(data, excluded.data), '
+                    'last_seen = excluded.last_seen', listings)
+                db.executemany(
+                    f'INSERT OR REPLACE INTO observations (listing_id, crawl_id, profile, observed_at, {", ".join(OBSERVATION_FIELDS)}) '
+                    f'VALUES ({", ".join("?" * (len(OBSERVATION_FIELDS) + 4))})', observations)
+
+    def listing(self, listing_id):
+        with self._lock:
+            row = self._db().execute('SELECT * FROM listings WHERE listing_id = ?', (listing_id,)).fetchone()
+        if row is None:
+            return None
+        return dict(row, data=json.loads(row['data']))
+
+    def listing_history(self, listing_id, since=None, until=None):
+        ''' The observations of a listing oldest first, since and until are dates or datetimes
+        '''
+        query = 'SELECT * FROM observations WHERE listing_id = ?'
+        params = [listing_id]
+        query, params = self._date_range(query, params, since, until)
+        return self._fetch(query + ' ORDER BY observed_at', params)
+
+    def profile_observations(self, profile, since=None, until=None):
+        ''' The observations of every listing a profile crawled, oldest first
+        '''
+        query = 'SELECT * FROM observations WHERE profile = ?'
+        params = [profile]
+        query, params = self._date_range(query, params, since, until)
+        return self._fetch(query + ' ORDER BY observed_at', params)
+
+    def stay_prices(self, check_in_date, check_out_date=None):
+        ''' Every observation of a stay, all the stays checking in that day when there is no check out
+        '''
+        query = 'SELECT * FROM observations WHERE check_in_date = ?'
+        params = [check_in_date]
+        if check_out_date:
+            query += ' AND check_out_date = ?'
+            params.append(check_out_date)
+        return self._fetch(query + ' ORDER BY observed_at', params)
+
+    def crawls(self, profile=None):
+        if profile is None:
+            return self._fetch('SELECT * FROM crawls ORDER BY started_at', [])
+        return self._fetch('SELECT * FROM crawls WHERE profile = ? ORDER BY started_at', [profile])
+
+    def _date_range(self, query, params, since, until):
+        if since:
+            query += ' AND observed_at >= ?'
+            params.append(str(since))
+        if until:
+            until = str(until)
+            if len(until) == 10:
+                # a bare date includes the whole day
+                until = (date.fromisoformat(until) + timedelta(days=1)).isoformat()
+            query += ' AND observed_at < ?'
+            params.append(until)
+        return query, params
+
+    def _fetch(self, query, params):
+        with self._lock:
+            return [dict(row) for row in self._db().execute(query, params).fetchall()]
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ListingStore()
+    return _store
+
+
+def configure_store(**kwargs):
+    ''' Replaces the process wide listing store, takes the ListingStore arguments
+    '''
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+        _store = ListingStore(**kwargs)
+    return _store
@@ -14,7 +14,15 @@ def generate_query_url(url, **kwargs):
         "price_max": "price_max",
         "adults": "adults",
         "pool": "amenities[]",
-        "waterfront":"kg_and_tags[]"
+        "waterfront":"kg_and_tags[]",
+        "ne_lat": "ne_lat",
+        "ne_lng": "ne_lng",
+        "sw_lat": "sw_lat",
+        "sw_lng": "sw_lng",
+        "zoom": "zoom",
+        "zoom_level": "zoom_level",
+        "search_by_map": "search_by_map",
+        "search_type": "search_type",
     }
     queries = {}
     for key, query_key in params_keys.items():
@@ -16,6 +16,7 @@ from scraper import main
 config =     {
         "config_uuid": "82f38fae-dc10-4925-aefc-c1e9ecfe075b",
         "task_id": 7,
+        "collect": True,
         "property_preset": {
             "label": "Kissime_fl_420",
             "url": "https://www.airbnb.com/s/2570-Sunset-Dr--kissime-florida/homes?tab_id=home_tab&refinement_paths%5B%5D=%2Fhomes&flexible_trip_lengths%5B%5D=one_week&monthly_start_date=2024-04-01&monthly_length=3&monthly_end_date=2024-07-01&price_filter_input_type=0&channel=EXPLORE&date_picker_type=calendar&checkin=2024-05-19&checkout=2024-05-24&source=structured_search_input_header&search_type=user_map_move&query=2570%20Sunset%20Dr%2C%20Kissimmee%2C%20Florida%2C%20USA&place_id=ChIJ0yPb6GSB3YgRqLYEMZVKzrM&price_filter_num_nights=5&ne_lat=28.320246642286666&ne_lng=-81.45796468659444&sw_lat=28.318533819209225&sw_lng=-81.45965386143814&zoom=18.97511431334424&zoom_level=18.97511431334424&search_by_map=true&min_bedrooms=8&l2_property_type_ids%5B%5D=1",
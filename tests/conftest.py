@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+from benchmarks.mock_server import MockAirbnb
+from scraper.strategies.airbnb_com.calendar_page import AirbnbComCalendarStrategy
+from scraper.strategies.airbnb_com.detail_page import AirbnbComDetailStrategy
+from scraper.utils.detail_cache import configure_detail_cache
+from scraper.utils.http_cache import configure_cache
+from scraper.utils.http_curl import configure_host_overrides
+from scraper.utils.operation_cache import operation_cache
+
+
+@pytest.fixture
+def mock_airbnb(tmp_path, monkeypatch):
+    ''' A small mock airbnb every airbnb host is routed to, with empty caches kept under tmp_path
+    '''
+    monkeypatch.setattr(operation_cache, 'path', os.path.join(tmp_path, 'operation_ids.json'))
+    operation_cache.clear()
+    configure_cache(mode='off')
+    configure_detail_cache(mode='off', path=os.path.join(tmp_path, 'details.sqlite3'))
+    monkeypatch.setattr(AirbnbComDetailStrategy, 'price_context', None)
+    monkeypatch.setattr(AirbnbComDetailStrategy, 'combine_sections', True)
+    monkeypatch.setattr(AirbnbComCalendarStrategy, 'calendar_context', None)
+    with MockAirbnb(page_count=2, latency_scale=0.01) as mock:
+        configure_host_overrides({'www.airbnb.com': mock.base_url, 'a0.muscache.com': mock.base_url})
+        try:
+            yield mock
+        finally:
+            configure_host_overrides({})
+            operation_cache.clear()
@@ -0,0 +1,35 @@
+import json
+import logging
+from datetime import date
+
+from benchmarks import fixtures
+from scraper.strategies.airbnb_com.calendar_page import AirbnbComCalendarStrategy, calendar_price
+
+
+def test_calendar_price():
+    assert calendar_price({"price": {"localPriceFormatted": '$1,120'}}) == 1120.0
+    assert calendar_price({"price": {"localPriceFormatted": None}}) is None
+    assert calendar_price({"price": {"localPriceFormatted": '$'}}) is None
+    assert calendar_price({"price": None}) is None
+
+
+def test_calendar_days_start_at_the_start_date():
+    strategy = AirbnbComCalendarStrategy(logging.getLogger())
+    calendar_json = json.loads(fixtures.calendar_json(fixtures.listing_id(1, 0), 4, 2024, count=2))
+    days = strategy.get_calendar_days(calendar_json, date(2024, 4, 15))
+    assert days[0][0] == '2024-04-15' and days[-1][0] == '2024-05-31' and len(days) == 47
+    assert all(isinstance(available, bool) for _, available, _, _ in days)
+    assert all((price is None) != available for _, available, _, price in days)
+
+
+def test_a_calendar_costs_one_request_once_the_context_is_known(mock_airbnb):
+    listing_ids = [fixtures.listing_id(1, index) for index in range(3)]
+    for listing_id in listing_ids:
+        row = AirbnbComCalendarStrategy(logging.getLogger()).execute({
+            "url": f'https://www.airbnb.com/rooms/{listing_id}',
+            "start_date": '2024-04-01',
+            "months": 2,
+        })
+        assert row['listing_id'] == listing_id and len(row['calendar']) == 61
+    assert sum(mock_airbnb.stats['calendar'].values()) == 3
+    assert sum(mock_airbnb.stats['pdp_html'].values()) == 1
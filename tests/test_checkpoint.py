@@ -0,0 +1,50 @@
+import json
+import os
+import time
+
+from scraper.utils.checkpoint import CrawlCheckpoint
+
+URL = 'https://www.airbnb.com/s/Kissimmee--Florida--United-States/homes?adults=2'
+
+
+def test_save_load_and_clear(tmp_path):
+    checkpoint = CrawlCheckpoint(URL, directory=tmp_path, fields=['label'], search_only=False)
+    assert checkpoint.load() is None
+    checkpoint.save(page=3, start_rank=37, listing_ids=['1', '2'])
+    state = CrawlCheckpoint(URL, directory=tmp_path, fields=['label'], search_only=False).load()
+    assert state['page'] == 3 and state['start_rank'] == 37 and state['listing_ids'] == ['1', '2']
+    assert state['url'] == URL
+    checkpoint.clear()
+    assert checkpoint.load() is None and not os.listdir(tmp_path)
+
+
+def test_a_different_search_does_not_resume_it(tmp_path):
+    CrawlCheckpoint(URL, directory=tmp_path, fields=['label'], search_only=False).save(page=3)
+    assert CrawlCheckpoint(URL, directory=tmp_path, fields=['label'], search_only=True).load() is None
+    assert CrawlCheckpoint(URL, directory=tmp_path, fields=None, search_only=False).load() is None
+    assert CrawlCheckpoint(URL + '&children=1', directory=tmp_path, fields=['label'], search_only=False).load() is None
+    assert CrawlCheckpoint(URL, directory=tmp_path, fields=['label'], search_only=False).load()['page'] == 3
+
+
+def test_an_expired_checkpoint_is_dropped(tmp_path):
+    checkpoint = CrawlCheckpoint(URL, directory=tmp_path, max_age=60)
+    checkpoint.save(page=2)
+    assert checkpoint.load()['page'] == 2
+    # save stamps the current time, an old checkpoint is written by hand
+    with open(checkpoint.path, 'r', encoding='UTF-8') as file:
+        state = json.load(file)
+    state['saved_at'] = time.time() - 120
+    with open(checkpoint.path, 'w', encoding='UTF-8') as file:
+        json.dump(state, file)
+    assert checkpoint.load() is None
+    assert not os.path.exists(checkpoint.path)
+
+
+def test_prune_removes_the_checkpoints_of_old_crawls(tmp_path):
+    old = CrawlCheckpoint(URL, directory=tmp_path, max_age=60, fields=['label'])
+    old.save(page=2)
+    os.utime(old.path, (time.time() - 120, time.time() - 120))
+    fresh = CrawlCheckpoint(URL, directory=tmp_path, max_age=60)
+    fresh.save(page=4)
+    fresh.prune()
+    assert os.listdir(tmp_path) == [os.path.basename(fresh.path)]
@@ -0,0 +1,76 @@
+import os
+import time
+
+import pytest
+
+from scraper.utils import detail_cache as detail_cache_module
+from scraper.utils.detail_cache import DAY, DetailCache
+
+FIELDS = ["label", "rating_score", "lattitude"]
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(detail_cache_module.time, 'time', clock)
+    cache = DetailCache(mode='on', path=os.path.join(tmp_path, 'details.sqlite3'))
+    cache.clock = clock
+    yield cache
+    cache.close()
+
+
+def test_fields_expire_on_their_own_ttl(cache):
+    cache.put('1', {"label": 'Villa', "rating_score": 4.8, "lattitude": '28.3'}, 'product')
+    assert cache.get('1', FIELDS) == ({"label": 'Villa', "rating_score": 4.8, "lattitude": '28.3'}, 'product')
+    # reviews are trusted for a day, the label for a week and the location for a month
+    cache.clock.now += 2 * DAY
+    assert cache.get('1', FIELDS)[0] == {"label": 'Villa', "lattitude": '28.3'}
+    cache.clock.now += 7 * DAY
+    assert cache.get('1', FIELDS)[0] == {"lattitude": '28.3'}
+    assert cache.get('1', ["label"]) == ({}, 'product')
+    assert cache.get('2', FIELDS) == ({}, None)
+    assert cache.stats['hits'] == 1 and cache.stats['refreshes'] == 3 and cache.stats['misses'] == 1
+
+
+def test_a_refresh_keeps_the_product_id_and_the_other_fields(cache):
+    cache.put('1', {"label": 'Villa', "rating_score": 4.8}, 'product')
+    cache.clock.now += 2 * DAY
+    cache.put('1', {"rating_score": 4.9})
+    assert cache.get('1', FIELDS) == ({"label": 'Villa', "rating_score": 4.9}, 'product')
+
+
+def test_bootstrap_values_expire(cache):
+    cache.put_bootstrap('price_context', {"api_key": 'key'})
+    assert cache.get_bootstrap('price_context') == {"api_key": 'key'}
+    cache.clock.now += 2 * DAY
+    assert cache.get_bootstrap('price_context') is None
+
+
+def test_evict_drops_the_least_recently_used_listings(cache):
+    cache.max_listings = 2
+    for listing_id in ('1', '2', '3'):
+        cache.put(listing_id, {"label": listing_id})
+        cache.clock.now += 1
+    cache.get('1', ["label"])
+    cache.evict()
+    assert cache.get('2', ["label"]) == ({}, None)
+    assert cache.get('1', ["label"])[0] == {"label": '1'} and cache.get('3', ["label"])[0] == {"label": '3'}
+
+
+def test_off_keeps_nothing(tmp_path):
+    cache = DetailCache(mode='off', path=os.path.join(tmp_path, 'details.sqlite3'))
+    cache.put('1', {"label": 'Villa'})
+    cache.put_bootstrap('price_context', {})
+    assert cache.get('1', ["label"]) == ({}, None) and cache.get_bootstrap('price_context') is None
+    assert not os.path.exists(cache.path)
+    with pytest.raises(ValueError):
+        DetailCache(mode='replay')
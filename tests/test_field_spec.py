@@ -0,0 +1,61 @@
+from scraper.utils.field_spec import Field, FieldSpec, number, pluck, regex, strip
+
+ITEM = {
+    "listing": {
+        "title": " Villa ",
+        "rating": "4.8 out of 5, 12 reviews",
+        "count": 0,
+        "pictures": [{"url": "a.jpeg"}, {"url": "b.jpeg"}],
+        "badges": [{"text": " Guest favorite "}, {"text": ""}],
+    },
+    "price": {"primary": "", "discounted": "$1,180.50", "original": None},
+}
+
+
+def test_single_path_with_and_without_transform():
+    assert Field("label", "listing.title", strip, str)(ITEM) == 'Villa'
+    assert Field("image_url", "listing.pictures.1.url")(ITEM) == 'b.jpeg'
+    assert Field("score", "listing.rating", regex(r'([0-9.]+) out', float), float)(ITEM) == 4.8
+
+
+def test_missing_none_and_failed_transforms_give_the_default():
+    assert Field("missing", "listing.nothing.at.all", None, str)(ITEM) == ''
+    assert Field("index", "listing.pictures.5.url", None, str)(ITEM) == ''
+    assert Field("through_a_string", "listing.title.x", None, str)(ITEM) == ''
+    assert Field("none", "price.original", number, float)(ITEM) == 0.0
+    assert Field("no_match", "listing.title", regex(r'(\d+) reviews', int), int)(ITEM) == 0
+
+
+def test_falsy_values_are_kept():
+    assert Field("count", "listing.count", None, int)(ITEM) == 0
+    assert Field("primary", "price.primary", None, lambda: 'default')(ITEM) == ''
+
+
+def test_paths_are_tried_in_order():
+    assert Field("price", ["price.original", "price.discounted"], number, float)(ITEM) == 1180.5
+    # an empty string stops the lookup unless the field skips it
+    assert Field("price", ["price.primary", "price.discounted"], number, float)(ITEM) == 0.0
+    assert Field("price", ["price.primary", "price.discounted"], number, float, skip_empty=True)(ITEM) == 1180.5
+    assert Field("price", "price.primary", number, float, skip_empty=True)(ITEM) == 0.0
+
+
+def test_a_callable_default_is_not_shared():
+    field = Field("labels", "listing.nothing", pluck("text"), list)
+    first = field(ITEM)
+    first.append('x')
+    assert field(ITEM) == []
+
+
+def test_spec_extracts_every_field_and_tells_missing_ones():
+    spec = FieldSpec([
+        Field("label", "listing.title", strip, str),
+        Field("labels", "listing.badges", pluck("text"), list),
+        Field("count", "listing.count", None, int),
+        Field("rating_count", "listing.rating_count", None, int),
+    ])
+    assert spec.extract(ITEM) == {"label": "Villa", "labels": ["Guest favorite"], "count": 0, "rating_count": 0}
+    assert spec.extract_many([ITEM, {}])[1] == {"label": "", "labels": [], "count": 0, "rating_count": 0}
+    assert spec["label"](ITEM) == 'Villa'
+    assert "count" in spec and spec.names == ["label", "labels", "count", "rating_count"]
+    assert spec.missing(ITEM) == ["rating_count"]
+    assert spec.missing({}, ["count"]) == ["count"]
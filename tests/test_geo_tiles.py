@@ -0,0 +1,46 @@
+from benchmarks import fixtures
+from scraper.utils.geo_tiles import ListingClaims, Tile
+
+MAP_URL = ('https://www.airbnb.com/s/homes?ne_lat={}&ne_lng={}&sw_lat={}&sw_lng={}&zoom=11&search_by_map=true'
+           .format(*fixtures.MARKET_BBOX))
+
+
+def box(tile):
+    return (tile.ne_lat, tile.ne_lng, tile.sw_lat, tile.sw_lng)
+
+
+def test_from_url():
+    tile = Tile.from_url(MAP_URL)
+    assert box(tile) == fixtures.MARKET_BBOX and tile.zoom == 11 and tile.depth == 0
+    assert Tile.from_url('https://www.airbnb.com/s/homes?ne_lat=1') is None
+    assert Tile.from_url('https://www.airbnb.com/s/homes?ne_lat=x&ne_lng=1&sw_lat=1&sw_lng=1') is None
+
+
+def test_split_gives_the_four_quadrants():
+    tile = Tile(2.0, 4.0, 0.0, 0.0, zoom=11)
+    quadrants = tile.split()
+    assert [box(quadrant) for quadrant in quadrants] == [
+        (2.0, 2.0, 1.0, 0.0),
+        (2.0, 4.0, 1.0, 2.0),
+        (1.0, 2.0, 0.0, 0.0),
+        (1.0, 4.0, 0.0, 2.0),
+    ]
+    assert all(quadrant.zoom == 12 and quadrant.depth == 1 for quadrant in quadrants)
+    # the quadrants cover the tile exactly
+    area = sum((q.ne_lat - q.sw_lat) * (q.ne_lng - q.sw_lng) for q in quadrants)
+    assert area == (tile.ne_lat - tile.sw_lat) * (tile.ne_lng - tile.sw_lng)
+    assert Tile(2.0, 4.0, 0.0, 0.0).split()[0].zoom is None
+
+
+def test_query():
+    query = Tile(28.45, -81.35, 28.2, -81.7, zoom=12).query()
+    assert query['ne_lat'] == '28.45000000' and query['sw_lng'] == '-81.70000000'
+    assert query['zoom'] == query['zoom_level'] == '12.000000' and query['search_by_map'] == 'true'
+    assert 'zoom' not in Tile(1.0, 1.0, 0.0, 0.0).query()
+
+
+def test_a_listing_is_claimed_once():
+    claims = ListingClaims()
+    assert claims.claim(['1', '2']) == {'1', '2'}
+    assert claims.claim(['2', '3']) == {'3'}
+    assert len(claims) == 3
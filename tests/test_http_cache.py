@@ -0,0 +1,62 @@
+import os
+import time
+
+import pytest
+
+from scraper.utils.http_cache import CacheMissError, ResponseCache
+
+PAGE_URL = 'https://www.airbnb.com/rooms/50001000'
+JS_URL = 'https://a0.muscache.com/airbnb/static/packages/web/common/pdp.abc123.js'
+
+
+class Response:
+
+    def __init__(self, content, status_code=200, content_type='text/html; charset=utf-8'):
+        self.content = content
+        self.status_code = status_code
+        self.headers = {'content-type': content_type}
+
+
+def test_record_then_replay(tmp_path):
+    record = ResponseCache(mode='record', directory=tmp_path)
+    assert record.get('POST', PAGE_URL, '{"a":1}') is None
+    record.put('POST', PAGE_URL, '{"a":1}', Response('café'.encode('UTF-8'), 201))
+
+    replay = ResponseCache(mode='replay', directory=tmp_path)
+    response = replay.get('POST', PAGE_URL, '{"a":1}')
+    assert response.status_code == 201 and response.text == 'café' and response.from_cache
+    # the body is part of the key
+    with pytest.raises(CacheMissError):
+        replay.get('POST', PAGE_URL, '{"a":2}')
+    assert replay.stats['hits'] == 1 and replay.stats['misses'] == 1
+
+
+def test_only_record_writes_and_off_reads_nothing(tmp_path):
+    ResponseCache(mode='replay', directory=tmp_path).put('GET', PAGE_URL, None, Response(b'page'))
+    assert not os.listdir(tmp_path)
+    ResponseCache(mode='record', directory=tmp_path).put('GET', PAGE_URL, None, Response(b'page'))
+    assert ResponseCache(mode='off', directory=tmp_path).get('GET', PAGE_URL) is None
+    with pytest.raises(ValueError):
+        ResponseCache(mode='write', directory=tmp_path)
+
+
+def test_record_refetches_expired_entries_replay_serves_them(tmp_path, monkeypatch):
+    record = ResponseCache(mode='record', directory=tmp_path, ttl=60, static_ttl=3600)
+    record.put('GET', PAGE_URL, None, Response(b'page'))
+    record.put('GET', JS_URL, None, Response(b'bundle', content_type='application/javascript'))
+    later = time.time() + 120
+    monkeypatch.setattr('scraper.utils.http_cache.time.time', lambda: later)
+    assert record.get('GET', PAGE_URL) is None
+    # content hashed assets keep the long ttl
+    assert record.get('GET', JS_URL).content == b'bundle'
+    assert ResponseCache(mode='replay', directory=tmp_path).get('GET', PAGE_URL).content == b'page'
+
+
+def test_evict_shrinks_the_cache_to_max_size(tmp_path):
+    cache = ResponseCache(mode='record', directory=tmp_path, max_size=0)
+    for index in range(3):
+        cache.put('GET', f'{PAGE_URL}?page={index}', None, Response(os.urandom(2000)))
+    sizes = sorted(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(tmp_path) for name in files)
+    cache.max_size = sizes[-1] * 2
+    cache.evict()
+    assert sum(len(files) for _, _, files in os.walk(tmp_path)) == 2 and cache.stats['evictions'] == 1
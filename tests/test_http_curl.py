@@ -0,0 +1,130 @@
+from contextlib import contextmanager
+
+from scraper.utils.http_curl import HTTP
+
+
+class Response:
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+
+class Sessions:
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+
+    def acquire(self):
+        return self
+
+    def release(self, session):
+        pass
+
+    def discard(self, session):
+        pass
+
+    def record(self, response):
+        pass
+
+    def request(self, method, url, **kwargs):
+        return Response(self.statuses.pop(0))
+
+
+class Limiter:
+
+    def __init__(self):
+        self.in_slot = False
+        self.blocks = 0
+
+    @contextmanager
+    def slot(self):
+        self.in_slot = True
+        try:
+            yield
+        finally:
+            self.in_slot = False
+
+    def for_host(self, host):
+        return self
+
+    def on_success(self):
+        pass
+
+    def on_error(self):
+        pass
+
+    def on_block(self, retry_after=None):
+        self.blocks += 1
+
+
+class Proxy:
+
+    def __init__(self, url, sessions):
+        self.url = url
+        self.sessions = sessions
+
+
+class ProxyPool:
+
+    def __init__(self, limiter, proxies, cooling=False):
+        self.limiter = limiter
+        self.proxies = proxies
+        self.cooling = cooling
+        self.chosen_in_slot = []
+
+    def __bool__(self):
+        return True
+
+    def choose(self):
+        self.chosen_in_slot.append(self.limiter.in_slot)
+        return self.proxies.pop(0)
+
+    def done(self, proxy):
+        pass
+
+    def on_success(self, proxy, elapsed):
+        pass
+
+    def on_block(self, proxy, retry_after=None):
+        pass
+
+    def on_error(self, proxy):
+        pass
+
+    def all_cooling(self):
+        return self.cooling
+
+
+class Cache:
+    enabled = False
+
+
+def client(limiter, proxy_pool):
+    return HTTP(pool=Sessions([]), cache=Cache(), rate_limiter=limiter, proxy_pool=proxy_pool)
+
+
+def test_a_proxy_is_chosen_before_taking_a_host_slot(monkeypatch):
+    monkeypatch.setattr('scraper.utils.http_curl.time.sleep', lambda seconds: None)
+    limiter = Limiter()
+    proxy_pool = ProxyPool(limiter, [Proxy('a', Sessions([403])), Proxy('b', Sessions([200]))])
+    response = client(limiter, proxy_pool).get('https://www.airbnb.com/rooms/1')
+    assert response.status_code == 200
+    assert proxy_pool.chosen_in_slot == [False, False]
+    # the other proxy was free, the host did not have to slow down
+    assert limiter.blocks == 0
+
+
+def test_the_host_slows_down_once_every_proxy_is_cooling(monkeypatch):
+    monkeypatch.setattr('scraper.utils.http_curl.time.sleep', lambda seconds: None)
+    limiter = Limiter()
+    proxy_pool = ProxyPool(limiter, [Proxy('a', Sessions([403])), Proxy('b', Sessions([200]))], cooling=True)
+    assert client(limiter, proxy_pool).get('https://www.airbnb.com/rooms/1').status_code == 200
+    assert limiter.blocks == 1
+
+
+def test_the_last_refused_answer_is_returned(monkeypatch):
+    monkeypatch.setattr('scraper.utils.http_curl.time.sleep', lambda seconds: None)
+    limiter = Limiter()
+    http = HTTP(pool=Sessions([404]), cache=Cache(), rate_limiter=limiter, proxy_pool=[])
+    assert http.get('https://www.airbnb.com/rooms/1').status_code == 404
@@ -0,0 +1,42 @@
+from benchmarks import fixtures
+from scraper import main
+from scraper.utils.detail_cache import configure_detail_cache, get_detail_cache
+from scraper.utils.http_curl import HOST_OVERRIDES, configure_host_overrides
+
+SEARCH_URL = 'https://www.airbnb.com/s/Kissimmee--Florida--United-States/homes?adults=2&checkin=2024-04-01&checkout=2024-04-05'
+
+
+def crawl(tmp_path, **config):
+    return main.execute(dict({
+        "property_preset": {"label": "Kissimmee", "url": SEARCH_URL},
+        "output_dir": str(tmp_path / 'output'),
+        "output_formats": ['jsonl'],
+        "search_only": True,
+    }, **config))
+
+
+def test_execute_keeps_the_items_when_collecting(mock_airbnb, tmp_path):
+    crawl_data = crawl(tmp_path, collect=True)
+    assert crawl_data['count'] == 2 * fixtures.PAGE_SIZE
+    assert len(crawl_data['result']) == crawl_data['count']
+    assert all(item.get('url') for item in crawl_data['result'])
+
+
+def test_execute_only_streams_by_default(mock_airbnb, tmp_path):
+    crawl_data = crawl(tmp_path)
+    assert crawl_data['count'] == 2 * fixtures.PAGE_SIZE
+    assert 'result' not in crawl_data
+
+
+def test_configure_runtime_keeps_a_cache_already_in_the_mode(tmp_path):
+    path = str(tmp_path / 'details.sqlite3')
+    cache = configure_detail_cache(mode='on', path=path)
+    try:
+        main.configure_runtime({"detail_cache": "on", "host_overrides": {"www.airbnb.com": "http://127.0.0.1:1"}})
+        assert get_detail_cache() is cache
+        assert HOST_OVERRIDES == {"www.airbnb.com": "http://127.0.0.1:1"}
+        main.configure_runtime({"detail_cache": "off"})
+        assert get_detail_cache().mode == 'off'
+    finally:
+        configure_host_overrides({})
+        configure_detail_cache(mode='off')
@@ -0,0 +1,67 @@
+import os
+import threading
+import time
+
+from scraper.utils.operation_cache import OperationIdCache, rejects_operation
+
+BUNDLE = 'https://a0.muscache.com/airbnb/static/packages/web/common/search.abc123.js'
+
+
+def test_get_or_fetch_keeps_the_id_on_disk(tmp_path):
+    path = os.path.join(tmp_path, 'operation_ids.json')
+    cache = OperationIdCache(path=path)
+    assert cache.get_or_fetch(BUNDLE, 'StaysSearch', lambda: 'hash1') == 'hash1'
+    assert cache.get_or_fetch(BUNDLE, 'StaysSearch', lambda: 'hash2') == 'hash1'
+    assert cache.misses == 1 and cache.hits == 1
+    # a new process reads the file instead of the bundle
+    assert OperationIdCache(path=path).get(BUNDLE, 'StaysSearch') == 'hash1'
+    assert OperationIdCache(path=path).get(BUNDLE, 'StaysPdpSections') is None
+    assert cache.get_or_fetch(None, 'StaysSearch', lambda: 'hash3') is None
+
+
+def test_an_expired_id_is_fetched_again(tmp_path, monkeypatch):
+    cache = OperationIdCache(path=os.path.join(tmp_path, 'operation_ids.json'), ttl=60)
+    cache.set(BUNDLE, 'StaysSearch', 'old')
+    later = time.time() + 120
+    monkeypatch.setattr('scraper.utils.operation_cache.time.time', lambda: later)
+    assert cache.get(BUNDLE, 'StaysSearch') is None
+    assert cache.get_or_fetch(BUNDLE, 'StaysSearch', lambda: 'new') == 'new'
+
+
+def test_invalidate_and_clear(tmp_path):
+    path = os.path.join(tmp_path, 'operation_ids.json')
+    cache = OperationIdCache(path=path)
+    cache.set(BUNDLE, 'StaysSearch', 'hash1')
+    cache.set(BUNDLE, 'StaysPdpSections', 'hash2')
+    cache.invalidate(BUNDLE, 'StaysSearch')
+    assert OperationIdCache(path=path).get(BUNDLE, 'StaysSearch') is None
+    assert cache.get(BUNDLE, 'StaysPdpSections') == 'hash2'
+    cache.clear()
+    assert OperationIdCache(path=path).get(BUNDLE, 'StaysPdpSections') is None
+
+
+def test_concurrent_misses_fetch_once(tmp_path):
+    cache = OperationIdCache(path=os.path.join(tmp_path, 'operation_ids.json'))
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        time.sleep(0.05)
+        return 'hash1'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch(BUNDLE, 'StaysSearch', fetch)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['hash1'] * 5 and len(fetches) == 1
+
+
+def test_rejects_operation():
+    assert rejects_operation('{"errors": [{"message": "PersistedQueryNotFound"}]}')
+    assert not rejects_operation('{"errors": [{"message": "partial"}], "data": {"presentation": {}}}')
+    assert not rejects_operation('{"data": {}}')
+    assert not rejects_operation('')
+    assert not rejects_operation('<html>')
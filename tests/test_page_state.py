@@ -0,0 +1,36 @@
+from benchmarks import fixtures
+from scraper.strategies.airbnb_com.page_state import PageState
+
+
+def test_search_page_state():
+    page_state = PageState(fixtures.search_html(page_count=3))
+    niobe = page_state.deferred_state['niobeMinimalClientData'][0]
+    assert niobe[0] == 'StaysSearch:{}'
+    assert len(niobe[1]['data']['presentation']['staysSearch']['results']['searchResults']) == fixtures.PAGE_SIZE
+    assert page_state.api_key == fixtures.API_KEY
+    assert page_state.find_script_src('StaysSearchRoute') == fixtures.STATIC_HOST + fixtures.SEARCH_JS_PATH
+    assert page_state.find_script_src('PdpPlatformRoute') is None
+
+
+def test_pdp_page_state():
+    page_state = PageState(fixtures.pdp_html(fixtures.listing_id(1, 0)))
+    assert page_state.deferred_state == {}
+    assert page_state.api_key == fixtures.API_KEY
+    assert page_state.find_script_src('asyncrequire') == fixtures.STATIC_HOST + fixtures.ASYNC_REQUIRE_PATH
+    assert page_state.spa_data[1][1]['niobeMinimalClientData'][0][0].startswith('StaysPdpSections:')
+
+
+def test_values_are_computed_once():
+    page_state = PageState(fixtures.search_html(page_count=3))
+    assert page_state.deferred_state is page_state.deferred_state
+    page_state.api_key, page_state.find_script_src('StaysSearchRoute')
+    # later reads do not scan the html again
+    page_state.raw_data = ''
+    assert page_state.api_key == fixtures.API_KEY
+    assert page_state.find_script_src('StaysSearchRoute')
+
+
+def test_script_srcs_are_unescaped_and_a_page_without_state_is_empty():
+    page_state = PageState('<html><script src="/a.js?x=1&amp;y=2"></script><script id="data-injector-instances"> </script></html>')
+    assert page_state.script_srcs == ['/a.js?x=1&y=2']
+    assert page_state.injector_instances == {} and page_state.deferred_state == {}
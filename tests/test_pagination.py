@@ -0,0 +1,41 @@
+import json
+
+from benchmarks import fixtures
+from scraper.strategies.airbnb_com.pagination import PaginationPlan
+
+
+def plan(operation_id=fixtures.SEARCH_OPERATION_ID):
+    variables = fixtures.search_state(page_count=3)['niobeMinimalClientData'][0][1]['variables']
+    return PaginationPlan(variables, fixtures.page_cursors(3), ['1', '2'], operation_id,
+                          api_headers={"x-airbnb-api-key": fixtures.API_KEY}, search_js_url='search.js')
+
+
+def test_payload_of_every_page():
+    search_plan = plan()
+    assert search_plan.last_page == 3
+    assert search_plan.payload(0) is None and search_plan.payload(4) is None
+    payload = json.loads(search_plan.payload(2))
+    assert payload['extensions']['persistedQuery']['sha256Hash'] == fixtures.SEARCH_OPERATION_ID
+    for request in ('staysSearchRequest', 'staysMapSearchRequestV2'):
+        assert payload['variables'][request]['cursor'] == fixtures.page_cursors(3)[1]
+        assert payload['variables'][request]['skipHydrationListingIds'] == ['1', '2']
+    # the page 1 variables are left as they were
+    assert 'cursor' not in search_plan.variables['staysSearchRequest']
+
+
+def test_set_operation_id_swaps_the_hash_only():
+    search_plan = plan()
+    before = json.loads(search_plan.payload(3))
+    search_plan.set_operation_id('new')
+    after = json.loads(search_plan.payload(3))
+    assert search_plan.operation_id == 'new' and after['extensions']['persistedQuery']['sha256Hash'] == 'new'
+    assert after['variables'] == before['variables']
+
+
+def test_state_round_trip():
+    search_plan = plan()
+    state = json.loads(json.dumps(search_plan.to_state()))
+    restored = PaginationPlan.from_state(state)
+    assert all(restored.payload(page) == search_plan.payload(page) for page in range(1, 4))
+    assert restored.api_headers == search_plan.api_headers and restored.search_js_url == 'search.js'
+    assert restored.skip_ids == ['1', '2'] and restored.last_page == 3
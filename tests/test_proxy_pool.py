@@ -0,0 +1,86 @@
+import time
+
+from scraper.utils.proxy_pool import ProxyPool, load_proxies
+
+
+class Sessions:
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.size = None
+
+    def resize(self, size):
+        self.size = size
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+def pool(count=2, **options):
+    return ProxyPool([f'http://proxy{index}:8080' for index in range(count)], Sessions, **options)
+
+
+def test_load_proxies_splits_and_strips():
+    assert load_proxies(' http://a:1 ,,http://b:2') == ['http://a:1', 'http://b:2']
+    assert load_proxies(['http://a:1', '', None]) == ['http://a:1']
+
+
+def test_choose_skips_a_cooling_proxy():
+    proxies = pool()
+    blocked, healthy = proxies.proxies
+    proxies.on_block(blocked)
+    assert not blocked.available
+    assert all(proxies.choose() is healthy for _ in range(10))
+    assert healthy.in_flight == 10
+    assert not proxies.all_cooling()
+
+
+def test_cooldown_doubles_per_consecutive_block_up_to_the_cap():
+    proxies = pool(1, cooldown=10, cooldown_cap=25)
+    proxy = proxies.proxies[0]
+    cooldowns = []
+    for _ in range(3):
+        proxies.on_block(proxy)
+        cooldowns.append(round(proxy.cooldown_until - time.monotonic()))
+        # the cooldown ran out without a request getting through
+        proxy.cooldown_until = 0
+    assert cooldowns == [10, 20, 25]
+    assert proxy.consecutive_blocks == 3
+
+
+def test_a_success_ends_the_streak():
+    proxies = pool(1, cooldown=10)
+    proxy = proxies.proxies[0]
+    proxies.on_block(proxy)
+    proxy.cooldown_until = 0
+    proxies.on_success(proxy, 0.1)
+    proxies.on_block(proxy)
+    assert proxy.consecutive_blocks == 1
+    assert round(proxy.cooldown_until - time.monotonic()) == 10
+
+
+def test_blocks_of_requests_in_flight_do_not_extend_the_streak():
+    proxies = pool(1, cooldown=10)
+    proxy = proxies.proxies[0]
+    for _ in range(5):
+        proxies.on_block(proxy)
+    assert proxy.consecutive_blocks == 1
+    assert proxy.stats['blocks'] == 5
+    assert round(proxy.cooldown_until - time.monotonic()) == 10
+    assert proxies.all_cooling()
+
+
+def test_retry_after_outlasts_a_short_cooldown():
+    proxies = pool(1, cooldown=1)
+    proxy = proxies.proxies[0]
+    proxies.on_block(proxy, retry_after=30)
+    assert round(proxy.cooldown_until - time.monotonic()) == 30
+
+
+def test_resize_splits_the_sessions_over_the_proxies():
+    proxies = pool(3)
+    proxies.resize(16)
+    assert [proxy.sessions.size for proxy in proxies.proxies] == [5, 5, 5]
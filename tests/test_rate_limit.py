@@ -0,0 +1,96 @@
+import threading
+import time
+
+from scraper.utils import rate_limit
+from scraper.utils.rate_limit import HostLimiter, RateLimiter, TokenBucket, backoff_delay, parse_retry_after
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_spends_the_burst_then_waits_for_the_rate(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(rate_limit.time, 'sleep', clock.sleep)
+    bucket = TokenBucket(rate=4, burst=2)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == [0.25]
+    clock.now += 10
+    bucket.acquire()
+    bucket.acquire()
+    # the idle time only refills up to the burst
+    assert clock.sleeps == [0.25]
+
+
+def test_host_limiter_halves_on_a_block_and_grows_back():
+    limiter = HostLimiter(rate=10, burst=10, initial_concurrency=8, max_concurrency=8)
+    limiter.on_block()
+    assert limiter.limit == 4 and limiter.bucket.rate == 5
+    limiter.on_error()
+    assert limiter.limit == 3
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.limit == 8 and limiter.bucket.rate == 10
+    for _ in range(10):
+        limiter.on_block()
+    assert limiter.limit == 1 and limiter.bucket.rate == rate_limit.MIN_RATE
+
+
+def test_host_limiter_caps_the_requests_in_flight():
+    limiter = HostLimiter(rate=1000, burst=1000, initial_concurrency=2, max_concurrency=2)
+    peak = []
+    lock = threading.Lock()
+    release = threading.Event()
+
+    def request():
+        with limiter.slot():
+            with lock:
+                peak.append(limiter.in_flight)
+            release.wait(1)
+
+    threads = [threading.Thread(target=request) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 2 and limiter.in_flight == 0 and limiter.stats['requests'] == 5
+
+
+def test_retry_after_pauses_the_host():
+    limiter = HostLimiter(rate=1000, burst=1000)
+    limiter.on_block(retry_after=0.1)
+    started = time.monotonic()
+    with limiter.slot():
+        pass
+    assert time.monotonic() - started >= 0.09
+
+
+def test_rate_limiter_keeps_one_limiter_per_host():
+    limiter = RateLimiter(rate=5, burst=1)
+    assert limiter.for_host('a') is limiter.for_host('a')
+    assert limiter.for_host('a') is not limiter.for_host('b')
+    assert limiter.for_host('b').max_rate == 5 and set(limiter.stats()) == {'a', 'b'}
+
+
+def test_backoff_and_retry_after():
+    assert all(0 <= backoff_delay(attempt, cap=4) <= 4 for attempt in range(10))
+    assert backoff_delay(0, retry_after=3, base=0.1) == 3
+    assert backoff_delay(0, retry_after=300, cap=30) == 30
+    assert parse_retry_after('12') == 12.0
+    assert parse_retry_after('-1') == 0.0
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert parse_retry_after('soon') is None and parse_retry_after(None) is None
@@ -0,0 +1,50 @@
+import logging
+
+from benchmarks import fixtures
+from scraper.strategies.airbnb_com.search_page import AirbnbComSearchStrategy
+
+SEARCH_URL = 'https://www.airbnb.com/s/Kissimmee--Florida--United-States/homes?adults=2&checkin=2024-04-01&checkout=2024-04-05'
+
+
+def strategy(**config):
+    search = AirbnbComSearchStrategy(logging.getLogger())
+    search.configure(dict({"url": SEARCH_URL, "checkpoint": False}, **config))
+    search.fetched = []
+
+    def fetch_room_data(url, config=None):
+        search.fetched.append((url.split('?')[0].rsplit('/', 1)[-1], config))
+        return {"rating_score": 4.5, "rating_count": 10}
+    search.fetch_room_data = fetch_room_data
+    return search
+
+
+def test_search_only_keeps_full_results_that_carry_the_fields():
+    search = strategy(search_only=True)
+    items = [fixtures.search_result(1, 0), fixtures.search_result(1, 1, skinny=True)]
+    list(search.iter_listing_room_data(items, set()))
+    assert [room_id for room_id, _ in search.fetched] == [fixtures.listing_id(1, 1)]
+
+
+def test_search_only_fetches_the_fields_a_card_lacks():
+    search = strategy(search_only=True)
+    item = fixtures.search_result(1, 0)
+    del item['listing']['avgRatingA11yLabel']
+    rows = list(search.iter_parse_items([item], 1))
+    assert search.fetched == [(fixtures.listing_id(1, 0), {"fields": ["rating_score", "rating_count"], "with_price": False})]
+    assert rows[0]['rating_score'] == 4.5 and rows[0]['rating_count'] == 10
+
+
+def test_search_only_checks_only_the_fields_asked_for():
+    search = strategy(search_only=True, fields=['label', 'price_per_night'])
+    item = fixtures.search_result(1, 0)
+    del item['listing']['avgRatingA11yLabel']
+    list(search.iter_listing_room_data([item], set()))
+    assert search.fetched == []
+
+
+def test_only_a_resumed_crawl_is_checkpointed():
+    search = AirbnbComSearchStrategy(logging.getLogger())
+    search.configure({"url": SEARCH_URL})
+    assert not search.checkpoint and not search.resume
+    search.configure({"url": SEARCH_URL, "resume": True})
+    assert search.checkpoint and search.resume
@@ -0,0 +1,54 @@
+import os
+from datetime import date
+
+import pytest
+
+from scraper.utils.store import ListingStore, listing_id_of
+
+URL = 'https://www.airbnb.com/rooms/50001000?adults=2&check_in=2024-04-01'
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ListingStore(path=os.path.join(tmp_path, 'listings.sqlite3'))
+    yield store
+    store.close()
+
+
+def row(**values):
+    return dict({"url": URL, "check_in_date": '2024-04-01', "check_out_date": '2024-04-05', "rank": 1}, **values)
+
+
+def test_upsert_keeps_the_details_a_crawl_left_out(store):
+    first = store.start_crawl('kissimmee', URL)
+    store.record(first, [row(label='Villa', host_name='Ann', price_per_night=120.0)], profile='kissimmee')
+    # a search only crawl has no host, the stored one stays
+    second = store.start_crawl('kissimmee', URL)
+    store.record(second, [row(label='Lake villa', host_name=None, price_per_night=110.0, rank=3)], profile='kissimmee')
+
+    listing = store.listing('50001000')
+    assert listing['data'] == {"url": URL, "label": 'Lake villa', "host_name": 'Ann'}
+    assert listing['url'] == 'https://www.airbnb.com/rooms/50001000'
+    assert listing['first_seen'] <= listing['last_seen']
+    history = store.listing_history('50001000')
+    assert [(item['crawl_id'], item['price_per_night'], item['rank']) for item in history] == [(first, 120.0, 1), (second, 110.0, 3)]
+
+
+def test_observations_by_profile_stay_and_date(store):
+    crawl_id = store.start_crawl('kissimmee', URL)
+    store.record(crawl_id, [row(), row(url='https://www.airbnb.com/rooms/2', check_out_date='2024-04-08'), row(url='')],
+                 profile='kissimmee')
+    store.finish_crawl(crawl_id, item_count=2)
+    assert [crawl['item_count'] for crawl in store.crawls('kissimmee')] == [2]
+    assert len(store.profile_observations('kissimmee')) == 2 and store.profile_observations('orlando') == []
+    assert len(store.stay_prices('2024-04-01')) == 2 and len(store.stay_prices('2024-04-01', '2024-04-08')) == 1
+    today = date.today()
+    assert len(store.listing_history('2', since=today, until=today)) == 1
+    assert store.listing_history('2', until='2000-01-01') == []
+    assert store.listing('3') is None
+
+
+def test_listing_id_of():
+    assert listing_id_of(URL) == '50001000'
+    assert listing_id_of('https://www.airbnb.com/rooms/50001000/') == '50001000'
+    assert listing_id_of(None) == ''
@@ -0,0 +1,60 @@
+import logging
+
+import pytest
+
+from scraper.strategies.airbnb_com.search_page import AirbnbComSearchStrategy
+from scraper.sweep import stay_windows
+from scraper.utils.static_listings import StaticListings
+
+ROOM_URL = 'https://www.airbnb.com/rooms/50001000?adults=2'
+
+
+def test_stay_windows():
+    assert stay_windows('2024-04-01', '2024-04-02', [2, 4]) == [
+        ('2024-04-01', '2024-04-03'), ('2024-04-01', '2024-04-05'),
+        ('2024-04-02', '2024-04-04'), ('2024-04-02', '2024-04-06'),
+    ]
+    assert stay_windows('2024-04-01', '2024-04-07', [1], step_days=3) == [
+        ('2024-04-01', '2024-04-02'), ('2024-04-04', '2024-04-05'), ('2024-04-07', '2024-04-08'),
+    ]
+    assert stay_windows('2024-04-02', '2024-04-01', [1]) == []
+
+
+@pytest.mark.parametrize('stay_lengths, step_days', [([], 1), ([3, 0], 1), ([3], 0)])
+def test_stay_windows_rejects_bad_lengths_and_steps(stay_lengths, step_days):
+    with pytest.raises(ValueError):
+        stay_windows('2024-04-01', '2024-04-02', stay_lengths, step_days)
+
+
+def window_strategy(fields, detail):
+    search = AirbnbComSearchStrategy(logging.getLogger())
+    search.configure({"url": 'https://www.airbnb.com/s/homes', "fields": fields, "static_listings": StaticListings()})
+    search.calls = []
+
+    def fetch_detail(url, config):
+        search.calls.append(config)
+        data = {key: value for key, value in detail.items() if config.get('fields') is None or key in config['fields']}
+        if not config.get('with_price'):
+            data.pop('price_per_night', None)
+        if config.get('with_product_id'):
+            data.update({"product_id": 'product'})
+        return data
+    search.fetch_detail = fetch_detail
+    return search
+
+
+def test_later_windows_only_fetch_the_price():
+    search = window_strategy(None, {"label": 'Villa', "host_name": 'Ann', "price_per_night": 120.0})
+    first = search.fetch_room_data(ROOM_URL, {"fields": None, "with_price": True})
+    second = search.fetch_room_data(ROOM_URL, {"fields": None, "with_price": True})
+    assert first == second == {"label": 'Villa', "host_name": 'Ann', "price_per_night": 120.0}
+    assert len(search.calls) == 2
+    assert search.calls[1]['product_id'] == 'product' and search.calls[1]['fields'] == ['price_per_night', 'orig_price_per_night']
+
+
+def test_a_price_only_sweep_keeps_the_product_id():
+    search = window_strategy(['price_per_night'], {"price_per_night": 120.0})
+    for _ in range(3):
+        assert search.fetch_room_data(ROOM_URL, {"fields": ['price_per_night'], "with_price": True}) == {"price_per_night": 120.0}
+    assert search.static_listings.get('50001000') == {"product_id": 'product'}
+    assert [call.get('product_id') for call in search.calls] == [None, 'product', 'product']